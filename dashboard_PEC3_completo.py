@@ -3,7 +3,24 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
+from datetime import date, timedelta
 import numpy as np
+import os
+
+from utils.aggregation import AggregationEngine, Metric, histogram_stats
+from utils.bitmap_index import BitmapIndex
+from utils.bookings import FILTER_COLUMNS, freeze_frame, load_bookings
+from utils.column_store import load_column_store
+from utils.heavy_hitters import HEAVY_HITTER_SOURCE_COLUMNS, HeavyHitters, exact_counts
+from utils.interval_index import STAY_COLUMNS, StayIndex
+from utils.olap_cube import BookingsCube, load_bookings_cube
+from utils.on_the_books import BOOK_COLUMNS, PACE_MAX_DAYS, OnTheBooks
+from utils.partitioned_store import IncrementalView, open_partitioned_bookings
+from utils.polars_backend import PolarsBookings
+from utils.quantile_sketch import OUTLIER_QUANTILE, QUANTILE_COLUMNS, QUANTILE_KEYS, QuantileSketches
+from utils.result_cache import ResultCache
+from utils.sql_backend import SQLBookings
+from utils.time_series import DailyCube, load_daily_cube, rolling_mean, year_over_year
 
 # Configuración de la página
 st.set_page_config(
@@ -93,51 +110,175 @@ st.markdown("""
 # Cargar datos
 BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR / "1. Datos" / "hotel_bookings_processed.csv"
+DATASET_PATH = BASE_DIR / "1. Datos" / "hotel_bookings_dataset"
+
+# Modo de ingesta del despliegue: "memoria" carga todas las reservas; "streaming"
+# recorre el CSV por bloques, lo pliega en el cubo y sirve la página sin retener filas;
+# "particionado" lee del dataset hotel=/arrival_date_year= solo las particiones filtradas;
+# "duckdb" registra el CSV en DuckDB y resuelve filtros y agregados en SQL;
+# "polars" los resuelve como consultas perezosas de Polars
+INGESTION_MODE = os.environ.get("PEC3_INGESTION_MODE", "memoria")
+STREAMING = INGESTION_MODE == "streaming"
+PARTITIONED = INGESTION_MODE == "particionado"
+DUCKDB = INGESTION_MODE == "duckdb"
+POLARS = INGESTION_MODE == "polars"
+# Modos sin reservas en memoria: filtros, opciones y agregados salen de `cube`
+CUBE_ONLY = STREAMING or DUCKDB or POLARS
 
-@st.cache_data
+@st.cache_resource
 def load_data():
-    df = pd.read_csv(DATA_PATH)
-    
-    # Crear columna de fecha de llegada
-    if 'arrival_date_year' in df.columns and 'arrival_date_month' in df.columns and 'arrival_date_day_of_month' in df.columns:
-        month_map = {
-            'January': 1, 'February': 2, 'March': 3, 'April': 4,
-            'May': 5, 'June': 6, 'July': 7, 'August': 8,
-            'September': 9, 'October': 10, 'November': 11, 'December': 12
-        }
-        df['month_num'] = df['arrival_date_month'].map(month_map)
-        df['dia'] = pd.to_datetime(df[['arrival_date_year', 'month_num', 'arrival_date_day_of_month']].rename(
-            columns={'arrival_date_year': 'year', 'month_num': 'month', 'arrival_date_day_of_month': 'day'}
-        ))
-    
-    # Total de noches
-    if 'stays_in_weekend_nights' in df.columns and 'stays_in_week_nights' in df.columns:
-        df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
-    
-    # Total de huéspedes
-    if 'adults' in df.columns and 'children' in df.columns and 'babies' in df.columns:
-        df['total_guests'] = df['adults'] + df['children'] + df['babies']
-    
-    # Temporada
-    if 'arrival_date_month' in df.columns:
-        df['season'] = df['arrival_date_month'].map({
-            'December': 'Invierno', 'January': 'Invierno', 'February': 'Invierno',
-            'March': 'Primavera', 'April': 'Primavera', 'May': 'Primavera',
-            'June': 'Verano', 'July': 'Verano', 'August': 'Verano',
-            'September': 'Otoño', 'October': 'Otoño', 'November': 'Otoño'
-        })
-    
-    # Categoría de lead time
-    if 'lead_time' in df.columns:
-        df['lead_time_category'] = pd.cut(
-            df['lead_time'],
-            bins=[-1, 0, 7, 30, 90, 180, df['lead_time'].max()],
-            labels=['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
-        )
-    
-    return df
-
-data = load_data()
+    # Lee la caché columnar si el CSV no ha cambiado desde el último arranque.
+    # Un único DataFrame de solo lectura por proceso: las sesiones lo comparten
+    # sin copias y sus filtros son selecciones sobre él, no DataFrames nuevos
+    return freeze_frame(load_bookings(DATA_PATH))
+
+@st.cache_resource
+def load_dataset():
+    # Dataset particionado; se importa desde el CSV la primera vez y después
+    # recibe las reservas nuevas con `python -m utils.partitioned_store`
+    return open_partitioned_bookings(DATA_PATH, DATASET_PATH)
+
+@st.cache_resource
+def load_incremental_view(name, _build, columns):
+    # Estructura del modo particionado que solo lee y suma los lotes añadidos al
+    # dataset, en lugar de releerlo entero con cada versión
+    return IncrementalView(load_dataset(), _build, columns)
+
+@st.cache_resource
+def load_filter_index():
+    # Bitmaps por valor de cada dimensión del sidebar, compartidos entre sesiones
+    return BitmapIndex(load_data(), FILTER_COLUMNS)
+
+@st.cache_resource
+def load_cube():
+    # Medidas precalculadas por (hotel, año, tipo de cliente, dimensión)
+    if STREAMING:
+        return load_bookings_cube(DATA_PATH)
+    if DUCKDB:
+        # Misma interfaz que el cubo, con cada consulta resuelta en SQL
+        return SQLBookings(DATA_PATH)
+    if POLARS:
+        return PolarsBookings(DATA_PATH)
+    return BookingsCube.build(load_data())
+
+@st.cache_resource
+def load_time_series():
+    # Cubo diario de llegadas por (día, hotel, tipo de cliente, cancelada) para las series de la pestaña 3
+    if CUBE_ONLY:
+        return load_daily_cube(DATA_PATH)
+    return DailyCube.build(load_data())
+
+@st.cache_resource(max_entries=1)
+def load_stay_index(data_version=None):
+    # Índice de intervalos [llegada, salida) de las estancias por celda de filtros.
+    # En modo particionado se actualiza con cada versión del dataset
+    if PARTITIONED:
+        return load_incremental_view("estancias", StayIndex, STAY_COLUMNS + FILTER_COLUMNS).get()
+    if CUBE_ONLY:
+        return StayIndex.from_csv(DATA_PATH)
+    return StayIndex(load_data())
+
+@st.cache_resource(max_entries=1)
+def load_on_the_books(data_version=None):
+    # Eventos de alta, llegada y cancelación ordenados por celda de filtros, para
+    # reconstruir la cartera de reservas a cualquier fecha
+    if PARTITIONED:
+        return load_incremental_view("cartera", OnTheBooks, BOOK_COLUMNS + FILTER_COLUMNS).get()
+    if CUBE_ONLY:
+        return OnTheBooks.from_csv(DATA_PATH)
+    return OnTheBooks(load_data())
+
+@st.cache_resource(max_entries=1)
+def load_heavy_hitters(data_version=None):
+    # Resúmenes Space-Saving por celda de filtros para los rankings de país, agencia y empresa
+    if PARTITIONED:
+        return load_incremental_view(
+            "rankings", HeavyHitters.build, HEAVY_HITTER_SOURCE_COLUMNS + FILTER_COLUMNS
+        ).get()
+    if CUBE_ONLY:
+        return HeavyHitters.from_csv(DATA_PATH)
+    return HeavyHitters.build(load_data())
+
+@st.cache_resource(max_entries=1)
+def load_quantile_sketches(data_version=None):
+    # Resúmenes KLL de ADR, lead time y noches por (hotel, año, tipo de cliente, segmento)
+    if PARTITIONED:
+        return load_incremental_view(
+            "cuantiles", QuantileSketches.build, QUANTILE_COLUMNS + QUANTILE_KEYS
+        ).get()
+    if CUBE_ONLY:
+        return QuantileSketches.from_csv(DATA_PATH)
+    return QuantileSketches.build(load_data())
+
+# Periodos de la evolución temporal: etiqueta -> frecuencia de `DailyCube.resample`
+TIME_FREQUENCIES = {'Semana': 'week', 'Mes': 'month', 'Trimestre': 'quarter', 'Temporada': 'season'}
+ROLLING_WINDOW = 3
+
+# Curvas de ritmo de reservas: periodo de llegada -> `by` de `OnTheBooks.pace`, y serie -> columna
+PACE_PERIODS = {'Mes': 'month', 'Temporada': 'season'}
+PACE_SERIES = {'Reservas Netas': 'on_books', 'Altas': 'created', 'Cancelaciones': 'canceled'}
+
+# Diagramas de caja: variable -> (columna de `QUANTILE_COLUMNS`, unidad) y agrupación -> columna
+BOX_VARIABLES = {'ADR': ('adr', '€'), 'Lead Time': ('lead_time', 'días'), 'Noches': ('total_nights', 'noches')}
+BOX_GROUPS = {'Hotel': 'hotel', 'Segmento de Mercado': 'market_segment'}
+
+# Rankings de intermediarios: etiqueta -> columna de `HEAVY_HITTER_COLUMNS`
+HEAVY_HITTER_RANKINGS = {'Agencia': 'agent', 'Empresa': 'company'}
+
+# Mapa de calendario: días de la semana (0 = lunes) y medida -> (atributo de `CalendarGrid`, escala de color)
+WEEKDAY_LABELS = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+CALENDAR_MEASURES = {'Llegadas': ('arrivals', 'Blues'), 'Tasa de Cancelación (%)': ('cancel_rate', 'Reds')}
+
+# Agregados por fila que necesita la página, resueltos en una pasada por el motor
+ENGINE_KEYS = ['total_guests', 'total_nights', 'lead_time_category']
+ENGINE_VALUES = ['is_canceled', 'adr', 'lead_time']
+PAGE_METRICS = [
+    Metric('totales', values=('is_canceled', 'adr', 'lead_time')),
+    Metric('huespedes', by=('total_guests',)),
+    Metric('noches', by=('total_nights',)),
+    Metric('lead_noches', by=('lead_time_category', 'total_nights')),
+]
+
+@st.cache_resource
+def load_engine():
+    # Códigos factorizados una vez y compartidos por todos los agregados. Las
+    # columnas numéricas calientes se suman directamente sobre el almacén .npy
+    # mapeado en memoria, cuyas páginas comparten todos los procesos del servidor
+    return AggregationEngine(load_data(), ENGINE_KEYS, ENGINE_VALUES, arrays=load_column_store(DATA_PATH))
+
+# Caché de agregados y figuras por estado de filtros (compartida entre sesiones)
+RESULT_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_MAX_MB = 64
+RESULT_CACHE_TTL = 60 * 60  # segundos
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(
+        max_entries=RESULT_CACHE_MAX_ENTRIES,
+        max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+        ttl=RESULT_CACHE_TTL,
+    )
+
+if CUBE_ONLY:
+    cube = load_cube()
+    data = filter_index = engine = None
+elif PARTITIONED:
+    # El cubo se compone tras elegir los filtros, solo con las particiones afectadas
+    dataset = load_dataset().refresh()
+    cube = data = filter_index = engine = None
+else:
+    cube = load_cube()
+    data = load_data()
+    filter_index = load_filter_index()
+    engine = load_engine()
+
+def filter_values(column):
+    # Opciones de un filtro: de las reservas, de las claves del cubo o del manifiesto del dataset
+    if CUBE_ONLY:
+        return cube.values(column)
+    if PARTITIONED:
+        return dataset.values(column)
+    return list(data[column].unique())
 
 # ============================================
 # SIDEBAR - FILTROS
@@ -145,12 +286,12 @@ data = load_data()
 st.sidebar.title("🎯 Filtros de Exploración")
 
 # Filtro de hotel
-hotel_options = ["Todos"] + list(data["hotel"].unique())
+hotel_options = ["Todos"] + filter_values("hotel")
 selected_hotel = st.sidebar.selectbox("Tipo de Hotel", hotel_options)
 
 # Filtro de año
-min_year = int(data["arrival_date_year"].min())
-max_year = int(data["arrival_date_year"].max())
+min_year = int(min(filter_values("arrival_date_year")))
+max_year = int(max(filter_values("arrival_date_year")))
 year_range = st.sidebar.slider(
     "Año de llegada",
     min_value=min_year,
@@ -160,26 +301,72 @@ year_range = st.sidebar.slider(
 )
 
 # Filtro de tipo de cliente
-if 'customer_type' in data.columns:
-    customer_options = ["Todos"] + list(data["customer_type"].unique())
+if 'customer_type' in (dataset.keys if PARTITIONED else cube.keys):
+    customer_options = ["Todos"] + filter_values("customer_type")
     selected_customer = st.sidebar.selectbox("Tipo de Cliente", customer_options)
 else:
     selected_customer = "Todos"
 
-# Aplicar filtros
-data_filtered = data[
-    (data["arrival_date_year"] >= year_range[0]) &
-    (data["arrival_date_year"] <= year_range[1])
-]
+# Estado de filtros: se resuelve con los bitmaps (memoria) o sobre el cubo (streaming)
+filters = {
+    "hotel": None if selected_hotel == "Todos" else [selected_hotel],
+    "arrival_date_year": range(year_range[0], year_range[1] + 1),
+    "customer_type": None if selected_customer == "Todos" else [selected_customer],
+}
+
+# Los reruns que no cambian los filtros (p.ej. mover el slider de impacto)
+# reutilizan agregados y figuras en lugar de recalcularlos
+result_cache = get_result_cache()
+# La versión del dataset invalida los resultados al añadir reservas nuevas
+data_version = dataset.version if PARTITIONED else None
+filter_key = (selected_hotel, tuple(year_range), selected_customer, data_version)
+
+def cached_figure(name, build):
+    return result_cache.get_or_compute((filter_key, name), build)
+
+if PARTITIONED:
+    cube = result_cache.get_or_compute((filter_key, "cube"), lambda: dataset.cube(filters))
+
+def compute_bundle():
+    if CUBE_ONLY or PARTITIONED:
+        return cube.compute(filters, PAGE_METRICS)
+    return engine.compute(filter_index.select(filters), PAGE_METRICS)
 
-if selected_hotel != "Todos":
-    data_filtered = data_filtered[data_filtered["hotel"] == selected_hotel]
+def get_daily_cube(all_years=False):
+    # En modo particionado se suman los cubos diarios de las particiones afectadas.
+    # Con `all_years` no se podan años: las noches de un año incluyen estancias que llegaron el anterior
+    if PARTITIONED:
+        selection = dict(filters, arrival_date_year=None) if all_years else filters
+        return result_cache.get_or_compute((filter_key, "daily", all_years), lambda: dataset.daily_cube(selection))
+    return load_time_series()
 
-if selected_customer != "Todos" and 'customer_type' in data.columns:
-    data_filtered = data_filtered[data_filtered["customer_type"] == selected_customer]
+def top_values(column, n=10):
+    # Ranking de los valores más frecuentes, de los resúmenes de las celdas filtradas. Si sus
+    # cotas no lo garantizan, se recuenta exacto con el cubo (país) o las reservas filtradas
+    def exact():
+        if column in cube.tables:
+            counts = cube.slice(column, filters)
+            return pd.DataFrame({'value': counts[column].to_numpy(), 'count': counts['count'], 'canceled': counts['canceled']})
+        return exact_counts(filter_index.select(filters).take(data[[column, 'is_canceled']]), column)
+    has_exact = column in cube.tables or data is not None
+    return result_cache.get_or_compute(
+        (filter_key, "top", column, n),
+        lambda: load_heavy_hitters(data_version).top(column, filters, n, exact=exact if has_exact else None)
+    )
+
+def distribution_summary(column, by=None):
+    # Medianas, percentiles y bigotes de la suma de los resúmenes de las celdas filtradas
+    return result_cache.get_or_compute(
+        (filter_key, "cuantiles", column, by), lambda: load_quantile_sketches(data_version).summary(column, filters, by)
+    )
+
+bundle = result_cache.get_or_compute((filter_key, "bundle"), compute_bundle)
+totales = bundle['totales'].iloc[0]
 
 st.sidebar.markdown("---")
-st.sidebar.info(f"📊 **Registros filtrados:** {len(data_filtered):,}")
+st.sidebar.info(f"📊 **Registros filtrados:** {int(totales['count']):,}")
+if PARTITIONED:
+    st.sidebar.caption(f"🗂️ Particiones leídas: {len(dataset.partitions(filters))} de {len(dataset.partitions())}")
 
 # ============================================
 # HEADER PRINCIPAL
@@ -192,852 +379,1242 @@ st.markdown("---")
 # ============================================
 # TABS - CAPÍTULOS
 # ============================================
+# Con on_change="rerun" cada pestaña sabe si está abierta (`.open`) y solo
+# la visible calcula sus agregados y figuras; cambiar de pestaña hace un rerun
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "🏁 Bienvenida al Problema",
     "📊 Radiografía del Dataset", 
     "⏰ El Factor Tiempo",
     "📱 Canales y Comportamiento",
     "🎯 Conclusiones"
-])
+], key="capitulo", on_change="rerun")
 
 # ============================================
 # TAB 1: BIENVENIDA AL PROBLEMA
 # ============================================
 with tab1:
-    col1, col2, col3 = st.columns([1, 2, 1])
-    
-    with col2:
-        cancelation_rate = data_filtered["is_canceled"].mean() * 100
-        st.markdown(f"""
-        <div style="text-align: center; padding: 40px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-        border-radius: 20px; box-shadow: 0 10px 30px rgba(0,0,0,0.3); margin-top: 30px;">
-            <div style="font-size: 80px; font-weight: bold; color: white;">{cancelation_rate:.1f}%</div>
-            <div style="font-size: 28px; color: #f0f0f0; margin-top: 10px;">DE CANCELACIONES</div>
-            <div style="font-size: 18px; color: #e0e0e0; margin-top: 20px; font-style: italic;">
-            4 de cada 10 clientes no llegan al hotel
+    if tab1.open:
+        col1, col2, col3 = st.columns([1, 2, 1])
+    
+        with col2:
+            cancelation_rate = totales["is_canceled_sum"] / totales["count"] * 100
+            st.markdown(f"""
+            <div style="text-align: center; padding: 40px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+            border-radius: 20px; box-shadow: 0 10px 30px rgba(0,0,0,0.3); margin-top: 30px;">
+                <div style="font-size: 80px; font-weight: bold; color: white;">{cancelation_rate:.1f}%</div>
+                <div style="font-size: 28px; color: #f0f0f0; margin-top: 10px;">DE CANCELACIONES</div>
+                <div style="font-size: 18px; color: #e0e0e0; margin-top: 20px; font-style: italic;">
+                4 de cada 10 clientes no llegan al hotel
+                </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
     
-    st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
     
-    st.markdown("""
-    <div class="chapter-intro">
-    <strong>Imagina que eres director de un hotel en Lisboa.</strong> Cada mañana, al revisar las reservas del día, 
-    descubres que 4 de cada 10 clientes han cancelado. <strong>¿Frustración? Absolutamente.</strong> 
-    Pero, ¿y si pudiéramos entender el porqué?<br><br>
+        st.markdown("""
+        <div class="chapter-intro">
+        <strong>Imagina que eres director de un hotel en Lisboa.</strong> Cada mañana, al revisar las reservas del día, 
+        descubres que 4 de cada 10 clientes han cancelado. <strong>¿Frustración? Absolutamente.</strong> 
+        Pero, ¿y si pudiéramos entender el porqué?<br><br>
     
-    He analizado <strong>119,390 reservas hoteleras</strong> realizadas entre 2015 y 2017 
-    en dos hoteles portugueses: un <strong>City Hotel en Lisboa</strong> y un <strong>Resort Hotel en el Algarve</strong>. 
-    <br><br>
+        He analizado <strong>119,390 reservas hoteleras</strong> realizadas entre 2015 y 2017 
+        en dos hoteles portugueses: un <strong>City Hotel en Lisboa</strong> y un <strong>Resort Hotel en el Algarve</strong>. 
+        <br><br>
     
-    <strong>Nuestro objetivo:</strong> Desentrañar los patrones ocultos detrás de ese 37% de cancelaciones 
-    que amenaza la rentabilidad del sector hotelero.
-    </div>
-    """, unsafe_allow_html=True)
+        <strong>Nuestro objetivo:</strong> Desentrañar los patrones ocultos detrás de ese 37% de cancelaciones 
+        que amenaza la rentabilidad del sector hotelero.
+        </div>
+        """, unsafe_allow_html=True)
     
-    st.markdown("### 🔍 ¿Qué encontraremos?")
+        st.markdown("### 🔍 ¿Qué encontraremos?")
     
-    col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3, col4 = st.columns(4)
     
-    with col1:
-        st.markdown("""
-        <div style="text-align: center; padding: 20px; background: #e3f2fd; border-radius: 10px;">
-            <div style="font-size: 40px;">⏰</div>
-            <div style="font-size: 14px; margin-top: 10px; color: #555;">
-            <strong>Patrones temporales</strong><br>
-            ¿Cuándo se cancela más?
+        with col1:
+            st.markdown("""
+            <div style="text-align: center; padding: 20px; background: #e3f2fd; border-radius: 10px;">
+                <div style="font-size: 40px;">⏰</div>
+                <div style="font-size: 14px; margin-top: 10px; color: #555;">
+                <strong>Patrones temporales</strong><br>
+                ¿Cuándo se cancela más?
+                </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-        <div style="text-align: center; padding: 20px; background: #f3e5f5; border-radius: 10px;">
-            <div style="font-size: 40px;">📱</div>
-            <div style="font-size: 14px; margin-top: 10px; color: #555;">
-            <strong>Canales críticos</strong><br>
-            El rol de las OTAs
+            """, unsafe_allow_html=True)
+    
+        with col2:
+            st.markdown("""
+            <div style="text-align: center; padding: 20px; background: #f3e5f5; border-radius: 10px;">
+                <div style="font-size: 40px;">📱</div>
+                <div style="font-size: 14px; margin-top: 10px; color: #555;">
+                <strong>Canales críticos</strong><br>
+                El rol de las OTAs
+                </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-        <div style="text-align: center; padding: 20px; background: #fff3e0; border-radius: 10px;">
-            <div style="font-size: 40px;">💰</div>
-            <div style="font-size: 14px; margin-top: 10px; color: #555;">
-            <strong>Políticas flexibles</strong><br>
-            Depósitos y riesgo
+            """, unsafe_allow_html=True)
+    
+        with col3:
+            st.markdown("""
+            <div style="text-align: center; padding: 20px; background: #fff3e0; border-radius: 10px;">
+                <div style="font-size: 40px;">💰</div>
+                <div style="font-size: 14px; margin-top: 10px; color: #555;">
+                <strong>Políticas flexibles</strong><br>
+                Depósitos y riesgo
+                </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown("""
-        <div style="text-align: center; padding: 20px; background: #e8f5e9; border-radius: 10px;">
-            <div style="font-size: 40px;">🎯</div>
-            <div style="font-size: 14px; margin-top: 10px; color: #555;">
-            <strong>Soluciones</strong><br>
-            Estrategias accionables
+            """, unsafe_allow_html=True)
+    
+        with col4:
+            st.markdown("""
+            <div style="text-align: center; padding: 20px; background: #e8f5e9; border-radius: 10px;">
+                <div style="font-size: 40px;">🎯</div>
+                <div style="font-size: 14px; margin-top: 10px; color: #555;">
+                <strong>Soluciones</strong><br>
+                Estrategias accionables
+                </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
 
 # ============================================
 # TAB 2: RADIOGRAFÍA DEL DATASET
 # ============================================
 with tab2:
-    st.markdown("""
-    <div class="chapter-intro">
-    Comencemos por entender la magnitud de los datos. Este análisis abarca <strong>tres años de 
-    operaciones hoteleras</strong> con información detallada de cada reserva: desde cuándo se realizó, 
-    cuántas noches se quedó el huésped, qué tipo de habitación eligió, hasta si finalmente se presentó o canceló.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("### 📈 Métricas Clave")
-    
-    # Métricas principales
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-value">{len(data_filtered):,}</div>
-            <div class="metric-label">Reservas Totales</div>
+    if tab2.open:
+        st.markdown("""
+        <div class="chapter-intro">
+        Comencemos por entender la magnitud de los datos. Este análisis abarca <strong>tres años de 
+        operaciones hoteleras</strong> con información detallada de cada reserva: desde cuándo se realizó, 
+        cuántas noches se quedó el huésped, qué tipo de habitación eligió, hasta si finalmente se presentó o canceló.
         </div>
         """, unsafe_allow_html=True)
     
-    with col2:
-        canceled = data_filtered["is_canceled"].sum()
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-value" style="color: #dc3545;">{canceled:,}</div>
-            <div class="metric-label">Cancelaciones</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown("### 📈 Métricas Clave")
     
-    with col3:
-        avg_adr = data_filtered["adr"].mean()
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-value" style="color: #28a745;">€{avg_adr:.2f}</div>
-            <div class="metric-label">ADR Promedio</div>
-        </div>
-        """, unsafe_allow_html=True)
+        # Métricas principales
+        col1, col2, col3, col4 = st.columns(4)
     
-    with col4:
-        avg_lead = data_filtered["lead_time"].mean()
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-value" style="color: #ff7f0e;">{avg_lead:.0f}</div>
-            <div class="metric-label">Lead Time (días)</div>
+        with col1:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{int(totales['count']):,}</div>
+                <div class="metric-label">Reservas Totales</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+        with col2:
+            canceled = int(totales["is_canceled_sum"])
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value" style="color: #dc3545;">{canceled:,}</div>
+                <div class="metric-label">Cancelaciones</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+        with col3:
+            avg_adr = totales["adr_sum"] / totales["count"]
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value" style="color: #28a745;">€{avg_adr:.2f}</div>
+                <div class="metric-label">ADR Promedio</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+        with col4:
+            avg_lead = totales["lead_time_sum"] / totales["count"]
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value" style="color: #ff7f0e;">{avg_lead:.0f}</div>
+                <div class="metric-label">Lead Time (días)</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        # Medianas y percentiles: la media de ADR y lead time esconde colas largas
+        adr_summary = distribution_summary('adr')
+        lead_summary = distribution_summary('lead_time')
+        if len(adr_summary) and len(lead_summary):
+            adr_stats, lead_stats = adr_summary.iloc[0], lead_summary.iloc[0]
+            for col, value, label, color in zip(st.columns(4), [
+                f"€{adr_stats['median']:.2f}",
+                f"€{adr_stats['p90']:.2f}",
+                f"{lead_stats['median']:.0f}",
+                f"{lead_stats['p99']:.0f}",
+            ], [
+                'ADR Mediano', 'ADR Percentil 90', 'Lead Time Mediano (días)', 'Lead Time Percentil 99 (días)',
+            ], ['#28a745', '#28a745', '#ff7f0e', '#ff7f0e']):
+                with col:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div class="metric-value" style="color: {color};">{value}</div>
+                        <div class="metric-label">{label}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+    
+        st.markdown("<br>", unsafe_allow_html=True)
+    
+        # Gráficos de distribución
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.markdown("### 🏨 Distribución por Tipo de Hotel")
+            def build_fig_hotel():
+                hotel_dist = cube.slice("hotel", filters)[["hotel", "count"]]
+                fig_hotel = px.pie(
+                    hotel_dist,
+                    values="count",
+                    names="hotel",
+                    color_discrete_sequence=["#1f77b4", "#ff7f0e"],
+                    hole=0.4
+                )
+                fig_hotel.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
+                fig_hotel.update_layout(height=400, showlegend=True)
+                return fig_hotel
+            fig_hotel = cached_figure("fig_hotel", build_fig_hotel)
+            st.plotly_chart(fig_hotel, use_container_width=True, key="fig_hotel_tab2")
+    
+        with col2:
+            st.markdown("### 📋 Estado de las Reservas")
+            def build_fig_status():
+                status_map = {1: "Cancelada", 0: "Completada"}
+                status_dist = cube.slice("is_canceled", filters)
+                status_dist["status"] = status_dist["is_canceled"].map(status_map)
+                status_dist = status_dist.sort_values("status")[["status", "count"]]
+                fig_status = px.pie(
+                    status_dist,
+                    values="count",
+                    names="status",
+                    color_discrete_sequence=["#2ca02c", "#d62728"],
+                    hole=0.4
+                )
+                fig_status.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
+                fig_status.update_layout(height=400, showlegend=True)
+                return fig_status
+            fig_status = cached_figure("fig_status", build_fig_status)
+            st.plotly_chart(fig_status, use_container_width=True, key="fig_status_tab2")
+    
+        st.markdown("### 🏷️ Tipo de Comida y Clientes")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            if 'meal' in cube.tables:
+                def build_fig_meal():
+                    meal_dist = cube.slice('meal', filters)[['meal', 'count']]
+                    meal_dist = meal_dist.sort_values('count', ascending=False)
+            
+                    fig_meal = px.bar(
+                        meal_dist,
+                        x='meal',
+                        y='count',
+                        title='Distribución por Tipo de Comida',
+                        labels={'meal': 'Tipo de Comida', 'count': 'Número de Reservas'},
+                        color='count',
+                        color_continuous_scale='Blues'
+                    )
+                    fig_meal.update_layout(height=400, showlegend=False)
+                    return fig_meal
+                fig_meal = cached_figure("fig_meal", build_fig_meal)
+                st.plotly_chart(fig_meal, use_container_width=True, key="fig_meal_tab2")
+    
+        with col2:
+            if 'customer_type' in cube.tables:
+                def build_fig_customer():
+                    customer_dist = cube.slice('customer_type', filters)[['customer_type', 'count']]
+            
+                    fig_customer = px.bar(
+                        customer_dist,
+                        x='customer_type',
+                        y='count',
+                        title='Distribución por Tipo de Cliente',
+                        labels={'customer_type': 'Tipo de Cliente', 'count': 'Número de Reservas'},
+                        color='count',
+                        color_continuous_scale='Purples'
+                    )
+                    fig_customer.update_layout(height=400, showlegend=False)
+                    return fig_customer
+                fig_customer = cached_figure("fig_customer", build_fig_customer)
+                st.plotly_chart(fig_customer, use_container_width=True, key="fig_customer_tab2")
+    
+        st.markdown("""
+        <div class="insight-box">
+            <strong>💡 Insight Clave:</strong> El City Hotel domina con el 66.5% de las reservas, 
+            mientras que el 77% de los clientes eligen solo desayuno (BB). 
+            El perfil típico: cliente individual (Transient) sin historial previo.
         </div>
         """, unsafe_allow_html=True)
     
-    st.markdown("<br>", unsafe_allow_html=True)
-    
-    # Gráficos de distribución
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("### 🏨 Distribución por Tipo de Hotel")
-        hotel_dist = data_filtered.groupby("hotel").size().reset_index(name="count")
-        fig_hotel = px.pie(
-            hotel_dist,
-            values="count",
-            names="hotel",
-            color_discrete_sequence=["#1f77b4", "#ff7f0e"],
-            hole=0.4
-        )
-        fig_hotel.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
-        fig_hotel.update_layout(height=400, showlegend=True)
-        st.plotly_chart(fig_hotel, use_container_width=True, key="fig_hotel_tab2")
-    
-    with col2:
-        st.markdown("### 📋 Estado de las Reservas")
-        status_map = {1: "Cancelada", 0: "Completada"}
-        data_filtered_status = data_filtered.copy()
-        data_filtered_status["status"] = data_filtered_status["is_canceled"].map(status_map)
-        
-        status_dist = data_filtered_status.groupby("status").size().reset_index(name="count")
-        fig_status = px.pie(
-            status_dist,
-            values="count",
-            names="status",
-            color_discrete_sequence=["#2ca02c", "#d62728"],
-            hole=0.4
-        )
-        fig_status.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
-        fig_status.update_layout(height=400, showlegend=True)
-        st.plotly_chart(fig_status, use_container_width=True, key="fig_status_tab2")
-    
-    st.markdown("### 🏷️ Tipo de Comida y Clientes")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        if 'meal' in data_filtered.columns:
-            meal_dist = data_filtered.groupby('meal').size().reset_index(name='count')
-            meal_dist = meal_dist.sort_values('count', ascending=False)
-            
-            fig_meal = px.bar(
-                meal_dist,
-                x='meal',
-                y='count',
-                title='Distribución por Tipo de Comida',
-                labels={'meal': 'Tipo de Comida', 'count': 'Número de Reservas'},
-                color='count',
-                color_continuous_scale='Blues'
-            )
-            fig_meal.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig_meal, use_container_width=True, key="fig_meal_tab2")
+        st.markdown("### 👥 Composición de Huéspedes y Duración de Estancias")
     
-    with col2:
-        if 'customer_type' in data_filtered.columns:
-            customer_dist = data_filtered.groupby('customer_type').size().reset_index(name='count')
-            
-            fig_customer = px.bar(
-                customer_dist,
-                x='customer_type',
-                y='count',
-                title='Distribución por Tipo de Cliente',
-                labels={'customer_type': 'Tipo de Cliente', 'count': 'Número de Reservas'},
-                color='count',
-                color_continuous_scale='Purples'
-            )
-            fig_customer.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig_customer, use_container_width=True, key="fig_customer_tab2")
-    
-    st.markdown("""
-    <div class="insight-box">
-        <strong>💡 Insight Clave:</strong> El City Hotel domina con el 66.5% de las reservas, 
-        mientras que el 77% de los clientes eligen solo desayuno (BB). 
-        El perfil típico: cliente individual (Transient) sin historial previo.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("### 👥 Composición de Huéspedes y Duración de Estancias")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        if 'total_guests' in data_filtered.columns:
-            # Distribución de huéspedes
-            guests_dist = data_filtered['total_guests'].value_counts().sort_index().reset_index()
-            guests_dist.columns = ['num_guests', 'count']
-            guests_dist = guests_dist[guests_dist['num_guests'] <= 8]  # Limitar para mejor visualización
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            if 'huespedes' in bundle:
+                def build_fig_guests():
+                    # Distribución de huéspedes
+                    guests_dist = bundle['huespedes'].rename(columns={'total_guests': 'num_guests'})
+                    guests_dist = guests_dist[guests_dist['num_guests'] <= 8]  # Limitar para mejor visualización
             
-            fig_guests = px.bar(
-                guests_dist,
-                x='num_guests',
-                y='count',
-                title='Distribución por Número de Huéspedes',
-                labels={'num_guests': 'Número de Huéspedes', 'count': 'Número de Reservas'},
-                color='count',
-                color_continuous_scale='Teal',
-                text='count'
-            )
-            fig_guests.update_traces(texttemplate='%{text:,}', textposition='outside')
-            fig_guests.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig_guests, use_container_width=True, key="fig_guests_tab2")
-    
-    with col2:
-        if 'total_nights' in data_filtered.columns:
-            # Distribución de noches
-            nights_dist = data_filtered[data_filtered['total_nights'] <= 14].copy()  # Limitar outliers
-            nights_counts = nights_dist['total_nights'].value_counts().sort_index().reset_index()
-            nights_counts.columns = ['num_nights', 'count']
+                    fig_guests = px.bar(
+                        guests_dist,
+                        x='num_guests',
+                        y='count',
+                        title='Distribución por Número de Huéspedes',
+                        labels={'num_guests': 'Número de Huéspedes', 'count': 'Número de Reservas'},
+                        color='count',
+                        color_continuous_scale='Teal',
+                        text='count'
+                    )
+                    fig_guests.update_traces(texttemplate='%{text:,}', textposition='outside')
+                    fig_guests.update_layout(height=400, showlegend=False)
+                    return fig_guests
+                fig_guests = cached_figure("fig_guests", build_fig_guests)
+                st.plotly_chart(fig_guests, use_container_width=True, key="fig_guests_tab2")
+    
+        with col2:
+            if 'noches' in bundle:
+                def build_fig_nights():
+                    # Distribución de noches
+                    nights_counts = bundle['noches'].rename(columns={'total_nights': 'num_nights'})
+                    nights_counts = nights_counts[nights_counts['num_nights'] <= 14]  # Limitar outliers
             
-            fig_nights = px.bar(
-                nights_counts,
-                x='num_nights',
-                y='count',
-                title='Distribución por Duración de Estancia (Noches)',
-                labels={'num_nights': 'Número de Noches', 'count': 'Número de Reservas'},
-                color='count',
-                color_continuous_scale='Magma',
-                text='count'
-            )
-            fig_nights.update_traces(texttemplate='%{text:,}', textposition='outside')
-            fig_nights.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig_nights, use_container_width=True, key="fig_nights_tab2")
+                    fig_nights = px.bar(
+                        nights_counts,
+                        x='num_nights',
+                        y='count',
+                        title='Distribución por Duración de Estancia (Noches)',
+                        labels={'num_nights': 'Número de Noches', 'count': 'Número de Reservas'},
+                        color='count',
+                        color_continuous_scale='Magma',
+                        text='count'
+                    )
+                    fig_nights.update_traces(texttemplate='%{text:,}', textposition='outside')
+                    fig_nights.update_layout(height=400, showlegend=False)
+                    return fig_nights
+                fig_nights = cached_figure("fig_nights", build_fig_nights)
+                st.plotly_chart(fig_nights, use_container_width=True, key="fig_nights_tab2")
+
+        # Diagramas de caja a partir de los resúmenes de cuantiles
+        st.markdown("### 📦 Distribución de Precio, Antelación y Estancia")
+
+        @st.fragment
+        def cajas_distribucion():
+            # Fragmento aislado: las cajas salen de cuantiles ya resumidos, sin ordenar reservas
+            col1, col2 = st.columns(2)
+            with col1:
+                variable = st.radio("Variable", list(BOX_VARIABLES), horizontal=True, key="caja_variable_tab2")
+            with col2:
+                grupo = st.radio("Agrupar por", list(BOX_GROUPS), horizontal=True, key="caja_grupo_tab2")
+            column, unit = BOX_VARIABLES[variable]
+            by = BOX_GROUPS[grupo]
+            summary = distribution_summary(column, by)
+
+            def build_fig_box():
+                fig_box = go.Figure(go.Box(
+                    x=summary[by],
+                    q1=summary['p25'],
+                    median=summary['median'],
+                    q3=summary['p75'],
+                    lowerfence=summary['lowerfence'],
+                    upperfence=summary['upperfence'],
+                    name=variable,
+                    marker_color='#1f77b4',
+                    boxpoints=False
+                ))
+                fig_box.update_layout(
+                    title=f'Distribución de {variable} por {grupo}',
+                    xaxis_title=grupo,
+                    yaxis_title=f'{variable} ({unit})',
+                    height=450,
+                    showlegend=False
+                )
+                return fig_box
+            fig_box = cached_figure(f"fig_box_{column}_{by}", build_fig_box)
+            st.plotly_chart(fig_box, use_container_width=True, key="fig_box_tab2")
+            if len(summary):
+                st.caption(
+                    f"Bigotes de 1,5 veces el rango intercuartílico, con tope en el percentil "
+                    f"{OUTLIER_QUANTILE * 100:g} ({summary['cap'].max():,.1f} {unit}): lo que queda por encima "
+                    f"se trata como atípico. Error de rango máximo de los cuantiles: "
+                    f"{summary['rank_error'].max() * 100:.2f}%."
+                )
+
+        cajas_distribucion()
 
 # ============================================
 # TAB 3: EL FACTOR TIEMPO
 # ============================================
 with tab3:
-    st.markdown("""
-    <div class="chapter-intro">
-    El tiempo es el protagonista silencioso de las cancelaciones. <strong>¿Cuándo se reserva? 
-    ¿Cuándo se cancela?</strong> Estas respuestas revelan patrones críticos para la gestión hotelera.
-    <br><br>
-    La anticipación (lead time) y la estacionalidad son dos factores que pueden predecir el comportamiento de cancelación.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Evolución temporal de reservas por hotel
-    st.markdown("### 📅 Evolución Temporal de Reservas por Hotel")
-    
-    if 'dia' in data_filtered.columns:
-        df_time = data_filtered.dropna(subset=['dia']).copy()
-        df_time['year_month'] = df_time['dia'].dt.to_period('M').astype(str)
-        
-        monthly = df_time.groupby(['year_month', 'hotel']).size().reset_index(name='reservas')
+    if tab3.open:
+        st.markdown("""
+        <div class="chapter-intro">
+        El tiempo es el protagonista silencioso de las cancelaciones. <strong>¿Cuándo se reserva? 
+        ¿Cuándo se cancela?</strong> Estas respuestas revelan patrones críticos para la gestión hotelera.
+        <br><br>
+        La anticipación (lead time) y la estacionalidad son dos factores que pueden predecir el comportamiento de cancelación.
+        </div>
+        """, unsafe_allow_html=True)
+    
+        # Evolución temporal de reservas por hotel
+        st.markdown("### 📅 Evolución Temporal de Reservas por Hotel")
+    
+        @st.fragment
+        def evolucion_temporal():
+            # Fragmento aislado: cambiar el periodo o las opciones solo reejecuta este gráfico.
+            # Las series salen del cubo diario, sin reagrupar reservas
+            col1, col2, col3 = st.columns([2, 1, 1])
+            with col1:
+                periodo = st.radio("Periodo", list(TIME_FREQUENCIES), index=1, horizontal=True, key="periodo_tab3")
+            with col2:
+                suavizar = st.checkbox(f"Media móvil ({ROLLING_WINDOW} periodos)", key="media_movil_tab3")
+            with col3:
+                interanual = st.checkbox("Variación interanual", key="interanual_tab3")
+            freq = TIME_FREQUENCIES[periodo]
+
+            def build_series():
+                series = get_daily_cube().resample(filters, freq, by=('hotel',))
+                n_hotels = series['hotel'].nunique()
+                series['media_movil'] = rolling_mean(series, 'count', ROLLING_WINDOW, n_hotels)
+                return pd.concat([series, year_over_year(series, 'count', freq, n_hotels)], axis=1)
+            series = result_cache.get_or_compute((filter_key, "serie", freq), build_series)
+
+            def build_fig_time_hotel():
+                reservas = series.rename(columns={'media_movil' if suavizar else 'count': 'reservas'})
         
-        fig_time_hotel = px.line(
-            monthly,
-            x='year_month',
-            y='reservas',
-            color='hotel',
-            title='Evolución Temporal de Reservas por Tipo de Hotel',
-            labels={'year_month': 'Mes', 'reservas': 'Número de Reservas', 'hotel': 'Tipo de Hotel'},
-            color_discrete_sequence=['#1f77b4', '#ff7f0e'],
-            markers=True
-        )
-        fig_time_hotel.update_layout(height=450, hovermode='x unified')
-        fig_time_hotel.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_time_hotel, use_container_width=True, key="fig_time_hotel_tab3")
-    
-    # Evolución de cancelaciones por temporada
-    st.markdown("### 📊 Comparativa por Temporada: Completadas vs Canceladas")
-    
-    if 'season' in data_filtered.columns:
-        season_order = ['Primavera', 'Verano', 'Otoño', 'Invierno']
-        season_cancellations = data_filtered.groupby(['season', 'is_canceled']).size().reset_index(name='count')
-        season_cancellations['status'] = season_cancellations['is_canceled'].map({0: 'Completadas', 1: 'Canceladas'})
+                fig_time_hotel = px.line(
+                    reservas,
+                    x='period',
+                    y='reservas',
+                    color='hotel',
+                    title='Evolución Temporal de Reservas por Tipo de Hotel',
+                    labels={'period': periodo, 'reservas': 'Número de Reservas', 'hotel': 'Tipo de Hotel'},
+                    color_discrete_sequence=['#1f77b4', '#ff7f0e'],
+                    markers=True
+                )
+                fig_time_hotel.update_layout(height=450, hovermode='x unified')
+                fig_time_hotel.update_xaxes(tickangle=45)
+                return fig_time_hotel
+            fig_time_hotel = cached_figure(f"fig_time_hotel_{freq}_{suavizar}", build_fig_time_hotel)
+            st.plotly_chart(fig_time_hotel, use_container_width=True, key="fig_time_hotel_tab3")
+
+            if interanual:
+                def build_fig_yoy():
+                    fig_yoy = px.bar(
+                        series.dropna(subset=['yoy']),
+                        x='period',
+                        y='yoy',
+                        color='hotel',
+                        barmode='group',
+                        title='Variación Interanual de Reservas (mismo periodo del año anterior)',
+                        labels={'period': periodo, 'yoy': 'Variación (%)', 'hotel': 'Tipo de Hotel'},
+                        color_discrete_sequence=['#1f77b4', '#ff7f0e']
+                    )
+                    fig_yoy.add_hline(y=0, line_color='gray')
+                    fig_yoy.update_layout(height=350)
+                    fig_yoy.update_xaxes(tickangle=45)
+                    return fig_yoy
+                fig_yoy = cached_figure(f"fig_yoy_{freq}", build_fig_yoy)
+                st.plotly_chart(fig_yoy, use_container_width=True, key="fig_yoy_tab3")
+
+        evolucion_temporal()
+    
+        # Evolución de cancelaciones por temporada
+        st.markdown("### 📊 Comparativa por Temporada: Completadas vs Canceladas")
+    
+        if 'season' in cube.tables:
+            def build_fig_season():
+                season_order = ['Primavera', 'Verano', 'Otoño', 'Invierno']
+                season_counts = cube.slice('season', filters)
+                season_cancellations = pd.concat([
+                    season_counts.assign(is_canceled=0, count=season_counts['count'] - season_counts['canceled']),
+                    season_counts.assign(is_canceled=1, count=season_counts['canceled'])
+                ])[['season', 'is_canceled', 'count']]
+                season_cancellations = season_cancellations[season_cancellations['count'] > 0]
+                season_cancellations['status'] = season_cancellations['is_canceled'].map({0: 'Completadas', 1: 'Canceladas'})
         
-        # Ordenar por temporada
-        season_cancellations['season'] = pd.Categorical(season_cancellations['season'], categories=season_order, ordered=True)
-        season_cancellations = season_cancellations.sort_values('season')
+                # Ordenar por temporada
+                season_cancellations['season'] = pd.Categorical(season_cancellations['season'], categories=season_order, ordered=True)
+                season_cancellations = season_cancellations.sort_values('season')
         
-        fig_season = px.bar(
-            season_cancellations,
-            x='season',
-            y='count',
-            color='status',
-            barmode='group',
-            title='Reservas Completadas vs Canceladas por Temporada',
-            labels={'season': 'Temporada', 'count': 'Número de Reservas', 'status': 'Estado'},
-            color_discrete_map={'Completadas': '#2ca02c', 'Canceladas': '#d62728'}
-        )
-        fig_season.update_layout(height=450)
-        st.plotly_chart(fig_season, use_container_width=True, key="fig_season_tab3")
-    
-    st.markdown("""
-    <div class="insight-box">
-        <strong>💡 Insight Clave:</strong> Los picos de cancelaciones coinciden con la temporada alta (verano). 
-        Mayor demanda = mayor flexibilidad percibida para cancelar.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Lead Time vs Cancelaciones
-    st.markdown("### ⏳ Lead Time: El Factor Predictivo")
-    
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        if 'lead_time_category' in data_filtered.columns:
-            # Ordenar categorías
-            category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
-            
-            lead_cancel = data_filtered.groupby('lead_time_category')['is_canceled'].agg(['sum', 'count']).reset_index()
-            lead_cancel['cancel_rate'] = (lead_cancel['sum'] / lead_cancel['count'] * 100).round(2)
-            
-            # Ordenar
-            lead_cancel['lead_time_category'] = pd.Categorical(lead_cancel['lead_time_category'], categories=category_order, ordered=True)
-            lead_cancel = lead_cancel.sort_values('lead_time_category')
-            
-            fig_lead = px.bar(
-                lead_cancel,
-                x='lead_time_category',
-                y='cancel_rate',
-                title='Tasa de Cancelación según Anticipación de la Reserva',
-                labels={'lead_time_category': 'Anticipación (Lead Time)', 'cancel_rate': 'Tasa de Cancelación (%)'},
-                color='cancel_rate',
-                color_continuous_scale='Reds',
-                text='cancel_rate'
+                fig_season = px.bar(
+                    season_cancellations,
+                    x='season',
+                    y='count',
+                    color='status',
+                    barmode='group',
+                    title='Reservas Completadas vs Canceladas por Temporada',
+                    labels={'season': 'Temporada', 'count': 'Número de Reservas', 'status': 'Estado'},
+                    color_discrete_map={'Completadas': '#2ca02c', 'Canceladas': '#d62728'}
+                )
+                fig_season.update_layout(height=450)
+                return fig_season
+            fig_season = cached_figure("fig_season", build_fig_season)
+            st.plotly_chart(fig_season, use_container_width=True, key="fig_season_tab3")
+    
+        st.markdown("""
+        <div class="insight-box">
+            <strong>💡 Insight Clave:</strong> Los picos de cancelaciones coinciden con la temporada alta (verano). 
+            Mayor demanda = mayor flexibilidad percibida para cancelar.
+        </div>
+        """, unsafe_allow_html=True)
+    
+        # Ocupación por noche: estancias alojadas cada noche, no solo llegadas
+        st.markdown("### 🛏️ Ocupación por Noche")
+    
+        def build_fig_occupancy():
+            occupancy = get_daily_cube(all_years=True).occupancy(filters, by=('hotel', 'is_canceled'))
+            occupancy['status'] = occupancy['is_canceled'].map({0: 'Completadas', 1: 'Canceladas'})
+    
+            fig_occupancy = px.line(
+                occupancy,
+                x='date',
+                y='occupancy',
+                color='hotel',
+                line_dash='status',
+                title='Habitaciones Ocupadas por Noche (las canceladas, las que habrían ocupado)',
+                labels={'date': 'Noche', 'occupancy': 'Habitaciones', 'hotel': 'Tipo de Hotel', 'status': 'Estado'},
+                color_discrete_sequence=['#1f77b4', '#ff7f0e']
+            )
+            fig_occupancy.update_layout(height=450, hovermode='x unified')
+            return fig_occupancy
+        fig_occupancy = cached_figure("fig_occupancy", build_fig_occupancy)
+        st.plotly_chart(fig_occupancy, use_container_width=True, key="fig_occupancy_tab3")
+
+        # Calendario de llegadas: semana x día de la semana, por hotel
+        st.markdown("### 🗓️ Calendario de Llegadas y Cancelaciones")
+
+        @st.fragment
+        def calendario_llegadas():
+            # Fragmento aislado: la rejilla es un corte de la matriz diaria cargada al
+            # inicio, y la figura envía la matriz compacta, no una fila por día
+            medida = st.radio("Medida", list(CALENDAR_MEASURES), horizontal=True, key="calendario_tab3")
+            attribute, color_scale = CALENDAR_MEASURES[medida]
+
+            def build_fig_calendar():
+                grid = result_cache.get_or_compute(
+                    (filter_key, "calendar"), lambda: get_daily_cube().weekday_grid(filters)
+                )
+                fig_calendar = px.imshow(
+                    getattr(grid, attribute).transpose(0, 2, 1),
+                    x=grid.weeks,
+                    y=WEEKDAY_LABELS,
+                    facet_col=0,
+                    facet_col_wrap=1,
+                    color_continuous_scale=color_scale,
+                    aspect='auto',
+                    title=f'{medida} por Día: Semana x Día de la Semana',
+                    labels={'x': 'Semana', 'y': 'Día', 'color': medida}
+                )
+                # Títulos de faceta con el hotel en lugar del índice del eje
+                fig_calendar.for_each_annotation(lambda a: a.update(text=grid.hotels[int(a.text.split('=')[-1])]))
+                fig_calendar.update_layout(height=220 * max(len(grid.hotels), 1) + 80)
+                return fig_calendar
+            fig_calendar = cached_figure(f"fig_calendar_{attribute}", build_fig_calendar)
+            st.plotly_chart(fig_calendar, use_container_width=True, key="fig_calendar_tab3")
+
+        calendario_llegadas()
+    
+        # Estancias que solapan una ventana de fechas
+        st.markdown("### 🔎 Estancias en una Ventana de Fechas")
+    
+        @st.fragment
+        def ventana_estancias():
+            # Fragmento aislado: cambiar la ventana solo reejecuta la consulta al índice de intervalos.
+            # La ventana sustituye al rango de años: cuenta estancias que llegaron antes de ella
+            first_night = date(year_range[0], 1, 1)
+            last_night = date(year_range[1], 12, 31)
+            ventana = st.date_input(
+                "Noches de la ventana",
+                value=(date(year_range[1], 8, 10), date(year_range[1], 8, 20)),
+                min_value=first_night,
+                max_value=last_night,
+                key="ventana_tab3"
             )
-            fig_lead.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            fig_lead.update_layout(height=450, showlegend=False)
-            fig_lead.update_xaxes(tickangle=45)
-            st.plotly_chart(fig_lead, use_container_width=True, key="fig_lead_tab3")
+            if len(ventana) < 2:
+                st.info("Selecciona la primera y la última noche de la ventana.")
+                return
+    
+            stays = load_stay_index(data_version).stats(
+                ventana[0], ventana[1] + timedelta(days=1), dict(filters, arrival_date_year=None)
+            )
+            tasa = stays['canceled'] / stays['count'] * 100 if stays['count'] else 0.0
+            for col, value, label, color in zip(st.columns(4), [
+                f"{int(stays['count']):,}",
+                f"{tasa:.1f}%",
+                f"€{stays['revenue'] - stays['canceled_revenue']:,.0f}",
+                f"€{stays['canceled_revenue']:,.0f}",
+            ], [
+                'Estancias en la Ventana', 'Tasa de Cancelación', 'Ingresos (Completadas)', 'Ingresos Perdidos',
+            ], ['#1f77b4', '#dc3545', '#28a745', '#dc3545']):
+                with col:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div class="metric-value" style="color: {color};">{value}</div>
+                        <div class="metric-label">{label}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            st.caption("Ingresos: ADR × noches de cada estancia completa que solapa la ventana.")
+    
+        ventana_estancias()
+    
+        # Cartera de reservas (on the books) reconstruida día a día
+        st.markdown("### 📒 Reservas en Cartera a Cada Fecha")
+    
+        def build_fig_on_books():
+            book = load_on_the_books(data_version)
+            snapshot = book.snapshot(np.arange(book.first_day, book.last_day + 1), filters)
+            # Desde la primera alta de la selección
+            snapshot = snapshot[snapshot['on_books'].cumsum() > 0].reset_index()
+            cartera = snapshot.melt(
+                id_vars='as_of', value_vars=['on_books', 'to_cancel'], var_name='serie', value_name='reservas'
+            )
+            cartera['serie'] = cartera['serie'].map({'on_books': 'En cartera', 'to_cancel': 'De ellas, se cancelarán'})
+    
+            fig_on_books = px.line(
+                cartera,
+                x='as_of',
+                y='reservas',
+                color='serie',
+                title='Reservas con Llegada Futura en Cartera y Cancelaciones Pendientes',
+                labels={'as_of': 'Fecha', 'reservas': 'Reservas', 'serie': ''},
+                color_discrete_map={'En cartera': '#1f77b4', 'De ellas, se cancelarán': '#d62728'}
+            )
+            fig_on_books.update_layout(height=450, hovermode='x unified')
+            return fig_on_books
+        fig_on_books = cached_figure("fig_on_books", build_fig_on_books)
+        st.plotly_chart(fig_on_books, use_container_width=True, key="fig_on_books_tab3")
     
-    with col2:
-        st.markdown("<br><br>", unsafe_allow_html=True)
         st.markdown("""
-        ### 🎯 Patrón Revelador
-        
-        **A mayor anticipación, mayor riesgo:**
+        <div class="insight-box">
+            <strong>💡 Riesgo en cartera:</strong> la línea roja es la parte de la cartera de cada día que
+            terminó cancelándose. Su peso sobre el total anticipa cuántas habitaciones vendidas no llegarán a ocuparse.
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Curvas de ritmo (booking pace) por periodo de llegada
+        st.markdown("### ⏱️ Ritmo de Reservas antes de la Llegada")
+
+        @st.fragment
+        def curvas_ritmo():
+            # Fragmento aislado: las curvas de todos los periodos salen de un único
+            # histograma (periodo x días de antelación), cacheado por estado de filtros
+            col1, col2 = st.columns(2)
+            with col1:
+                periodo = st.radio("Una curva por", list(PACE_PERIODS), horizontal=True, key="ritmo_periodo_tab3")
+            with col2:
+                serie = st.radio("Serie", list(PACE_SERIES), horizontal=True, key="ritmo_serie_tab3")
+            by, column = PACE_PERIODS[periodo], PACE_SERIES[serie]
+
+            def build_fig_pace():
+                pace = result_cache.get_or_compute(
+                    (filter_key, "pace", by), lambda: load_on_the_books(data_version).pace(filters, by)
+                )
+                fig_pace = px.line(
+                    pace,
+                    x='days_before',
+                    y=column,
+                    color='period',
+                    title=f'{serie} Acumuladas según los Días que Faltan para la Llegada',
+                    labels={'days_before': 'Días antes de la llegada', column: 'Reservas', 'period': periodo},
+                    hover_data=['created', 'canceled', 'on_books']
+                )
+                # Eje de antelación decreciente: la curva avanza hacia el día de llegada
+                fig_pace.update_xaxes(autorange='reversed')
+                fig_pace.update_layout(height=450, hovermode='x unified')
+                return fig_pace
+            fig_pace = cached_figure(f"fig_pace_{by}_{column}", build_fig_pace)
+            st.plotly_chart(fig_pace, use_container_width=True, key="fig_pace_tab3")
+            st.caption(f"Las reservas hechas con más de {PACE_MAX_DAYS} días de antelación se acumulan en el primer punto.")
+
+        curvas_ritmo()
+    
+        # Lead Time vs Cancelaciones
+        st.markdown("### ⏳ Lead Time: El Factor Predictivo")
+    
+        col1, col2 = st.columns([2, 1])
+    
+        with col1:
+            if 'lead_time_category' in cube.tables:
+                def build_fig_lead():
+                    # Ordenar categorías
+                    category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
+            
+                    lead_cancel = cube.slice('lead_time_category', filters, drop_empty=True).rename(columns={'canceled': 'sum'})
+                    lead_cancel['cancel_rate'] = (lead_cancel['sum'] / lead_cancel['count'] * 100).round(2)
+            
+                    # Ordenar
+                    lead_cancel['lead_time_category'] = pd.Categorical(lead_cancel['lead_time_category'], categories=category_order, ordered=True)
+                    lead_cancel = lead_cancel.sort_values('lead_time_category')
+            
+                    fig_lead = px.bar(
+                        lead_cancel,
+                        x='lead_time_category',
+                        y='cancel_rate',
+                        title='Tasa de Cancelación según Anticipación de la Reserva',
+                        labels={'lead_time_category': 'Anticipación (Lead Time)', 'cancel_rate': 'Tasa de Cancelación (%)'},
+                        color='cancel_rate',
+                        color_continuous_scale='Reds',
+                        text='cancel_rate'
+                    )
+                    fig_lead.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                    fig_lead.update_layout(height=450, showlegend=False)
+                    fig_lead.update_xaxes(tickangle=45)
+                    return fig_lead
+                fig_lead = cached_figure("fig_lead", build_fig_lead)
+                st.plotly_chart(fig_lead, use_container_width=True, key="fig_lead_tab3")
+    
+        with col2:
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            st.markdown("""
+            ### 🎯 Patrón Revelador
         
-        - **< 30 días**: Compromiso alto, cancelación baja
-        - **30-90 días**: Zona intermedia
-        - **> 180 días**: Alto riesgo de cancelación
+            **A mayor anticipación, mayor riesgo:**
         
-        **¿Por qué?** 
+            - **< 30 días**: Compromiso alto, cancelación baja
+            - **30-90 días**: Zona intermedia
+            - **> 180 días**: Alto riesgo de cancelación
         
-        Más tiempo entre reserva y llegada significa:
-        - Mayor probabilidad de cambio de planes
-        - Menos compromiso emocional
-        - Búsqueda de mejores ofertas
-        """)
-    
-    # Distribución de lead time
-    st.markdown("### 📊 Distribución de Reservas por Categoría de Lead Time")
-    
-    if 'lead_time_category' in data_filtered.columns:
-        category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
+            **¿Por qué?** 
         
-        lead_dist = data_filtered['lead_time_category'].value_counts().reset_index()
-        lead_dist.columns = ['lead_time_category', 'count']
+            Más tiempo entre reserva y llegada significa:
+            - Mayor probabilidad de cambio de planes
+            - Menos compromiso emocional
+            - Búsqueda de mejores ofertas
+            """)
+    
+        # Distribución de lead time
+        st.markdown("### 📊 Distribución de Reservas por Categoría de Lead Time")
+    
+        if 'lead_time_category' in cube.tables:
+            def build_fig_lead_dist():
+                category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
         
-        # Ordenar
-        lead_dist['lead_time_category'] = pd.Categorical(lead_dist['lead_time_category'], categories=category_order, ordered=True)
-        lead_dist = lead_dist.sort_values('lead_time_category')
+                lead_dist = cube.slice('lead_time_category', filters)[['lead_time_category', 'count']]
         
-        fig_lead_dist = px.bar(
-            lead_dist,
-            x='lead_time_category',
-            y='count',
-            title='Número de Reservas por Categoría de Anticipación',
-            labels={'lead_time_category': 'Categoría de Lead Time', 'count': 'Número de Reservas'},
-            color='count',
-            color_continuous_scale='Blues',
-            text='count'
-        )
-        fig_lead_dist.update_traces(texttemplate='%{text:,}', textposition='outside')
-        fig_lead_dist.update_layout(height=400, showlegend=False)
-        fig_lead_dist.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_lead_dist, use_container_width=True, key="fig_lead_dist_tab3")
-    
-    # Relación Lead Time y Duración de Estancia
-    st.markdown("### 🔄 Lead Time vs Duración de Estancia")
-    
-    if 'lead_time_category' in data_filtered.columns and 'total_nights' in data_filtered.columns:
-        category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
+                # Ordenar
+                lead_dist['lead_time_category'] = pd.Categorical(lead_dist['lead_time_category'], categories=category_order, ordered=True)
+                lead_dist = lead_dist.sort_values('lead_time_category')
         
-        # Filtrar outliers en noches
-        lead_nights = data_filtered[data_filtered['total_nights'] <= 20].copy()
+                fig_lead_dist = px.bar(
+                    lead_dist,
+                    x='lead_time_category',
+                    y='count',
+                    title='Número de Reservas por Categoría de Anticipación',
+                    labels={'lead_time_category': 'Categoría de Lead Time', 'count': 'Número de Reservas'},
+                    color='count',
+                    color_continuous_scale='Blues',
+                    text='count'
+                )
+                fig_lead_dist.update_traces(texttemplate='%{text:,}', textposition='outside')
+                fig_lead_dist.update_layout(height=400, showlegend=False)
+                fig_lead_dist.update_xaxes(tickangle=45)
+                return fig_lead_dist
+            fig_lead_dist = cached_figure("fig_lead_dist", build_fig_lead_dist)
+            st.plotly_chart(fig_lead_dist, use_container_width=True, key="fig_lead_dist_tab3")
+    
+        # Relación Lead Time y Duración de Estancia
+        st.markdown("### 🔄 Lead Time vs Duración de Estancia")
+    
+        if 'lead_noches' in bundle:
+            def build_fig_lead_nights():
+                category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
         
-        lead_nights_avg = lead_nights.groupby('lead_time_category')['total_nights'].agg(['mean', 'median', 'count']).reset_index()
-        lead_nights_avg.columns = ['lead_time_category', 'promedio_noches', 'mediana_noches', 'num_reservas']
+                # Filtrar outliers en noches
+                lead_nights = bundle['lead_noches']
+                lead_nights = lead_nights[lead_nights['total_nights'] <= 20]
         
-        # Ordenar
-        lead_nights_avg['lead_time_category'] = pd.Categorical(lead_nights_avg['lead_time_category'], categories=category_order, ordered=True)
-        lead_nights_avg = lead_nights_avg.sort_values('lead_time_category')
+                lead_nights_avg = histogram_stats(lead_nights, 'lead_time_category', 'total_nights')
+                lead_nights_avg.columns = ['lead_time_category', 'promedio_noches', 'mediana_noches', 'num_reservas']
         
-        fig_lead_nights = go.Figure()
+                # Ordenar
+                lead_nights_avg['lead_time_category'] = pd.Categorical(lead_nights_avg['lead_time_category'], categories=category_order, ordered=True)
+                lead_nights_avg = lead_nights_avg.sort_values('lead_time_category')
         
-        fig_lead_nights.add_trace(go.Bar(
-            name='Promedio de Noches',
-            x=lead_nights_avg['lead_time_category'],
-            y=lead_nights_avg['promedio_noches'],
-            marker_color='#1f77b4',
-            text=lead_nights_avg['promedio_noches'].round(1),
-            texttemplate='%{text:.1f}',
-            textposition='outside'
-        ))
+                fig_lead_nights = go.Figure()
         
-        fig_lead_nights.add_trace(go.Scatter(
-            name='Mediana de Noches',
-            x=lead_nights_avg['lead_time_category'],
-            y=lead_nights_avg['mediana_noches'],
-            mode='lines+markers',
-            marker=dict(color='#ff7f0e', size=10),
-            line=dict(color='#ff7f0e', width=3)
-        ))
+                fig_lead_nights.add_trace(go.Bar(
+                    name='Promedio de Noches',
+                    x=lead_nights_avg['lead_time_category'],
+                    y=lead_nights_avg['promedio_noches'],
+                    marker_color='#1f77b4',
+                    text=lead_nights_avg['promedio_noches'].round(1),
+                    texttemplate='%{text:.1f}',
+                    textposition='outside'
+                ))
         
-        fig_lead_nights.update_layout(
-            title='Duración Promedio de Estancia según Anticipación de Reserva',
-            xaxis_title='Categoría de Lead Time',
-            yaxis_title='Número de Noches',
-            height=450,
-            hovermode='x unified',
-            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
-        )
-        fig_lead_nights.update_xaxes(tickangle=45)
+                fig_lead_nights.add_trace(go.Scatter(
+                    name='Mediana de Noches',
+                    x=lead_nights_avg['lead_time_category'],
+                    y=lead_nights_avg['mediana_noches'],
+                    mode='lines+markers',
+                    marker=dict(color='#ff7f0e', size=10),
+                    line=dict(color='#ff7f0e', width=3)
+                ))
         
-        st.plotly_chart(fig_lead_nights, use_container_width=True, key="fig_lead_nights_tab3")
+                fig_lead_nights.update_layout(
+                    title='Duración Promedio de Estancia según Anticipación de Reserva',
+                    xaxis_title='Categoría de Lead Time',
+                    yaxis_title='Número de Noches',
+                    height=450,
+                    hovermode='x unified',
+                    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+                )
+                fig_lead_nights.update_xaxes(tickangle=45)
+                return fig_lead_nights
+            fig_lead_nights = cached_figure("fig_lead_nights", build_fig_lead_nights)
+            st.plotly_chart(fig_lead_nights, use_container_width=True, key="fig_lead_nights_tab3")
         
-        st.markdown("""
-        <div class="insight-box">
-            <strong>💡 Insight Clave:</strong> Las reservas con mayor anticipación (lead time) tienden a tener 
-            estancias ligeramente más largas, lo que sugiere que los clientes que planifican con más antelación 
-            buscan experiencias más prolongadas. Sin embargo, también presentan mayor riesgo de cancelación.
-        </div>
-        """, unsafe_allow_html=True)
+            st.markdown("""
+            <div class="insight-box">
+                <strong>💡 Insight Clave:</strong> Las reservas con mayor anticipación (lead time) tienden a tener 
+                estancias ligeramente más largas, lo que sugiere que los clientes que planifican con más antelación 
+                buscan experiencias más prolongadas. Sin embargo, también presentan mayor riesgo de cancelación.
+            </div>
+            """, unsafe_allow_html=True)
 
 # ============================================
 # TAB 4: CANALES Y COMPORTAMIENTO
 # ============================================
 with tab4:
-    st.markdown("""
-    <div class="chapter-intro">
-    ¿Cómo llegan los clientes al hotel? ¿Quiénes son? La <strong>distribución y tipología de clientes</strong> 
-    revelan dependencias críticas del negocio. La dependencia de OTAs supera el 80%, 
-    lo que facilita las cancelaciones pero amplifica el alcance de mercado.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("### 📱 Canales de Distribución")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Canal de distribución
-        if 'distribution_channel' in data_filtered.columns:
-            channel_dist = data_filtered.groupby('distribution_channel').size().reset_index(name='count')
-            channel_dist = channel_dist.sort_values('count', ascending=False)
-            
-            fig_channel = px.bar(
-                channel_dist,
-                x='count',
-                y='distribution_channel',
-                orientation='h',
-                title='Reservas por Canal de Distribución',
-                labels={'distribution_channel': 'Canal', 'count': 'Número de Reservas'},
-                color='count',
-                color_continuous_scale='Blues',
-                text='count'
-            )
-            fig_channel.update_traces(texttemplate='%{text:,}', textposition='outside')
-            fig_channel.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig_channel, use_container_width=True, key="fig_channel_tab4")
-    
-    with col2:
-        # Segmento de mercado
-        if 'market_segment' in data_filtered.columns:
-            market_dist = data_filtered.groupby('market_segment').size().reset_index(name='count')
-            market_dist = market_dist.sort_values('count', ascending=False)
+    if tab4.open:
+        st.markdown("""
+        <div class="chapter-intro">
+        ¿Cómo llegan los clientes al hotel? ¿Quiénes son? La <strong>distribución y tipología de clientes</strong> 
+        revelan dependencias críticas del negocio. La dependencia de OTAs supera el 80%, 
+        lo que facilita las cancelaciones pero amplifica el alcance de mercado.
+        </div>
+        """, unsafe_allow_html=True)
+    
+        st.markdown("### 📱 Canales de Distribución")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            # Canal de distribución
+            if 'distribution_channel' in cube.tables:
+                def build_fig_channel():
+                    channel_dist = cube.slice('distribution_channel', filters)[['distribution_channel', 'count']]
+                    channel_dist = channel_dist.sort_values('count', ascending=False)
             
-            fig_market_dist = px.pie(
-                market_dist,
-                values='count',
-                names='market_segment',
-                title='Distribución por Segmento de Mercado',
-                hole=0.4
-            )
-            fig_market_dist.update_traces(textposition='inside', textinfo='percent+label')
-            fig_market_dist.update_layout(height=400)
-            st.plotly_chart(fig_market_dist, use_container_width=True, key="fig_market_dist_tab4")
-    
-    st.markdown("""
-    <div class="insight-box">
-        <strong>💡 Insight Clave:</strong> La dependencia de OTAs (TA/TO) supera el 82% de las reservas. 
-        Esta intermediación digital facilita las cancelaciones con un simple clic pero amplifica el alcance de mercado.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("### 📊 Comportamiento por Canal y Segmento")
-    
-    # Tasa de cancelación por segmento de mercado
-    if 'market_segment' in data_filtered.columns:
-        market_cancel = data_filtered.groupby('market_segment').agg({
-            'is_canceled': ['sum', 'count']
-        }).reset_index()
-        market_cancel.columns = ['market_segment', 'canceled', 'total']
-        market_cancel['cancel_rate'] = (market_cancel['canceled'] / market_cancel['total'] * 100).round(2)
-        market_cancel = market_cancel.sort_values('cancel_rate', ascending=False)
-        
-        fig_market = px.bar(
-            market_cancel,
-            x='market_segment',
-            y='cancel_rate',
-            title='Tasa de Cancelación por Segmento de Mercado',
-            labels={'market_segment': 'Segmento de Mercado', 'cancel_rate': 'Tasa de Cancelación (%)'},
-            color='cancel_rate',
-            color_continuous_scale='Oranges',
-            text='cancel_rate'
-        )
-        fig_market.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-        fig_market.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_market, use_container_width=True, key="fig_market_tab4")
-    
-    # Huéspedes repetidos vs nuevos
-    st.markdown("### 🔄 Fidelización: El Talón de Aquiles")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        if 'is_repeated_guest' in data_filtered.columns:
-            repeated_dist = data_filtered.groupby('is_repeated_guest').size().reset_index(name='count')
-            repeated_dist['type'] = repeated_dist['is_repeated_guest'].map({0: 'Nuevos', 1: 'Repetidos'})
+                    fig_channel = px.bar(
+                        channel_dist,
+                        x='count',
+                        y='distribution_channel',
+                        orientation='h',
+                        title='Reservas por Canal de Distribución',
+                        labels={'distribution_channel': 'Canal', 'count': 'Número de Reservas'},
+                        color='count',
+                        color_continuous_scale='Blues',
+                        text='count'
+                    )
+                    fig_channel.update_traces(texttemplate='%{text:,}', textposition='outside')
+                    fig_channel.update_layout(height=400, showlegend=False)
+                    return fig_channel
+                fig_channel = cached_figure("fig_channel", build_fig_channel)
+                st.plotly_chart(fig_channel, use_container_width=True, key="fig_channel_tab4")
+    
+        with col2:
+            # Segmento de mercado
+            if 'market_segment' in cube.tables:
+                def build_fig_market_dist():
+                    market_dist = cube.slice('market_segment', filters)[['market_segment', 'count']]
+                    market_dist = market_dist.sort_values('count', ascending=False)
             
-            fig_repeated = px.pie(
-                repeated_dist,
-                values='count',
-                names='type',
-                title='Distribución de Huéspedes: Nuevos vs Repetidos',
-                color_discrete_sequence=['#ff7f0e', '#2ca02c'],
-                hole=0.4
-            )
-            fig_repeated.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
-            fig_repeated.update_layout(height=400)
-            st.plotly_chart(fig_repeated, use_container_width=True, key="fig_repeated_tab4")
+                    fig_market_dist = px.pie(
+                        market_dist,
+                        values='count',
+                        names='market_segment',
+                        title='Distribución por Segmento de Mercado',
+                        hole=0.4
+                    )
+                    fig_market_dist.update_traces(textposition='inside', textinfo='percent+label')
+                    fig_market_dist.update_layout(height=400)
+                    return fig_market_dist
+                fig_market_dist = cached_figure("fig_market_dist", build_fig_market_dist)
+                st.plotly_chart(fig_market_dist, use_container_width=True, key="fig_market_dist_tab4")
     
-    with col2:
-        st.markdown("<br><br>", unsafe_allow_html=True)
         st.markdown("""
-        ### 📉 Crisis de Fidelización
+        <div class="insight-box">
+            <strong>💡 Insight Clave:</strong> La dependencia de OTAs (TA/TO) supera el 82% de las reservas. 
+            Esta intermediación digital facilita las cancelaciones con un simple clic pero amplifica el alcance de mercado.
+        </div>
+        """, unsafe_allow_html=True)
+    
+        st.markdown("### 📊 Comportamiento por Canal y Segmento")
+    
+        # Tasa de cancelación por segmento de mercado
+        if 'market_segment' in cube.tables:
+            def build_fig_market():
+                market_cancel = cube.slice('market_segment', filters)[['market_segment', 'canceled', 'count']]
+                market_cancel.columns = ['market_segment', 'canceled', 'total']
+                market_cancel['cancel_rate'] = (market_cancel['canceled'] / market_cancel['total'] * 100).round(2)
+                market_cancel = market_cancel.sort_values('cancel_rate', ascending=False)
+        
+                fig_market = px.bar(
+                    market_cancel,
+                    x='market_segment',
+                    y='cancel_rate',
+                    title='Tasa de Cancelación por Segmento de Mercado',
+                    labels={'market_segment': 'Segmento de Mercado', 'cancel_rate': 'Tasa de Cancelación (%)'},
+                    color='cancel_rate',
+                    color_continuous_scale='Oranges',
+                    text='cancel_rate'
+                )
+                fig_market.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                fig_market.update_layout(height=400, showlegend=False)
+                return fig_market
+            fig_market = cached_figure("fig_market", build_fig_market)
+            st.plotly_chart(fig_market, use_container_width=True, key="fig_market_tab4")
+    
+        # Huéspedes repetidos vs nuevos
+        st.markdown("### 🔄 Fidelización: El Talón de Aquiles")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            if 'is_repeated_guest' in cube.tables:
+                def build_fig_repeated():
+                    repeated_dist = cube.slice('is_repeated_guest', filters)[['is_repeated_guest', 'count']]
+                    repeated_dist['type'] = repeated_dist['is_repeated_guest'].map({0: 'Nuevos', 1: 'Repetidos'})
+            
+                    fig_repeated = px.pie(
+                        repeated_dist,
+                        values='count',
+                        names='type',
+                        title='Distribución de Huéspedes: Nuevos vs Repetidos',
+                        color_discrete_sequence=['#ff7f0e', '#2ca02c'],
+                        hole=0.4
+                    )
+                    fig_repeated.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
+                    fig_repeated.update_layout(height=400)
+                    return fig_repeated
+                fig_repeated = cached_figure("fig_repeated", build_fig_repeated)
+                st.plotly_chart(fig_repeated, use_container_width=True, key="fig_repeated_tab4")
+    
+        with col2:
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            st.markdown("""
+            ### 📉 Crisis de Fidelización
         
-        **Solo el 3% son huéspedes repetidos**
+            **Solo el 3% son huéspedes repetidos**
         
-        Esto significa:
-        - **97% de clientes nuevos** cada vez
-        - Alto costo de adquisición constante
-        - Sin ventaja de lealtad
-        - Mayor vulnerabilidad a competencia
+            Esto significa:
+            - **97% de clientes nuevos** cada vez
+            - Alto costo de adquisición constante
+            - Sin ventaja de lealtad
+            - Mayor vulnerabilidad a competencia
         
-        **Oportunidad:** Implementar programas de fidelización
-        """)
+            **Oportunidad:** Implementar programas de fidelización
+            """)
     
-    # Top países
-    st.markdown("### 🌍 Origen Geográfico de los Clientes")
+        # Top países
+        st.markdown("### 🌍 Origen Geográfico de los Clientes")
     
-    if 'country' in data_filtered.columns:
-        top_countries = data_filtered['country'].value_counts().head(10).index
-        country_data = data_filtered[data_filtered['country'].isin(top_countries)]
-        country_dist = country_data.groupby('country').size().reset_index(name='count')
-        country_dist = country_dist.sort_values('count', ascending=False)
+        if 'country' in cube.tables:
+            def build_fig_country_dist():
+                # Top 10 países (ranking compartido con la pestaña 5)
+                ranking, _ = top_values('country')
+                country_dist = ranking.rename(columns={'value': 'country'})[['country', 'count']]
         
-        fig_country_dist = px.bar(
-            country_dist,
-            x='country',
-            y='count',
-            title='Top 10 Países por Número de Reservas',
-            labels={'country': 'País', 'count': 'Número de Reservas'},
-            color='count',
-            color_continuous_scale='Viridis',
-            text='count'
-        )
-        fig_country_dist.update_traces(texttemplate='%{text:,}', textposition='outside')
-        fig_country_dist.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_country_dist, use_container_width=True, key="fig_country_dist_tab4")
+                fig_country_dist = px.bar(
+                    country_dist,
+                    x='country',
+                    y='count',
+                    title='Top 10 Países por Número de Reservas',
+                    labels={'country': 'País', 'count': 'Número de Reservas'},
+                    color='count',
+                    color_continuous_scale='Viridis',
+                    text='count'
+                )
+                fig_country_dist.update_traces(texttemplate='%{text:,}', textposition='outside')
+                fig_country_dist.update_layout(height=400, showlegend=False)
+                return fig_country_dist
+            fig_country_dist = cached_figure("fig_country_dist", build_fig_country_dist)
+            st.plotly_chart(fig_country_dist, use_container_width=True, key="fig_country_dist_tab4")
+
+        # Agencias y empresas con más reservas
+        st.markdown("### 🧾 Agencias y Empresas con Más Reservas")
+
+        @st.fragment
+        def ranking_intermediarios():
+            # Fragmento aislado: cambiar de columna solo suma los resúmenes de las celdas filtradas
+            tipo = st.radio("Ranking de", list(HEAVY_HITTER_RANKINGS), horizontal=True, key="intermediario_tab4")
+            column = HEAVY_HITTER_RANKINGS[tipo]
+            ranking, report = top_values(column)
+
+            def build_fig_intermediary():
+                top = ranking.assign(
+                    label=[f"{tipo} {int(value)}" for value in ranking['value']],
+                    cancel_rate=(ranking['canceled'] / ranking['lower'].where(ranking['lower'] > 0) * 100).round(2)
+                )
+                fig_intermediary = px.bar(
+                    top,
+                    x='label',
+                    y='count',
+                    error_y=np.zeros(len(top)),
+                    error_y_minus='error',
+                    title=f'Top 10 por Número de Reservas: {tipo}',
+                    labels={'label': tipo, 'count': 'Número de Reservas', 'cancel_rate': 'Tasa de Cancelación (%)'},
+                    color='cancel_rate',
+                    color_continuous_scale='RdYlGn_r',
+                    hover_data=['error', 'cancel_rate']
+                )
+                fig_intermediary.update_layout(height=400)
+                return fig_intermediary
+            fig_intermediary = cached_figure(f"fig_intermediary_{column}", build_fig_intermediary)
+            st.plotly_chart(fig_intermediary, use_container_width=True, key="fig_intermediary_tab4")
+
+            if report['source'] == 'exact':
+                st.caption("Recuentos exactos: las cotas de los resúmenes no garantizaban el ranking.")
+            elif report['exact']:
+                st.caption(f"Ranking exacto sobre {report['total']:,} reservas con {tipo.lower()}.")
+            else:
+                st.caption(
+                    f"Ranking aproximado sobre {report['total']:,} reservas: error máximo de "
+                    f"{report['max_error']:,} reservas por barra (como mucho {report['bound']:,} en cualquier valor); el orden de "
+                    f"los 10 primeros {'está' if report['guaranteed'] else 'no está'} garantizado."
+                )
+
+        ranking_intermediarios()
 
 # ============================================
 # TAB 5: CONCLUSIONES Y RECOMENDACIONES
 # ============================================
 with tab5:
-    st.markdown("""
-    <div class="chapter-intro">
-    De los datos a la acción: estrategias concretas para <strong>reducir cancelaciones y optimizar la rentabilidad</strong>. 
-    Basándonos en los patrones identificados, proponemos un plan de acción con impacto medible.
-    </div>
-    """, unsafe_allow_html=True)
+    if tab5.open:
+        st.markdown("""
+        <div class="chapter-intro">
+        De los datos a la acción: estrategias concretas para <strong>reducir cancelaciones y optimizar la rentabilidad</strong>. 
+        Basándonos en los patrones identificados, proponemos un plan de acción con impacto medible.
+        </div>
+        """, unsafe_allow_html=True)
     
-    st.markdown("### 🛡️ Estrategias de Mitigación")
+        st.markdown("### 🛡️ Estrategias de Mitigación")
     
-    col1, col2 = st.columns(2)
+        col1, col2 = st.columns(2)
     
-    with col1:
-        st.markdown("""
-        <div class="recommendation-box">
-        <strong>1. Política de Depósitos Escalonada</strong><br>
-        • Lead time &lt; 30 días: Sin depósito<br>
-        • Lead time 30-90 días: Depósito 10%<br>
-        • Lead time &gt; 90 días: Depósito 15-20%<br>
-        <em>Impacto esperado: Reducción 12-15% en cancelaciones anticipadas</em>
-        </div>
+        with col1:
+            st.markdown("""
+            <div class="recommendation-box">
+            <strong>1. Política de Depósitos Escalonada</strong><br>
+            • Lead time &lt; 30 días: Sin depósito<br>
+            • Lead time 30-90 días: Depósito 10%<br>
+            • Lead time &gt; 90 días: Depósito 15-20%<br>
+            <em>Impacto esperado: Reducción 12-15% en cancelaciones anticipadas</em>
+            </div>
         
-        <div class="recommendation-box">
-        <strong>2. Incentivos por Booking Directo</strong><br>
-        • Descuento 5-10% en canal directo<br>
-        • Programa de fidelización con puntos<br>
-        • Upgrades gratuitos para clientes recurrentes<br>
-        <em>Impacto esperado: Reducir dependencia de OTAs del 82% al 65%</em>
-        </div>
+            <div class="recommendation-box">
+            <strong>2. Incentivos por Booking Directo</strong><br>
+            • Descuento 5-10% en canal directo<br>
+            • Programa de fidelización con puntos<br>
+            • Upgrades gratuitos para clientes recurrentes<br>
+            <em>Impacto esperado: Reducir dependencia de OTAs del 82% al 65%</em>
+            </div>
         
-        <div class="recommendation-box">
-        <strong>3. Precios Dinámicos Anti-Cancelación</strong><br>
-        • Tarifas flexibles para reservas &lt; 30 días<br>
-        • Penalización gradual por cancelación según lead time<br>
-        • Opciones de reprogramación sin costo<br>
-        <em>Impacto esperado: Mantener flexibilidad reduciendo cancelaciones 8-10%</em>
-        </div>
-        """, unsafe_allow_html=True)
+            <div class="recommendation-box">
+            <strong>3. Precios Dinámicos Anti-Cancelación</strong><br>
+            • Tarifas flexibles para reservas &lt; 30 días<br>
+            • Penalización gradual por cancelación según lead time<br>
+            • Opciones de reprogramación sin costo<br>
+            <em>Impacto esperado: Mantener flexibilidad reduciendo cancelaciones 8-10%</em>
+            </div>
+            """, unsafe_allow_html=True)
     
-    with col2:
-        st.markdown("### 📊 Calculadora de Impacto")
+        with col2:
+            st.markdown("### 📊 Calculadora de Impacto")
         
-        # Cálculo de impacto
-        total_reservas = len(data_filtered)
-        canceladas = data_filtered['is_canceled'].sum()
-        tasa_actual = (canceladas / total_reservas * 100)
+            @st.fragment
+            def calculadora_impacto(totales):
+                # Fragmento aislado: mover el slider solo reejecuta la calculadora, con los KPIs base ya calculados
+                # Cálculo de impacto
+                total_reservas = int(totales["count"])
+                canceladas = int(totales["is_canceled_sum"])
+                tasa_actual = (canceladas / total_reservas * 100)
         
-        reduccion_objetivo = st.slider(
-            "Reducción objetivo (puntos porcentuales)",
-            min_value=5,
-            max_value=20,
-            value=10,
-            step=1,
-            key="reduccion_slider"
-        )
+                reduccion_objetivo = st.slider(
+                    "Reducción objetivo (puntos porcentuales)",
+                    min_value=5,
+                    max_value=20,
+                    value=10,
+                    step=1,
+                    key="reduccion_slider"
+                )
         
-        nueva_tasa = tasa_actual - reduccion_objetivo
-        reservas_salvadas = int(total_reservas * (reduccion_objetivo / 100))
-        avg_adr = data_filtered["adr"].mean()
-        noches_promedio = 2.5
-        ingresos_recuperados = reservas_salvadas * avg_adr * noches_promedio
+                nueva_tasa = tasa_actual - reduccion_objetivo
+                reservas_salvadas = int(total_reservas * (reduccion_objetivo / 100))
+                avg_adr = totales["adr_sum"] / totales["count"]
+                noches_promedio = 2.5
+                ingresos_recuperados = reservas_salvadas * avg_adr * noches_promedio
         
-        st.markdown(f"""
-        <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-        <h4 style="color: #1f77b4;">Proyección de Impacto</h4>
-        <table style="width: 100%; font-size: 15px;">
-        <tr><td><strong>Tasa actual:</strong></td><td style="text-align: right;">{tasa_actual:.1f}%</td></tr>
-        <tr><td><strong>Tasa objetivo:</strong></td><td style="text-align: right; color: #28a745;"><strong>{nueva_tasa:.1f}%</strong></td></tr>
-        <tr><td><strong>Reservas salvadas:</strong></td><td style="text-align: right;">{reservas_salvadas:,}</td></tr>
-        <tr><td><strong>Noches promedio:</strong></td><td style="text-align: right;">{noches_promedio}</td></tr>
-        <tr style="border-top: 2px solid #ddd;"><td><strong>Ingresos recuperados:</strong></td><td style="text-align: right; color: #28a745; font-size: 18px;"><strong>€{ingresos_recuperados:,.0f}</strong></td></tr>
-        </table>
-        </div>
-        """, unsafe_allow_html=True)
+                st.markdown(f"""
+                <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                <h4 style="color: #1f77b4;">Proyección de Impacto</h4>
+                <table style="width: 100%; font-size: 15px;">
+                <tr><td><strong>Tasa actual:</strong></td><td style="text-align: right;">{tasa_actual:.1f}%</td></tr>
+                <tr><td><strong>Tasa objetivo:</strong></td><td style="text-align: right; color: #28a745;"><strong>{nueva_tasa:.1f}%</strong></td></tr>
+                <tr><td><strong>Reservas salvadas:</strong></td><td style="text-align: right;">{reservas_salvadas:,}</td></tr>
+                <tr><td><strong>Noches promedio:</strong></td><td style="text-align: right;">{noches_promedio}</td></tr>
+                <tr style="border-top: 2px solid #ddd;"><td><strong>Ingresos recuperados:</strong></td><td style="text-align: right; color: #28a745; font-size: 18px;"><strong>€{ingresos_recuperados:,.0f}</strong></td></tr>
+                </table>
+                </div>
+                """, unsafe_allow_html=True)
+
+            calculadora_impacto(totales)
     
-    st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
     
-    # Políticas de depósito y su impacto
-    st.markdown("### 💳 Análisis: Política de Depósito")
+        # Políticas de depósito y su impacto
+        st.markdown("### 💳 Análisis: Política de Depósito")
     
-    col1, col2 = st.columns(2)
+        col1, col2 = st.columns(2)
     
-    with col1:
-        if 'deposit_type' in data_filtered.columns:
-            deposit_cancel = data_filtered.groupby('deposit_type').agg({
-                'is_canceled': ['sum', 'count']
-            }).reset_index()
-            deposit_cancel.columns = ['deposit_type', 'canceled', 'total']
-            deposit_cancel['cancel_rate'] = (deposit_cancel['canceled'] / deposit_cancel['total'] * 100).round(2)
-            deposit_cancel['completed_rate'] = 100 - deposit_cancel['cancel_rate']
+        with col1:
+            if 'deposit_type' in cube.tables:
+                def build_fig_deposit():
+                    deposit_cancel = cube.slice('deposit_type', filters)[['deposit_type', 'canceled', 'count']]
+                    deposit_cancel.columns = ['deposit_type', 'canceled', 'total']
+                    deposit_cancel['cancel_rate'] = (deposit_cancel['canceled'] / deposit_cancel['total'] * 100).round(2)
+                    deposit_cancel['completed_rate'] = 100 - deposit_cancel['cancel_rate']
             
-            fig_deposit = go.Figure()
-            fig_deposit.add_trace(go.Bar(
-                name='Completadas',
-                x=deposit_cancel['deposit_type'],
-                y=deposit_cancel['completed_rate'],
-                marker_color='#2ca02c',
-                text=deposit_cancel['completed_rate'].round(1),
-                texttemplate='%{text}%',
-                textposition='inside'
-            ))
-            fig_deposit.add_trace(go.Bar(
-                name='Canceladas',
-                x=deposit_cancel['deposit_type'],
-                y=deposit_cancel['cancel_rate'],
-                marker_color='#d62728',
-                text=deposit_cancel['cancel_rate'].round(1),
-                texttemplate='%{text}%',
-                textposition='inside'
-            ))
+                    fig_deposit = go.Figure()
+                    fig_deposit.add_trace(go.Bar(
+                        name='Completadas',
+                        x=deposit_cancel['deposit_type'],
+                        y=deposit_cancel['completed_rate'],
+                        marker_color='#2ca02c',
+                        text=deposit_cancel['completed_rate'].round(1),
+                        texttemplate='%{text}%',
+                        textposition='inside'
+                    ))
+                    fig_deposit.add_trace(go.Bar(
+                        name='Canceladas',
+                        x=deposit_cancel['deposit_type'],
+                        y=deposit_cancel['cancel_rate'],
+                        marker_color='#d62728',
+                        text=deposit_cancel['cancel_rate'].round(1),
+                        texttemplate='%{text}%',
+                        textposition='inside'
+                    ))
             
-            fig_deposit.update_layout(
-                title='Impacto de la Política de Depósito en Cancelaciones',
-                xaxis_title='Tipo de Depósito',
-                yaxis_title='Porcentaje (%)',
-                barmode='stack',
-                height=400
-            )
-            st.plotly_chart(fig_deposit, use_container_width=True, key="fig_deposit_tab5")
-    
-    with col2:
-        # ADR vs Cancelaciones
-        data_adr = data_filtered[data_filtered['adr'] > 0].copy()
-        data_adr['adr_bin'] = pd.cut(
-            data_adr['adr'],
-            bins=[0, 50, 100, 150, 200, 500],
-            labels=['€0-50', '€51-100', '€101-150', '€151-200', '>€200']
-        )
-        
-        adr_cancel = data_adr.groupby('adr_bin')['is_canceled'].agg(['sum', 'count']).reset_index()
-        adr_cancel['cancel_rate'] = (adr_cancel['sum'] / adr_cancel['count'] * 100).round(2)
-        
-        fig_adr = px.line(
-            adr_cancel,
-            x='adr_bin',
-            y='cancel_rate',
-            title='Tasa de Cancelación según Rango de Precio (ADR)',
-            labels={'adr_bin': 'Rango de Precio por Noche', 'cancel_rate': 'Tasa de Cancelación (%)'},
-            markers=True
-        )
-        fig_adr.update_traces(line_color='#ff7f0e', line_width=3, marker_size=12)
-        fig_adr.update_layout(height=400)
-        st.plotly_chart(fig_adr, use_container_width=True, key="fig_adr_tab5")
-    
-    st.markdown("""
-    <div class="insight-box">
-        <strong>💡 Insight Clave:</strong> Las reservas sin depósito tienen una tasa de cancelación 
-        significativamente mayor. La implementación de depósitos escalonados puede reducir cancelaciones 
-        sin afectar negativamente la conversión de reservas.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Top países con mayor cancelación
-    st.markdown("### 🌍 Mercados con Mayor Riesgo de Cancelación")
-    
-    if 'country' in data_filtered.columns:
-        top_countries = data_filtered['country'].value_counts().head(10).index
-        country_data = data_filtered[data_filtered['country'].isin(top_countries)]
+                    fig_deposit.update_layout(
+                        title='Impacto de la Política de Depósito en Cancelaciones',
+                        xaxis_title='Tipo de Depósito',
+                        yaxis_title='Porcentaje (%)',
+                        barmode='stack',
+                        height=400
+                    )
+                    return fig_deposit
+                fig_deposit = cached_figure("fig_deposit", build_fig_deposit)
+                st.plotly_chart(fig_deposit, use_container_width=True, key="fig_deposit_tab5")
+    
+        with col2:
+            def build_fig_adr():
+                # ADR vs Cancelaciones
+                adr_cancel = cube.slice('adr_bin', filters, drop_empty=True).rename(columns={'canceled': 'sum'})
+                adr_cancel['cancel_rate'] = (adr_cancel['sum'] / adr_cancel['count'] * 100).round(2)
         
-        country_cancel = country_data.groupby('country').agg({
-            'is_canceled': ['sum', 'count']
-        }).reset_index()
-        country_cancel.columns = ['country', 'canceled', 'total']
-        country_cancel['cancel_rate'] = (country_cancel['canceled'] / country_cancel['total'] * 100).round(2)
-        country_cancel = country_cancel.sort_values('cancel_rate', ascending=False)
-        
-        fig_country = px.bar(
-            country_cancel,
-            y='country',
-            x='cancel_rate',
-            orientation='h',
-            title='Tasa de Cancelación por País de Origen (Top 10)',
-            labels={'country': 'País', 'cancel_rate': 'Tasa de Cancelación (%)'},
-            color='cancel_rate',
-            color_continuous_scale='RdYlGn_r',
-            text='cancel_rate'
-        )
-        fig_country.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-        fig_country.update_layout(height=500, showlegend=False)
-        st.plotly_chart(fig_country, use_container_width=True, key="fig_country_tab5")
-    
-    # Resumen final
-    st.markdown("### 🎯 Resumen Ejecutivo")
-    
-    st.markdown("""
-    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; border-radius: 15px; color: white;">
-    <h3 style="color: white; margin-top: 0;">Los 4 Pilares del Problema</h3>
-    
-    <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px; margin-top: 20px;">
-        <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
-            <strong>⏰ Factor Temporal</strong><br>
-            Lead time &gt; 180 días = Alto riesgo<br>
-            Temporada alta = Más cancelaciones
+                fig_adr = px.line(
+                    adr_cancel,
+                    x='adr_bin',
+                    y='cancel_rate',
+                    title='Tasa de Cancelación según Rango de Precio (ADR)',
+                    labels={'adr_bin': 'Rango de Precio por Noche', 'cancel_rate': 'Tasa de Cancelación (%)'},
+                    markers=True
+                )
+                fig_adr.update_traces(line_color='#ff7f0e', line_width=3, marker_size=12)
+                fig_adr.update_layout(height=400)
+                return fig_adr
+            fig_adr = cached_figure("fig_adr", build_fig_adr)
+            st.plotly_chart(fig_adr, use_container_width=True, key="fig_adr_tab5")
+    
+        st.markdown("""
+        <div class="insight-box">
+            <strong>💡 Insight Clave:</strong> Las reservas sin depósito tienen una tasa de cancelación 
+            significativamente mayor. La implementación de depósitos escalonados puede reducir cancelaciones 
+            sin afectar negativamente la conversión de reservas.
         </div>
-        <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
-            <strong>📱 Dependencia Digital</strong><br>
-            82% via OTAs<br>
-            Facilita cancelaciones con 1 clic
+        """, unsafe_allow_html=True)
+    
+        # Top países con mayor cancelación
+        st.markdown("### 🌍 Mercados con Mayor Riesgo de Cancelación")
+    
+        if 'country' in cube.tables:
+            def build_fig_country():
+                ranking, _ = top_values('country')
+                # Tasa sobre las apariciones contadas (todas, si el ranking es exacto)
+                country_cancel = ranking[['value', 'canceled', 'lower']].copy()
+                country_cancel.columns = ['country', 'canceled', 'total']
+                country_cancel['cancel_rate'] = (country_cancel['canceled'] / country_cancel['total'] * 100).round(2)
+                country_cancel = country_cancel.sort_values('cancel_rate', ascending=False)
+        
+                fig_country = px.bar(
+                    country_cancel,
+                    y='country',
+                    x='cancel_rate',
+                    orientation='h',
+                    title='Tasa de Cancelación por País de Origen (Top 10)',
+                    labels={'country': 'País', 'cancel_rate': 'Tasa de Cancelación (%)'},
+                    color='cancel_rate',
+                    color_continuous_scale='RdYlGn_r',
+                    text='cancel_rate'
+                )
+                fig_country.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                fig_country.update_layout(height=500, showlegend=False)
+                return fig_country
+            fig_country = cached_figure("fig_country", build_fig_country)
+            st.plotly_chart(fig_country, use_container_width=True, key="fig_country_tab5")
+    
+        # Resumen final
+        st.markdown("### 🎯 Resumen Ejecutivo")
+    
+        st.markdown("""
+        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; border-radius: 15px; color: white;">
+        <h3 style="color: white; margin-top: 0;">Los 4 Pilares del Problema</h3>
+    
+        <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px; margin-top: 20px;">
+            <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
+                <strong>⏰ Factor Temporal</strong><br>
+                Lead time &gt; 180 días = Alto riesgo<br>
+                Temporada alta = Más cancelaciones
+            </div>
+            <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
+                <strong>📱 Dependencia Digital</strong><br>
+                82% via OTAs<br>
+                Facilita cancelaciones con 1 clic
+            </div>
+            <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
+                <strong>💰 Políticas Flexibles</strong><br>
+                87% sin depósito<br>
+                Cero penalización = Cero compromiso
+            </div>
+            <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
+                <strong>🔄 Baja Fidelización</strong><br>
+                97% clientes nuevos<br>
+                Sin ventaja de lealtad
+            </div>
         </div>
-        <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
-            <strong>💰 Políticas Flexibles</strong><br>
-            87% sin depósito<br>
-            Cero penalización = Cero compromiso
+    
+        <div style="margin-top: 30px; padding: 20px; background: rgba(255,255,255,0.9); border-radius: 10px; color: #333;">
+            <strong style="color: #1f77b4; font-size: 18px;">🚀 Próximos Pasos Recomendados:</strong><br><br>
+            1. <strong>Implementar depósitos escalonados</strong> según lead time en próximo trimestre<br>
+            2. <strong>Lanzar campaña de booking directo</strong> con descuentos del 7%<br>
+            3. <strong>Crear programa de fidelización</strong> para convertir el 3% actual en 15% en 12 meses<br>
+            4. <strong>Monitorear KPIs semanalmente</strong>: tasa de cancelación, ADR, % canal directo
         </div>
-        <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px;">
-            <strong>🔄 Baja Fidelización</strong><br>
-            97% clientes nuevos<br>
-            Sin ventaja de lealtad
         </div>
-    </div>
-    
-    <div style="margin-top: 30px; padding: 20px; background: rgba(255,255,255,0.9); border-radius: 10px; color: #333;">
-        <strong style="color: #1f77b4; font-size: 18px;">🚀 Próximos Pasos Recomendados:</strong><br><br>
-        1. <strong>Implementar depósitos escalonados</strong> según lead time en próximo trimestre<br>
-        2. <strong>Lanzar campaña de booking directo</strong> con descuentos del 7%<br>
-        3. <strong>Crear programa de fidelización</strong> para convertir el 3% actual en 15% en 12 meses<br>
-        4. <strong>Monitorear KPIs semanalmente</strong>: tasa de cancelación, ADR, % canal directo
-    </div>
-    </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
+
+# Panel de depuración de la caché de resultados (al final, con los contadores del rerun)
+with st.sidebar.expander("🧪 Caché de resultados", expanded=False):
+    cache_stats = result_cache.stats()
+    st.markdown(f"""
+    - **Aciertos / fallos:** {cache_stats['hits']:,} / {cache_stats['misses']:,}
+    - **Tasa de acierto:** {cache_stats['hit_rate']:.1%}
+    - **Entradas:** {cache_stats['entries']:,}
+    - **Memoria:** {cache_stats['bytes'] / 1024**2:.1f} / {cache_stats['max_bytes'] / 1024**2:.0f} MB
+    - **Expulsadas (LRU):** {cache_stats['evictions']:,} · **Caducadas (TTL):** {cache_stats['expirations']:,}
+    """)
+    if st.button("Vaciar caché", key="clear_result_cache"):
+        result_cache.clear()
 
 # ============================================
 # FOOTER
@@ -4,6 +4,18 @@ import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
 import numpy as np
+import os
+
+from utils.aggregation import AggregationEngine, Metric, histogram_stats
+from utils.bitmap_index import BitmapIndex
+from utils.bookings import FILTER_COLUMNS, freeze_frame, load_bookings
+from utils.column_store import load_column_store
+from utils.olap_cube import BookingsCube, load_bookings_cube
+from utils.partitioned_store import open_partitioned_bookings
+from utils.polars_backend import PolarsBookings
+from utils.result_cache import ResultCache
+from utils.sql_backend import SQLBookings
+from utils.time_series import DailyCube, load_daily_cube
 
 # Configuración de la página
 st.set_page_config(
@@ -238,51 +250,109 @@ st.markdown("""
 # Cargar datos
 BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR / "1. Datos" / "hotel_bookings_processed.csv"
-
-@st.cache_data
+DATASET_PATH = BASE_DIR / "1. Datos" / "hotel_bookings_dataset"
+
+# Modo de ingesta del despliegue: "memoria" carga todas las reservas; "streaming"
+# recorre el CSV por bloques, lo pliega en el cubo y sirve la página sin retener filas;
+# "particionado" lee del dataset hotel=/arrival_date_year= solo las particiones filtradas;
+# "duckdb" registra el CSV en DuckDB y resuelve filtros y agregados en SQL;
+# "polars" los resuelve como consultas perezosas de Polars
+INGESTION_MODE = os.environ.get("PEC3_INGESTION_MODE", "memoria")
+STREAMING = INGESTION_MODE == "streaming"
+PARTITIONED = INGESTION_MODE == "particionado"
+DUCKDB = INGESTION_MODE == "duckdb"
+POLARS = INGESTION_MODE == "polars"
+# Modos sin reservas en memoria: filtros, opciones y agregados salen de `cube`
+CUBE_ONLY = STREAMING or DUCKDB or POLARS
+
+@st.cache_resource
 def load_data():
-    df = pd.read_csv(DATA_PATH)
-    
-    # Crear columna de fecha de llegada
-    if 'arrival_date_year' in df.columns and 'arrival_date_month' in df.columns and 'arrival_date_day_of_month' in df.columns:
-        month_map = {
-            'January': 1, 'February': 2, 'March': 3, 'April': 4,
-            'May': 5, 'June': 6, 'July': 7, 'August': 8,
-            'September': 9, 'October': 10, 'November': 11, 'December': 12
-        }
-        df['month_num'] = df['arrival_date_month'].map(month_map)
-        df['dia'] = pd.to_datetime(df[['arrival_date_year', 'month_num', 'arrival_date_day_of_month']].rename(
-            columns={'arrival_date_year': 'year', 'month_num': 'month', 'arrival_date_day_of_month': 'day'}
-        ))
-    
-    # Total de noches
-    if 'stays_in_weekend_nights' in df.columns and 'stays_in_week_nights' in df.columns:
-        df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
-    
-    # Total de huéspedes
-    if 'adults' in df.columns and 'children' in df.columns and 'babies' in df.columns:
-        df['total_guests'] = df['adults'] + df['children'] + df['babies']
-    
-    # Temporada
-    if 'arrival_date_month' in df.columns:
-        df['season'] = df['arrival_date_month'].map({
-            'December': 'Invierno', 'January': 'Invierno', 'February': 'Invierno',
-            'March': 'Primavera', 'April': 'Primavera', 'May': 'Primavera',
-            'June': 'Verano', 'July': 'Verano', 'August': 'Verano',
-            'September': 'Otoño', 'October': 'Otoño', 'November': 'Otoño'
-        })
-    
-    # Categoría de lead time
-    if 'lead_time' in df.columns:
-        df['lead_time_category'] = pd.cut(
-            df['lead_time'],
-            bins=[-1, 0, 7, 30, 90, 180, df['lead_time'].max()],
-            labels=['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
-        )
-    
-    return df
+    # Lee la caché columnar si el CSV no ha cambiado desde el último arranque.
+    # Un único DataFrame de solo lectura por proceso: las sesiones lo comparten
+    # sin copias y sus filtros son selecciones sobre él, no DataFrames nuevos
+    return freeze_frame(load_bookings(DATA_PATH))
+
+@st.cache_resource
+def load_dataset():
+    # Dataset particionado; se importa desde el CSV la primera vez y después
+    # recibe las reservas nuevas con `python -m utils.partitioned_store`
+    return open_partitioned_bookings(DATA_PATH, DATASET_PATH)
+
+@st.cache_resource
+def load_filter_index():
+    # Bitmaps por valor de cada dimensión del sidebar, compartidos entre sesiones
+    return BitmapIndex(load_data(), FILTER_COLUMNS)
+
+@st.cache_resource
+def load_cube():
+    # Medidas precalculadas por (hotel, año, tipo de cliente, dimensión)
+    if STREAMING:
+        return load_bookings_cube(DATA_PATH)
+    if DUCKDB:
+        # Misma interfaz que el cubo, con cada consulta resuelta en SQL
+        return SQLBookings(DATA_PATH)
+    if POLARS:
+        return PolarsBookings(DATA_PATH)
+    return BookingsCube.build(load_data())
+
+@st.cache_resource
+def load_time_series():
+    # Cubo diario de llegadas por (día, hotel, tipo de cliente, cancelada) para la evolución temporal
+    if CUBE_ONLY:
+        return load_daily_cube(DATA_PATH)
+    return DailyCube.build(load_data())
+
+# Agregados por fila que necesita la página, resueltos en una pasada por el motor
+ENGINE_KEYS = ['total_guests', 'total_nights', 'lead_time_category', 'lead_time']
+ENGINE_VALUES = ['is_canceled', 'adr', 'lead_time', 'total_nights']
+PAGE_METRICS = [
+    Metric('totales', values=('is_canceled', 'adr', 'lead_time', 'total_nights')),
+    Metric('lead_time', by=('lead_time',)),
+    Metric('huespedes', by=('total_guests',)),
+    Metric('noches', by=('total_nights',)),
+    Metric('lead_noches', by=('lead_time_category', 'total_nights')),
+]
 
-data = load_data()
+@st.cache_resource
+def load_engine():
+    # Códigos factorizados una vez y compartidos por todos los agregados. Las
+    # columnas numéricas calientes se suman directamente sobre el almacén .npy
+    # mapeado en memoria, cuyas páginas comparten todos los procesos del servidor
+    return AggregationEngine(load_data(), ENGINE_KEYS, ENGINE_VALUES, arrays=load_column_store(DATA_PATH))
+
+# Caché de agregados y figuras por estado de filtros (compartida entre sesiones)
+RESULT_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_MAX_MB = 64
+RESULT_CACHE_TTL = 60 * 60  # segundos
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(
+        max_entries=RESULT_CACHE_MAX_ENTRIES,
+        max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+        ttl=RESULT_CACHE_TTL,
+    )
+
+if CUBE_ONLY:
+    cube = load_cube()
+    data = filter_index = engine = None
+elif PARTITIONED:
+    # El cubo se compone tras elegir los filtros, solo con las particiones afectadas
+    dataset = load_dataset().refresh()
+    cube = data = filter_index = engine = None
+else:
+    cube = load_cube()
+    data = load_data()
+    filter_index = load_filter_index()
+    engine = load_engine()
+
+def filter_values(column):
+    # Opciones de un filtro: de las reservas, de las claves del cubo o del manifiesto del dataset
+    if CUBE_ONLY:
+        return cube.values(column)
+    if PARTITIONED:
+        return dataset.values(column)
+    return list(data[column].unique())
 
 # ============================================
 # SIDEBAR - FILTROS INTERACTIVOS
@@ -292,12 +362,12 @@ st.sidebar.markdown("*Personaliza tu exploración de datos*")
 st.sidebar.markdown("---")
 
 # Filtro de hotel
-hotel_options = ["Todos"] + sorted(list(data["hotel"].unique()))
+hotel_options = ["Todos"] + sorted(filter_values("hotel"))
 selected_hotel = st.sidebar.selectbox("🏨 Tipo de Hotel", hotel_options)
 
 # Filtro de año
-min_year = int(data["arrival_date_year"].min())
-max_year = int(data["arrival_date_year"].max())
+min_year = int(min(filter_values("arrival_date_year")))
+max_year = int(max(filter_values("arrival_date_year")))
 year_range = st.sidebar.slider(
     "📅 Año de Llegada",
     min_value=min_year,
@@ -307,26 +377,50 @@ year_range = st.sidebar.slider(
 )
 
 # Filtro de tipo de cliente
-if 'customer_type' in data.columns:
-    customer_options = ["Todos"] + sorted(list(data["customer_type"].unique()))
+if 'customer_type' in (dataset.keys if PARTITIONED else cube.keys):
+    customer_options = ["Todos"] + sorted(filter_values("customer_type"))
     selected_customer = st.sidebar.selectbox("👤 Tipo de Cliente", customer_options)
 else:
     selected_customer = "Todos"
 
-# Aplicar filtros
-data_filtered = data[
-    (data["arrival_date_year"] >= year_range[0]) &
-    (data["arrival_date_year"] <= year_range[1])
-]
+# Estado de filtros: se resuelve con los bitmaps (memoria) o sobre el cubo (streaming)
+filters = {
+    "hotel": None if selected_hotel == "Todos" else [selected_hotel],
+    "arrival_date_year": range(year_range[0], year_range[1] + 1),
+    "customer_type": None if selected_customer == "Todos" else [selected_customer],
+}
+
+# Los reruns que no cambian los filtros (p.ej. mover el slider de impacto)
+# reutilizan agregados y figuras en lugar de recalcularlos
+result_cache = get_result_cache()
+# La versión del dataset invalida los resultados al añadir reservas nuevas
+data_version = dataset.version if PARTITIONED else None
+filter_key = (selected_hotel, tuple(year_range), selected_customer, data_version)
+
+def cached_figure(name, build):
+    return result_cache.get_or_compute((filter_key, name), build)
+
+if PARTITIONED:
+    cube = result_cache.get_or_compute((filter_key, "cube"), lambda: dataset.cube(filters))
 
-if selected_hotel != "Todos":
-    data_filtered = data_filtered[data_filtered["hotel"] == selected_hotel]
+def compute_bundle():
+    if CUBE_ONLY or PARTITIONED:
+        return cube.compute(filters, PAGE_METRICS)
+    return engine.compute(filter_index.select(filters), PAGE_METRICS)
 
-if selected_customer != "Todos" and 'customer_type' in data.columns:
-    data_filtered = data_filtered[data_filtered["customer_type"] == selected_customer]
+def get_daily_cube():
+    # En modo particionado se suman los cubos diarios de las particiones afectadas
+    if PARTITIONED:
+        return result_cache.get_or_compute((filter_key, "daily"), lambda: dataset.daily_cube(filters))
+    return load_time_series()
+
+bundle = result_cache.get_or_compute((filter_key, "bundle"), compute_bundle)
+totales = bundle['totales'].iloc[0]
 
 st.sidebar.markdown("---")
-st.sidebar.success(f"**📊 Registros filtrados:** {len(data_filtered):,}")
+st.sidebar.success(f"**📊 Registros filtrados:** {int(totales['count']):,}")
+if PARTITIONED:
+    st.sidebar.caption(f"🗂️ Particiones leídas: {len(dataset.partitions(filters))} de {len(dataset.partitions())}")
 
 st.sidebar.markdown("---")
 st.sidebar.info("""
@@ -342,7 +436,7 @@ st.markdown('<div class="big-title">🏨 El Enigma de las Cancelaciones</div>',
 st.markdown('<div class="subtitle">Un Viaje por los Datos Hoteleros de Portugal (2015-2017)</div>', unsafe_allow_html=True)
 
 # Hero metric
-cancelation_rate = data_filtered["is_canceled"].mean() * 100
+cancelation_rate = totales["is_canceled_sum"] / totales["count"] * 100
 st.markdown(f"""
 <div class="hero-metric">
     <div class="hero-number">{cancelation_rate:.1f}%</div>
@@ -439,13 +533,13 @@ col1, col2, col3, col4 = st.columns(4)
 with col1:
     st.markdown(f"""
     <div class="metric-card">
-        <div class="metric-value">{len(data_filtered):,}</div>
+        <div class="metric-value">{int(totales['count']):,}</div>
         <div class="metric-label">Reservas Totales</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col2:
-    canceled = data_filtered["is_canceled"].sum()
+    canceled = int(totales["is_canceled_sum"])
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-value" style="color: #d62728;">{canceled:,}</div>
@@ -454,7 +548,7 @@ with col2:
     """, unsafe_allow_html=True)
 
 with col3:
-    avg_adr = data_filtered["adr"].mean()
+    avg_adr = totales["adr_sum"] / totales["count"]
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-value" style="color: #28a745;">€{avg_adr:.2f}</div>
@@ -463,8 +557,8 @@ with col3:
     """, unsafe_allow_html=True)
 
 with col4:
-    avg_lead = data_filtered["lead_time"].mean()
-    median_lead = data_filtered["lead_time"].median()
+    avg_lead = totales["lead_time_sum"] / totales["count"]
+    median_lead = histogram_stats(bundle['lead_time'], None, 'lead_time')['median'].iloc[0]
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-value" style="color: #ff7f0e;">{int(median_lead)}</div>
@@ -489,52 +583,57 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.markdown("#### 🏨 Distribución por Tipo de Hotel")
-    hotel_dist = data_filtered.groupby("hotel").size().reset_index(name="count")
-    fig_hotel = px.pie(
-        hotel_dist,
-        values="count",
-        names="hotel",
-        color_discrete_sequence=["#1f77b4", "#ff7f0e"],
-        hole=0.45
-    )
-    fig_hotel.update_traces(
-        textposition='inside', 
-        textinfo='percent+label', 
-        textfont_size=16,
-        marker=dict(line=dict(color='white', width=3))
-    )
-    fig_hotel.update_layout(
-        height=420, 
-        showlegend=True,
-        font=dict(size=14)
-    )
+    def build_fig_hotel():
+        hotel_dist = cube.slice("hotel", filters)[["hotel", "count"]]
+        fig_hotel = px.pie(
+            hotel_dist,
+            values="count",
+            names="hotel",
+            color_discrete_sequence=["#1f77b4", "#ff7f0e"],
+            hole=0.45
+        )
+        fig_hotel.update_traces(
+            textposition='inside', 
+            textinfo='percent+label', 
+            textfont_size=16,
+            marker=dict(line=dict(color='white', width=3))
+        )
+        fig_hotel.update_layout(
+            height=420, 
+            showlegend=True,
+            font=dict(size=14)
+        )
+        return fig_hotel
+    fig_hotel = cached_figure("fig_hotel", build_fig_hotel)
     st.plotly_chart(fig_hotel, use_container_width=True, key="fig_hotel_ch2")
 
 with col2:
     st.markdown("#### 📋 Estado de las Reservas")
-    status_map = {1: "Cancelada", 0: "Completada"}
-    data_filtered_status = data_filtered.copy()
-    data_filtered_status["status"] = data_filtered_status["is_canceled"].map(status_map)
-    
-    status_dist = data_filtered_status.groupby("status").size().reset_index(name="count")
-    fig_status = px.pie(
-        status_dist,
-        values="count",
-        names="status",
-        color_discrete_sequence=["#2ca02c", "#d62728"],
-        hole=0.45
-    )
-    fig_status.update_traces(
-        textposition='inside', 
-        textinfo='percent+label', 
-        textfont_size=16,
-        marker=dict(line=dict(color='white', width=3))
-    )
-    fig_status.update_layout(
-        height=420, 
-        showlegend=True,
-        font=dict(size=14)
-    )
+    def build_fig_status():
+        status_map = {1: "Cancelada", 0: "Completada"}
+        status_dist = cube.slice("is_canceled", filters)
+        status_dist["status"] = status_dist["is_canceled"].map(status_map)
+        status_dist = status_dist.sort_values("status")[["status", "count"]]
+        fig_status = px.pie(
+            status_dist,
+            values="count",
+            names="status",
+            color_discrete_sequence=["#2ca02c", "#d62728"],
+            hole=0.45
+        )
+        fig_status.update_traces(
+            textposition='inside', 
+            textinfo='percent+label', 
+            textfont_size=16,
+            marker=dict(line=dict(color='white', width=3))
+        )
+        fig_status.update_layout(
+            height=420, 
+            showlegend=True,
+            font=dict(size=14)
+        )
+        return fig_status
+    fig_status = cached_figure("fig_status", build_fig_status)
     st.plotly_chart(fig_status, use_container_width=True, key="fig_status_ch2")
 
 st.markdown("### 👥 Composición de Huéspedes y Duración")
@@ -542,53 +641,57 @@ st.markdown("### 👥 Composición de Huéspedes y Duración")
 col1, col2 = st.columns(2)
 
 with col1:
-    if 'total_guests' in data_filtered.columns:
-        guests_dist = data_filtered['total_guests'].value_counts().sort_index().reset_index()
-        guests_dist.columns = ['num_guests', 'count']
-        guests_dist = guests_dist[guests_dist['num_guests'] <= 8]
+    if 'huespedes' in bundle:
+        def build_fig_guests():
+            guests_dist = bundle['huespedes'].rename(columns={'total_guests': 'num_guests'})
+            guests_dist = guests_dist[guests_dist['num_guests'] <= 8]
         
-        fig_guests = px.bar(
-            guests_dist,
-            x='num_guests',
-            y='count',
-            title='Distribución por Número de Huéspedes',
-            labels={'num_guests': 'Huéspedes', 'count': 'Reservas'},
-            color='count',
-            color_continuous_scale='Teal'
-        )
-        fig_guests.update_traces(
-            text=guests_dist['count'],
-            texttemplate='%{text:,}',
-            textposition='outside',
-            marker_line_color='white',
-            marker_line_width=2
-        )
-        fig_guests.update_layout(height=400, showlegend=False, font=dict(size=13))
+            fig_guests = px.bar(
+                guests_dist,
+                x='num_guests',
+                y='count',
+                title='Distribución por Número de Huéspedes',
+                labels={'num_guests': 'Huéspedes', 'count': 'Reservas'},
+                color='count',
+                color_continuous_scale='Teal'
+            )
+            fig_guests.update_traces(
+                text=guests_dist['count'],
+                texttemplate='%{text:,}',
+                textposition='outside',
+                marker_line_color='white',
+                marker_line_width=2
+            )
+            fig_guests.update_layout(height=400, showlegend=False, font=dict(size=13))
+            return fig_guests
+        fig_guests = cached_figure("fig_guests", build_fig_guests)
         st.plotly_chart(fig_guests, use_container_width=True, key="fig_guests_ch2")
 
 with col2:
-    if 'total_nights' in data_filtered.columns:
-        nights_dist = data_filtered[data_filtered['total_nights'] <= 14].copy()
-        nights_counts = nights_dist['total_nights'].value_counts().sort_index().reset_index()
-        nights_counts.columns = ['num_nights', 'count']
+    if 'noches' in bundle:
+        def build_fig_nights():
+            nights_counts = bundle['noches'].rename(columns={'total_nights': 'num_nights'})
+            nights_counts = nights_counts[nights_counts['num_nights'] <= 14]
         
-        fig_nights = px.bar(
-            nights_counts,
-            x='num_nights',
-            y='count',
-            title='Distribución por Duración de Estancia',
-            labels={'num_nights': 'Noches', 'count': 'Reservas'},
-            color='count',
-            color_continuous_scale='Magma'
-        )
-        fig_nights.update_traces(
-            text=nights_counts['count'],
-            texttemplate='%{text:,}',
-            textposition='outside',
-            marker_line_color='white',
-            marker_line_width=2
-        )
-        fig_nights.update_layout(height=400, showlegend=False, font=dict(size=13))
+            fig_nights = px.bar(
+                nights_counts,
+                x='num_nights',
+                y='count',
+                title='Distribución por Duración de Estancia',
+                labels={'num_nights': 'Noches', 'count': 'Reservas'},
+                color='count',
+                color_continuous_scale='Magma'
+            )
+            fig_nights.update_traces(
+                text=nights_counts['count'],
+                texttemplate='%{text:,}',
+                textposition='outside',
+                marker_line_color='white',
+                marker_line_width=2
+            )
+            fig_nights.update_layout(height=400, showlegend=False, font=dict(size=13))
+            return fig_nights
+        fig_nights = cached_figure("fig_nights", build_fig_nights)
         st.plotly_chart(fig_nights, use_container_width=True, key="fig_nights_ch2")
 
 st.markdown("---")
@@ -612,19 +715,17 @@ fascinante: mientras la mediana es de 69 días, encontramos reservas con hasta 2
 # Evolución temporal
 st.markdown("### 📅 Evolución Temporal: El Ritmo de las Cancelaciones")
 
-if 'dia' in data_filtered.columns:
-    df_time = data_filtered.dropna(subset=['dia']).copy()
-    df_time['year_month'] = df_time['dia'].dt.to_period('M').astype(str)
-    
-    monthly = df_time.groupby(['year_month', 'hotel']).size().reset_index(name='reservas')
-    
+def build_fig_time_hotel():
+    # Serie mensual sumada sobre el cubo diario, sin reagrupar reservas
+    monthly = get_daily_cube().resample(filters, 'month', by=('hotel',)).rename(columns={'count': 'reservas'})
+
     fig_time_hotel = px.line(
         monthly,
-        x='year_month',
+        x='period',
         y='reservas',
         color='hotel',
         title='Reservas Mensuales por Tipo de Hotel',
-        labels={'year_month': 'Mes', 'reservas': 'Número de Reservas', 'hotel': 'Hotel'},
+        labels={'period': 'Mes', 'reservas': 'Número de Reservas', 'hotel': 'Hotel'},
         color_discrete_sequence=['#1f77b4', '#ff7f0e'],
         markers=True
     )
@@ -636,36 +737,46 @@ if 'dia' in data_filtered.columns:
         title_font_size=18
     )
     fig_time_hotel.update_xaxes(tickangle=45)
-    st.plotly_chart(fig_time_hotel, use_container_width=True, key="fig_time_hotel_ch3")
+    return fig_time_hotel
+fig_time_hotel = cached_figure("fig_time_hotel", build_fig_time_hotel)
+st.plotly_chart(fig_time_hotel, use_container_width=True, key="fig_time_hotel_ch3")
 
 # Comparativa por temporada
 st.markdown("### 🌤️ Estacionalidad: El Patrón Oculto")
 
-if 'season' in data_filtered.columns:
-    season_order = ['Primavera', 'Verano', 'Otoño', 'Invierno']
-    season_cancellations = data_filtered.groupby(['season', 'is_canceled']).size().reset_index(name='count')
-    season_cancellations['status'] = season_cancellations['is_canceled'].map({0: 'Completadas', 1: 'Canceladas'})
+if 'season' in cube.tables:
+    def build_fig_season():
+        season_order = ['Primavera', 'Verano', 'Otoño', 'Invierno']
+        season_counts = cube.slice('season', filters)
+        season_cancellations = pd.concat([
+            season_counts.assign(is_canceled=0, count=season_counts['count'] - season_counts['canceled']),
+            season_counts.assign(is_canceled=1, count=season_counts['canceled'])
+        ])[['season', 'is_canceled', 'count']]
+        season_cancellations = season_cancellations[season_cancellations['count'] > 0]
+        season_cancellations['status'] = season_cancellations['is_canceled'].map({0: 'Completadas', 1: 'Canceladas'})
     
-    season_cancellations['season'] = pd.Categorical(season_cancellations['season'], categories=season_order, ordered=True)
-    season_cancellations = season_cancellations.sort_values('season')
+        season_cancellations['season'] = pd.Categorical(season_cancellations['season'], categories=season_order, ordered=True)
+        season_cancellations = season_cancellations.sort_values('season')
     
-    fig_season = px.bar(
-        season_cancellations,
-        x='season',
-        y='count',
-        color='status',
-        barmode='group',
-        title='Reservas por Temporada: Completadas vs Canceladas',
-        labels={'season': 'Temporada', 'count': 'Número de Reservas', 'status': 'Estado'},
-        color_discrete_map={'Completadas': '#2ca02c', 'Canceladas': '#d62728'}
-    )
-    fig_season.update_traces(marker_line_color='white', marker_line_width=2)
-    fig_season.update_layout(
-        height=480, 
-        font=dict(size=13),
-        title_font_size=18,
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
-    )
+        fig_season = px.bar(
+            season_cancellations,
+            x='season',
+            y='count',
+            color='status',
+            barmode='group',
+            title='Reservas por Temporada: Completadas vs Canceladas',
+            labels={'season': 'Temporada', 'count': 'Número de Reservas', 'status': 'Estado'},
+            color_discrete_map={'Completadas': '#2ca02c', 'Canceladas': '#d62728'}
+        )
+        fig_season.update_traces(marker_line_color='white', marker_line_width=2)
+        fig_season.update_layout(
+            height=480, 
+            font=dict(size=13),
+            title_font_size=18,
+            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+        )
+        return fig_season
+    fig_season = cached_figure("fig_season", build_fig_season)
     st.plotly_chart(fig_season, use_container_width=True, key="fig_season_ch3")
 
 st.markdown("""
@@ -682,33 +793,36 @@ st.markdown("### ⏳ Lead Time: El Factor Predictivo Definitivo")
 col1, col2 = st.columns([2, 1])
 
 with col1:
-    if 'lead_time_category' in data_filtered.columns:
-        category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
+    if 'lead_time_category' in cube.tables:
+        def build_fig_lead():
+            category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
         
-        lead_cancel = data_filtered.groupby('lead_time_category')['is_canceled'].agg(['sum', 'count']).reset_index()
-        lead_cancel['cancel_rate'] = (lead_cancel['sum'] / lead_cancel['count'] * 100).round(2)
+            lead_cancel = cube.slice('lead_time_category', filters, drop_empty=True).rename(columns={'canceled': 'sum'})
+            lead_cancel['cancel_rate'] = (lead_cancel['sum'] / lead_cancel['count'] * 100).round(2)
         
-        lead_cancel['lead_time_category'] = pd.Categorical(lead_cancel['lead_time_category'], categories=category_order, ordered=True)
-        lead_cancel = lead_cancel.sort_values('lead_time_category')
+            lead_cancel['lead_time_category'] = pd.Categorical(lead_cancel['lead_time_category'], categories=category_order, ordered=True)
+            lead_cancel = lead_cancel.sort_values('lead_time_category')
         
-        fig_lead = px.bar(
-            lead_cancel,
-            x='lead_time_category',
-            y='cancel_rate',
-            title='Tasa de Cancelación según Anticipación',
-            labels={'lead_time_category': 'Lead Time', 'cancel_rate': 'Tasa Cancelación (%)'},
-            color='cancel_rate',
-            color_continuous_scale='Reds'
-        )
-        fig_lead.update_traces(
-            text=lead_cancel['cancel_rate'],
-            texttemplate='%{text:.1f}%',
-            textposition='outside',
-            marker_line_color='white',
-            marker_line_width=2
-        )
-        fig_lead.update_layout(height=480, showlegend=False, font=dict(size=13), title_font_size=18)
-        fig_lead.update_xaxes(tickangle=45)
+            fig_lead = px.bar(
+                lead_cancel,
+                x='lead_time_category',
+                y='cancel_rate',
+                title='Tasa de Cancelación según Anticipación',
+                labels={'lead_time_category': 'Lead Time', 'cancel_rate': 'Tasa Cancelación (%)'},
+                color='cancel_rate',
+                color_continuous_scale='Reds'
+            )
+            fig_lead.update_traces(
+                text=lead_cancel['cancel_rate'],
+                texttemplate='%{text:.1f}%',
+                textposition='outside',
+                marker_line_color='white',
+                marker_line_width=2
+            )
+            fig_lead.update_layout(height=480, showlegend=False, font=dict(size=13), title_font_size=18)
+            fig_lead.update_xaxes(tickangle=45)
+            return fig_lead
+        fig_lead = cached_figure("fig_lead", build_fig_lead)
         st.plotly_chart(fig_lead, use_container_width=True, key="fig_lead_ch3")
 
 with col2:
@@ -733,51 +847,54 @@ with col2:
 # Lead Time vs Duración
 st.markdown("### 🔄 Lead Time vs Duración de Estancia")
 
-if 'lead_time_category' in data_filtered.columns and 'total_nights' in data_filtered.columns:
-    category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
-    
-    lead_nights = data_filtered[data_filtered['total_nights'] <= 20].copy()
-    lead_nights_avg = lead_nights.groupby('lead_time_category')['total_nights'].agg(['mean', 'median', 'count']).reset_index()
-    lead_nights_avg.columns = ['lead_time_category', 'promedio_noches', 'mediana_noches', 'num_reservas']
+if 'lead_noches' in bundle:
+    def build_fig_lead_nights():
+        category_order = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
     
-    lead_nights_avg['lead_time_category'] = pd.Categorical(lead_nights_avg['lead_time_category'], categories=category_order, ordered=True)
-    lead_nights_avg = lead_nights_avg.sort_values('lead_time_category')
+        lead_nights = bundle['lead_noches']
+        lead_nights = lead_nights[lead_nights['total_nights'] <= 20]
+        lead_nights_avg = histogram_stats(lead_nights, 'lead_time_category', 'total_nights')
+        lead_nights_avg.columns = ['lead_time_category', 'promedio_noches', 'mediana_noches', 'num_reservas']
     
-    fig_lead_nights = go.Figure()
+        lead_nights_avg['lead_time_category'] = pd.Categorical(lead_nights_avg['lead_time_category'], categories=category_order, ordered=True)
+        lead_nights_avg = lead_nights_avg.sort_values('lead_time_category')
     
-    fig_lead_nights.add_trace(go.Bar(
-        name='Promedio de Noches',
-        x=lead_nights_avg['lead_time_category'],
-        y=lead_nights_avg['promedio_noches'],
-        marker_color='#1f77b4',
-        marker_line_color='white',
-        marker_line_width=2,
-        text=lead_nights_avg['promedio_noches'].round(1),
-        texttemplate='%{text:.1f}',
-        textposition='outside'
-    ))
+        fig_lead_nights = go.Figure()
     
-    fig_lead_nights.add_trace(go.Scatter(
-        name='Mediana de Noches',
-        x=lead_nights_avg['lead_time_category'],
-        y=lead_nights_avg['mediana_noches'],
-        mode='lines+markers',
-        marker=dict(color='#ff7f0e', size=12, line=dict(color='white', width=2)),
-        line=dict(color='#ff7f0e', width=4)
-    ))
+        fig_lead_nights.add_trace(go.Bar(
+            name='Promedio de Noches',
+            x=lead_nights_avg['lead_time_category'],
+            y=lead_nights_avg['promedio_noches'],
+            marker_color='#1f77b4',
+            marker_line_color='white',
+            marker_line_width=2,
+            text=lead_nights_avg['promedio_noches'].round(1),
+            texttemplate='%{text:.1f}',
+            textposition='outside'
+        ))
     
-    fig_lead_nights.update_layout(
-        title='¿Reservas anticipadas = Estancias más largas?',
-        xaxis_title='Categoría de Lead Time',
-        yaxis_title='Número de Noches',
-        height=480,
-        hovermode='x unified',
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-        font=dict(size=13),
-        title_font_size=18
-    )
-    fig_lead_nights.update_xaxes(tickangle=45)
+        fig_lead_nights.add_trace(go.Scatter(
+            name='Mediana de Noches',
+            x=lead_nights_avg['lead_time_category'],
+            y=lead_nights_avg['mediana_noches'],
+            mode='lines+markers',
+            marker=dict(color='#ff7f0e', size=12, line=dict(color='white', width=2)),
+            line=dict(color='#ff7f0e', width=4)
+        ))
     
+        fig_lead_nights.update_layout(
+            title='¿Reservas anticipadas = Estancias más largas?',
+            xaxis_title='Categoría de Lead Time',
+            yaxis_title='Número de Noches',
+            height=480,
+            hovermode='x unified',
+            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+            font=dict(size=13),
+            title_font_size=18
+        )
+        fig_lead_nights.update_xaxes(tickangle=45)
+        return fig_lead_nights
+    fig_lead_nights = cached_figure("fig_lead_nights", build_fig_lead_nights)
     st.plotly_chart(fig_lead_nights, use_container_width=True, key="fig_lead_nights_ch3")
     
     st.markdown("""
@@ -811,48 +928,54 @@ st.markdown("### 📊 Canales de Distribución")
 col1, col2 = st.columns(2)
 
 with col1:
-    if 'distribution_channel' in data_filtered.columns:
-        channel_dist = data_filtered.groupby('distribution_channel').size().reset_index(name='count')
-        channel_dist = channel_dist.sort_values('count', ascending=False)
+    if 'distribution_channel' in cube.tables:
+        def build_fig_channel():
+            channel_dist = cube.slice('distribution_channel', filters)[['distribution_channel', 'count']]
+            channel_dist = channel_dist.sort_values('count', ascending=False)
         
-        fig_channel = px.bar(
-            channel_dist,
-            x='count',
-            y='distribution_channel',
-            orientation='h',
-            title='Reservas por Canal de Distribución',
-            labels={'distribution_channel': 'Canal', 'count': 'Reservas'},
-            color='count',
-            color_continuous_scale='Blues'
-        )
-        fig_channel.update_traces(
-            text=channel_dist['count'],
-            texttemplate='%{text:,}',
-            textposition='outside',
-            marker_line_color='white',
-            marker_line_width=2
-        )
-        fig_channel.update_layout(height=420, showlegend=False, font=dict(size=13), title_font_size=18)
+            fig_channel = px.bar(
+                channel_dist,
+                x='count',
+                y='distribution_channel',
+                orientation='h',
+                title='Reservas por Canal de Distribución',
+                labels={'distribution_channel': 'Canal', 'count': 'Reservas'},
+                color='count',
+                color_continuous_scale='Blues'
+            )
+            fig_channel.update_traces(
+                text=channel_dist['count'],
+                texttemplate='%{text:,}',
+                textposition='outside',
+                marker_line_color='white',
+                marker_line_width=2
+            )
+            fig_channel.update_layout(height=420, showlegend=False, font=dict(size=13), title_font_size=18)
+            return fig_channel
+        fig_channel = cached_figure("fig_channel", build_fig_channel)
         st.plotly_chart(fig_channel, use_container_width=True, key="fig_channel_ch4")
 
 with col2:
-    if 'market_segment' in data_filtered.columns:
-        market_dist = data_filtered.groupby('market_segment').size().reset_index(name='count')
-        market_dist = market_dist.sort_values('count', ascending=False)
+    if 'market_segment' in cube.tables:
+        def build_fig_market_dist():
+            market_dist = cube.slice('market_segment', filters)[['market_segment', 'count']]
+            market_dist = market_dist.sort_values('count', ascending=False)
         
-        fig_market_dist = px.pie(
-            market_dist,
-            values='count',
-            names='market_segment',
-            title='Segmento de Mercado',
-            hole=0.45
-        )
-        fig_market_dist.update_traces(
-            textposition='inside', 
-            textinfo='percent+label',
-            marker=dict(line=dict(color='white', width=3))
-        )
-        fig_market_dist.update_layout(height=420, font=dict(size=13), title_font_size=18)
+            fig_market_dist = px.pie(
+                market_dist,
+                values='count',
+                names='market_segment',
+                title='Segmento de Mercado',
+                hole=0.45
+            )
+            fig_market_dist.update_traces(
+                textposition='inside', 
+                textinfo='percent+label',
+                marker=dict(line=dict(color='white', width=3))
+            )
+            fig_market_dist.update_layout(height=420, font=dict(size=13), title_font_size=18)
+            return fig_market_dist
+        fig_market_dist = cached_figure("fig_market_dist", build_fig_market_dist)
         st.plotly_chart(fig_market_dist, use_container_width=True, key="fig_market_dist_ch4")
 
 st.markdown("""
@@ -867,25 +990,28 @@ st.markdown("### 🔄 Crisis de Fidelización")
 col1, col2 = st.columns(2)
 
 with col1:
-    if 'is_repeated_guest' in data_filtered.columns:
-        repeated_dist = data_filtered.groupby('is_repeated_guest').size().reset_index(name='count')
-        repeated_dist['type'] = repeated_dist['is_repeated_guest'].map({0: 'Nuevos', 1: 'Repetidos'})
+    if 'is_repeated_guest' in cube.tables:
+        def build_fig_repeated():
+            repeated_dist = cube.slice('is_repeated_guest', filters)[['is_repeated_guest', 'count']]
+            repeated_dist['type'] = repeated_dist['is_repeated_guest'].map({0: 'Nuevos', 1: 'Repetidos'})
         
-        fig_repeated = px.pie(
-            repeated_dist,
-            values='count',
-            names='type',
-            title='Huéspedes: Nuevos vs Repetidos',
-            color_discrete_sequence=['#ff7f0e', '#2ca02c'],
-            hole=0.45
-        )
-        fig_repeated.update_traces(
-            textposition='inside', 
-            textinfo='percent+label', 
-            textfont_size=18,
-            marker=dict(line=dict(color='white', width=3))
-        )
-        fig_repeated.update_layout(height=420, font=dict(size=14), title_font_size=18)
+            fig_repeated = px.pie(
+                repeated_dist,
+                values='count',
+                names='type',
+                title='Huéspedes: Nuevos vs Repetidos',
+                color_discrete_sequence=['#ff7f0e', '#2ca02c'],
+                hole=0.45
+            )
+            fig_repeated.update_traces(
+                textposition='inside', 
+                textinfo='percent+label', 
+                textfont_size=18,
+                marker=dict(line=dict(color='white', width=3))
+            )
+            fig_repeated.update_layout(height=420, font=dict(size=14), title_font_size=18)
+            return fig_repeated
+        fig_repeated = cached_figure("fig_repeated", build_fig_repeated)
         st.plotly_chart(fig_repeated, use_container_width=True, key="fig_repeated_ch4")
 
 with col2:
@@ -961,112 +1087,118 @@ with col1:
 with col2:
     st.markdown("#### 📊 Calculadora de Impacto Financiero")
     
-    total_reservas = len(data_filtered)
-    canceladas = data_filtered['is_canceled'].sum()
-    tasa_actual = (canceladas / total_reservas * 100)
+    @st.fragment
+    def calculadora_impacto(totales):
+        # Fragmento aislado: mover el slider solo reejecuta la calculadora, con los KPIs base ya calculados
+        total_reservas = int(totales["count"])
+        canceladas = int(totales["is_canceled_sum"])
+        tasa_actual = (canceladas / total_reservas * 100)
     
-    reduccion_objetivo = st.slider(
-        "**Reducción objetivo en puntos porcentuales**",
-        min_value=5,
-        max_value=20,
-        value=10,
-        step=1,
-        help="Desliza para ver el impacto financiero de diferentes reducciones",
-        key="reduccion_slider"
-    )
+        reduccion_objetivo = st.slider(
+            "**Reducción objetivo en puntos porcentuales**",
+            min_value=5,
+            max_value=20,
+            value=10,
+            step=1,
+            help="Desliza para ver el impacto financiero de diferentes reducciones",
+            key="reduccion_slider"
+        )
     
-    nueva_tasa = tasa_actual - reduccion_objetivo
-    reservas_salvadas = int(total_reservas * (reduccion_objetivo / 100))
-    avg_adr = data_filtered["adr"].mean()
-    noches_promedio = data_filtered["total_nights"].mean() if "total_nights" in data_filtered.columns else 2.5
-    ingresos_recuperados = reservas_salvadas * avg_adr * noches_promedio
+        nueva_tasa = tasa_actual - reduccion_objetivo
+        reservas_salvadas = int(total_reservas * (reduccion_objetivo / 100))
+        avg_adr = totales["adr_sum"] / totales["count"]
+        noches_promedio = totales["total_nights_sum"] / totales["count"] if "total_nights_sum" in totales else 2.5
+        ingresos_recuperados = reservas_salvadas * avg_adr * noches_promedio
     
-    st.markdown(f"""
-    <div style="background: white; padding: 30px; border-radius: 15px; box-shadow: 0 8px 20px rgba(0,0,0,0.15);">
-    <h4 style="color: #1f77b4; margin-top: 0;">💰 Proyección de Impacto</h4>
-    <table style="width: 100%; font-size: 16px; line-height: 2.5;">
-    <tr>
-        <td><strong>Tasa actual:</strong></td>
-        <td style="text-align: right; font-size: 20px;">{tasa_actual:.1f}%</td>
-    </tr>
-    <tr>
-        <td><strong>Tasa objetivo:</strong></td>
-        <td style="text-align: right; font-size: 20px; color: #28a745;"><strong>{nueva_tasa:.1f}%</strong></td>
-    </tr>
-    <tr>
-        <td><strong>Reservas salvadas:</strong></td>
-        <td style="text-align: right; font-size: 20px;">{reservas_salvadas:,}</td>
-    </tr>
-    <tr>
-        <td><strong>Noches promedio:</strong></td>
-        <td style="text-align: right; font-size: 20px;">{noches_promedio:.1f}</td>
-    </tr>
-    <tr style="border-top: 3px solid #1f77b4;">
-        <td style="padding-top: 15px;"><strong>💵 Ingresos recuperados:</strong></td>
-        <td style="text-align: right; color: #28a745; font-size: 28px; font-weight: 900; padding-top: 15px;">
-            €{ingresos_recuperados:,.0f}
-        </td>
-    </tr>
-    </table>
-    </div>
-    """, unsafe_allow_html=True)
+        st.markdown(f"""
+        <div style="background: white; padding: 30px; border-radius: 15px; box-shadow: 0 8px 20px rgba(0,0,0,0.15);">
+        <h4 style="color: #1f77b4; margin-top: 0;">💰 Proyección de Impacto</h4>
+        <table style="width: 100%; font-size: 16px; line-height: 2.5;">
+        <tr>
+            <td><strong>Tasa actual:</strong></td>
+            <td style="text-align: right; font-size: 20px;">{tasa_actual:.1f}%</td>
+        </tr>
+        <tr>
+            <td><strong>Tasa objetivo:</strong></td>
+            <td style="text-align: right; font-size: 20px; color: #28a745;"><strong>{nueva_tasa:.1f}%</strong></td>
+        </tr>
+        <tr>
+            <td><strong>Reservas salvadas:</strong></td>
+            <td style="text-align: right; font-size: 20px;">{reservas_salvadas:,}</td>
+        </tr>
+        <tr>
+            <td><strong>Noches promedio:</strong></td>
+            <td style="text-align: right; font-size: 20px;">{noches_promedio:.1f}</td>
+        </tr>
+        <tr style="border-top: 3px solid #1f77b4;">
+            <td style="padding-top: 15px;"><strong>💵 Ingresos recuperados:</strong></td>
+            <td style="text-align: right; color: #28a745; font-size: 28px; font-weight: 900; padding-top: 15px;">
+                €{ingresos_recuperados:,.0f}
+            </td>
+        </tr>
+        </table>
+        </div>
+        """, unsafe_allow_html=True)
     
-    st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
     
-    if reduccion_objetivo >= 15:
-        st.success("🎯 **Meta ambiciosa pero alcanzable** con implementación completa de las 3 estrategias")
-    elif reduccion_objetivo >= 10:
-        st.info("✅ **Meta realista** aplicando estrategias de depósito y precios dinámicos")
-    else:
-        st.warning("⚠️ **Meta conservadora**. Considera ser más agresivo en la implementación")
+        if reduccion_objetivo >= 15:
+            st.success("🎯 **Meta ambiciosa pero alcanzable** con implementación completa de las 3 estrategias")
+        elif reduccion_objetivo >= 10:
+            st.info("✅ **Meta realista** aplicando estrategias de depósito y precios dinámicos")
+        else:
+            st.warning("⚠️ **Meta conservadora**. Considera ser más agresivo en la implementación")
+
+    calculadora_impacto(totales)
 
 # Impacto de políticas de depósito
 st.markdown("### 💳 Evidencia: Impacto de la Política de Depósito")
 
-if 'deposit_type' in data_filtered.columns:
-    deposit_cancel = data_filtered.groupby('deposit_type').agg({
-        'is_canceled': ['sum', 'count']
-    }).reset_index()
-    deposit_cancel.columns = ['deposit_type', 'canceled', 'total']
-    deposit_cancel['cancel_rate'] = (deposit_cancel['canceled'] / deposit_cancel['total'] * 100).round(2)
-    deposit_cancel['completed_rate'] = 100 - deposit_cancel['cancel_rate']
+if 'deposit_type' in cube.tables:
+    def build_fig_deposit():
+        deposit_cancel = cube.slice('deposit_type', filters)[['deposit_type', 'canceled', 'count']]
+        deposit_cancel.columns = ['deposit_type', 'canceled', 'total']
+        deposit_cancel['cancel_rate'] = (deposit_cancel['canceled'] / deposit_cancel['total'] * 100).round(2)
+        deposit_cancel['completed_rate'] = 100 - deposit_cancel['cancel_rate']
     
-    fig_deposit = go.Figure()
-    fig_deposit.add_trace(go.Bar(
-        name='✅ Completadas',
-        x=deposit_cancel['deposit_type'],
-        y=deposit_cancel['completed_rate'],
-        marker_color='#2ca02c',
-        marker_line_color='white',
-        marker_line_width=2,
-        text=deposit_cancel['completed_rate'].round(1),
-        texttemplate='%{text}%',
-        textposition='inside',
-        textfont=dict(size=14, color='white')
-    ))
-    fig_deposit.add_trace(go.Bar(
-        name='❌ Canceladas',
-        x=deposit_cancel['deposit_type'],
-        y=deposit_cancel['cancel_rate'],
-        marker_color='#d62728',
-        marker_line_color='white',
-        marker_line_width=2,
-        text=deposit_cancel['cancel_rate'].round(1),
-        texttemplate='%{text}%',
-        textposition='inside',
-        textfont=dict(size=14, color='white')
-    ))
+        fig_deposit = go.Figure()
+        fig_deposit.add_trace(go.Bar(
+            name='✅ Completadas',
+            x=deposit_cancel['deposit_type'],
+            y=deposit_cancel['completed_rate'],
+            marker_color='#2ca02c',
+            marker_line_color='white',
+            marker_line_width=2,
+            text=deposit_cancel['completed_rate'].round(1),
+            texttemplate='%{text}%',
+            textposition='inside',
+            textfont=dict(size=14, color='white')
+        ))
+        fig_deposit.add_trace(go.Bar(
+            name='❌ Canceladas',
+            x=deposit_cancel['deposit_type'],
+            y=deposit_cancel['cancel_rate'],
+            marker_color='#d62728',
+            marker_line_color='white',
+            marker_line_width=2,
+            text=deposit_cancel['cancel_rate'].round(1),
+            texttemplate='%{text}%',
+            textposition='inside',
+            textfont=dict(size=14, color='white')
+        ))
     
-    fig_deposit.update_layout(
-        title='Depósitos: La Diferencia es Abismal',
-        xaxis_title='Tipo de Depósito',
-        yaxis_title='Porcentaje (%)',
-        barmode='stack',
-        height=480,
-        font=dict(size=13),
-        title_font_size=18,
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
-    )
+        fig_deposit.update_layout(
+            title='Depósitos: La Diferencia es Abismal',
+            xaxis_title='Tipo de Depósito',
+            yaxis_title='Porcentaje (%)',
+            barmode='stack',
+            height=480,
+            font=dict(size=13),
+            title_font_size=18,
+            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+        )
+        return fig_deposit
+    fig_deposit = cached_figure("fig_deposit", build_fig_deposit)
     st.plotly_chart(fig_deposit, use_container_width=True, key="fig_deposit_ch5")
 
 st.markdown("""
@@ -1131,6 +1263,19 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Panel de depuración de la caché de resultados (al final, con los contadores del rerun)
+with st.sidebar.expander("🧪 Caché de resultados", expanded=False):
+    cache_stats = result_cache.stats()
+    st.markdown(f"""
+    - **Aciertos / fallos:** {cache_stats['hits']:,} / {cache_stats['misses']:,}
+    - **Tasa de acierto:** {cache_stats['hit_rate']:.1%}
+    - **Entradas:** {cache_stats['entries']:,}
+    - **Memoria:** {cache_stats['bytes'] / 1024**2:.1f} / {cache_stats['max_bytes'] / 1024**2:.0f} MB
+    - **Expulsadas (LRU):** {cache_stats['evictions']:,} · **Caducadas (TTL):** {cache_stats['expirations']:,}
+    """)
+    if st.button("Vaciar caché", key="clear_result_cache"):
+        result_cache.clear()
+
 # ============================================
 # FOOTER - CIERRE NARRATIVO
 # ============================================
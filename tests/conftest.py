@@ -0,0 +1,107 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.bookings import load_bookings
+########################################
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August',
+          'September', 'October', 'November', 'December']
+
+
+def make_raw_bookings(n=3000, seed=0):
+    """
+    Reservas sintéticas con las columnas de `hotel_bookings_processed.csv`,
+    tal y como se leerían del CSV (antes de `derive_columns`).
+
+    Parámetros:
+    -----------
+    n : int
+        Número de reservas.
+    seed : int
+        Semilla del generador aleatorio.
+
+    Retorna:
+    --------
+    pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    year = rng.choice([2015, 2016, 2017], n)
+    month = rng.integers(1, 13, n)
+    day = rng.integers(1, 29, n)
+    lead = rng.integers(0, 700, n)
+    canceled = rng.random(n) < 0.37
+    arrivals = pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': day}))
+    weekend, week = rng.integers(0, 5, n), rng.integers(0, 12, n)
+    status = np.where(
+        canceled,
+        arrivals - pd.to_timedelta((lead * rng.random(n)).astype(int), unit='D'),
+        arrivals + pd.to_timedelta(weekend + week, unit='D'),
+    )
+    children = rng.integers(0, 3, n).astype(float)
+    children[rng.choice(n, 4)] = np.nan
+    country = rng.choice(['PRT', 'GBR', 'FRA', 'ESP', 'DEU', 'ITA', 'IRL', 'BEL', 'BRA', 'NLD'], n).astype(object)
+    country[rng.choice(n, 20)] = np.nan
+    return pd.DataFrame({
+        'hotel': rng.choice(['City Hotel', 'Resort Hotel'], n, p=[.665, .335]),
+        'is_canceled': canceled.astype(int),
+        'lead_time': lead,
+        'arrival_date_year': year,
+        'arrival_date_month': [MONTHS[m - 1] for m in month],
+        'arrival_date_week_number': arrivals.dt.isocalendar().week.to_numpy(dtype=int),
+        'arrival_date_day_of_month': day,
+        'stays_in_weekend_nights': weekend,
+        'stays_in_week_nights': week,
+        'adults': rng.integers(1, 4, n),
+        'children': children,
+        'babies': rng.choice([0, 0, 0, 1], n),
+        'meal': rng.choice(['BB', 'HB', 'SC', 'FB', 'Undefined'], n),
+        'country': country,
+        'market_segment': rng.choice(['Online TA', 'Offline TA/TO', 'Groups', 'Direct', 'Corporate'], n),
+        'distribution_channel': rng.choice(['TA/TO', 'Direct', 'Corporate', 'GDS'], n),
+        'is_repeated_guest': (rng.random(n) < .03).astype(int),
+        'previous_cancellations': rng.choice([0, 0, 0, 1, 2], n),
+        'previous_bookings_not_canceled': rng.choice([0, 0, 1], n),
+        'reserved_room_type': rng.choice(list('ABCDEFG'), n),
+        'assigned_room_type': rng.choice(list('ABCDEFGHIK'), n),
+        'booking_changes': rng.choice([0, 0, 1, 2], n),
+        'deposit_type': rng.choice(['No Deposit', 'Non Refund', 'Refundable'], n, p=[.87, .12, .01]),
+        'agent': rng.choice([9.0, 240.0, 1.0, 14.0, 7.0, 6.0, 250.0, np.nan], n),
+        'company': np.where(rng.random(n) < 0.05, rng.choice([40.0, 223.0, 67.0, 45.0], n), np.nan),
+        'days_in_waiting_list': rng.choice([0, 0, 0, 10], n),
+        'customer_type': rng.choice(['Transient', 'Transient-Party', 'Contract', 'Group'], n),
+        'adr': np.round(rng.gamma(4, 25, n), 2),
+        'required_car_parking_spaces': rng.choice([0, 0, 1], n),
+        'total_of_special_requests': rng.choice([0, 1, 2, 3], n),
+        'reservation_status': np.where(canceled, 'Canceled', 'Check-Out'),
+        'reservation_status_date': pd.to_datetime(status).strftime('%Y-%m-%d'),
+    })
+
+
+def filtered(df, filters):
+    # Reservas que cumplen el estado de filtros, con pandas
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in (filters or {}).items():
+        if values is not None:
+            mask &= df[col].isin(list(values)).to_numpy()
+    return df[mask]
+
+
+@pytest.fixture
+def raw_bookings():
+    return make_raw_bookings()
+
+
+@pytest.fixture
+def bookings_csv(tmp_path, raw_bookings):
+    path = tmp_path / "hotel_bookings_processed.csv"
+    raw_bookings.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def bookings(bookings_csv):
+    # Camino de referencia: CSV leído y derivado con pandas, sin cachés
+    return load_bookings(bookings_csv, use_cache=False)
@@ -0,0 +1,84 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.aggregation as aggregation
+from utils.aggregation import AggregationEngine, Metric, histogram_stats
+from utils.bitmap_index import BitmapIndex
+from utils.bookings import FILTER_COLUMNS
+from utils.olap_cube import STREAM_DIMENSIONS, BookingsCube
+########################################
+
+KEYS = ['hotel', 'meal', 'lead_time_category', 'total_nights', 'children', 'year_month']
+VALUES = ['is_canceled', 'adr', 'total_nights']
+METRICS = [
+    Metric('totales', values=('is_canceled', 'adr')),
+    Metric('comidas', by=('meal',), values=('adr',)),
+    Metric('lead_noches', by=('lead_time_category', 'total_nights'), values=('is_canceled',)),
+    Metric('ninos', by=('children',)),
+]
+FILTERS = {'hotel': ['Resort Hotel'], 'arrival_date_year': [2016, 2017], 'customer_type': None}
+
+
+def pandas_metric(df, metric):
+    # Referencia: groupby de pandas sin las filas con claves nulas
+    if not metric.by:
+        row = {'count': len(df), **{f'{v}_sum': df[v].sum() for v in metric.values}}
+        return pd.DataFrame([row])
+    grouped = df.groupby(list(metric.by), observed=True, sort=True)
+    result = grouped.size().rename('count').to_frame()
+    for v in metric.values:
+        result[f'{v}_sum'] = grouped[v].sum()
+    return result.reset_index()
+
+
+def assert_same(got, expected):
+    assert list(got.columns) == list(expected.columns)
+    for col in got.columns:
+        if col.endswith('_sum'):
+            np.testing.assert_allclose(got[col], expected[col], rtol=1e-5, err_msg=col)
+        else:
+            assert got[col].astype(object).tolist() == expected[col].astype(object).tolist(), col
+
+
+@pytest.mark.parametrize('filters', [{}, FILTERS])
+def test_engine_matches_pandas_groupby(bookings, filters):
+    engine = AggregationEngine(bookings, KEYS, VALUES)
+    selection = BitmapIndex(bookings, FILTER_COLUMNS).select(filters)
+    bundle = engine.compute(selection, METRICS)
+    data = selection.take(bookings)
+    for metric in METRICS:
+        assert_same(bundle[metric.name], pandas_metric(data, metric))
+
+
+def test_sparse_groups_match_dense(bookings, monkeypatch):
+    engine = AggregationEngine(bookings, KEYS, VALUES)
+    dense = engine.compute(None, METRICS)
+    # Sin espacio denso de grupos se usa `np.unique` sobre las claves combinadas
+    monkeypatch.setattr(aggregation, 'MAX_DENSE_GROUPS', 1)
+    sparse = engine.compute(None, METRICS)
+    for metric in METRICS:
+        assert_same(sparse[metric.name], dense[metric.name])
+
+
+def test_cube_compute_matches_engine(bookings):
+    engine = AggregationEngine(bookings, KEYS, VALUES)
+    cube = BookingsCube.build(bookings, STREAM_DIMENSIONS)
+    metrics = [m for m in METRICS if cube.supports(m)] + [Metric('mensual', by=('year_month', 'hotel'))]
+    selection = BitmapIndex(bookings, FILTER_COLUMNS).select(FILTERS)
+    expected = engine.compute(selection, metrics)
+    got = cube.compute(FILTERS, metrics)
+    assert set(got) == {m.name for m in metrics}
+    for metric in metrics:
+        assert_same(got[metric.name], expected[metric.name])
+
+
+def test_histogram_stats_matches_pandas(bookings):
+    hist = AggregationEngine(bookings, KEYS, VALUES).compute(None, METRICS)['lead_noches']
+    stats = histogram_stats(hist, 'lead_time_category', 'total_nights')
+    expected = bookings.groupby('lead_time_category', observed=True)['total_nights'].agg(['mean', 'median', 'count'])
+    np.testing.assert_allclose(stats['mean'], expected['mean'])
+    np.testing.assert_allclose(stats['median'], expected['median'])
+    assert stats['count'].tolist() == expected['count'].tolist()
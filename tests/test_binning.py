@@ -0,0 +1,37 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.binning import BINNINGS, BINS_VERSION, bin_codes, bin_column
+from utils.bookings import DERIVED_VERSION
+########################################
+
+
+@pytest.mark.parametrize('name', list(BINNINGS))
+def test_bin_column_matches_pd_cut(name):
+    binning = BINNINGS[name]
+    rng = np.random.default_rng(0)
+    values = pd.Series(np.r_[rng.uniform(-10, 700, 2000), binning.edges[:-1], [np.nan, -5, 1e6]])
+    got = bin_column(values, binning)
+    expected = pd.cut(values, binning.edges, labels=binning.labels)
+
+    assert list(got.categories) == binning.labels and got.ordered
+    assert pd.Series(got).astype(object).tolist() == expected.astype(object).tolist()
+
+
+def test_bin_codes_are_int8_with_minus_one_for_missing():
+    codes = bin_codes(pd.Series([0, 1, 50, 51, None], dtype='Int16'), [0, 50, 100])
+    assert codes.dtype == np.int8
+    assert codes.tolist() == [-1, 0, 0, 1, -1]
+
+
+def test_bookings_bins_match_pd_cut(bookings):
+    for name, binning in BINNINGS.items():
+        expected = pd.cut(bookings[binning.column], binning.edges, labels=binning.labels)
+        assert bookings[name].astype(object).tolist() == expected.astype(object).tolist()
+
+
+def test_bins_version_is_part_of_derived_version():
+    assert DERIVED_VERSION.endswith(f".{BINS_VERSION}")
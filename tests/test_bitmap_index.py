@@ -0,0 +1,52 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pytest
+
+from utils.bitmap_index import BitmapIndex
+from utils.bookings import FILTER_COLUMNS
+########################################
+
+FILTER_STATES = [
+    {},
+    {'hotel': ['Resort Hotel']},
+    {'hotel': None, 'arrival_date_year': range(2016, 2018), 'customer_type': ['Transient']},
+    {'hotel': ['City Hotel'], 'arrival_date_year': [2015], 'customer_type': ['Group', 'Contract']},
+    {'customer_type': ['No existe']},
+]
+
+
+def pandas_mask(df, filters):
+    # Filtro de referencia: comparaciones booleanas sobre el DataFrame
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in filters.items():
+        if values is not None:
+            mask &= df[col].isin(list(values)).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_selection_matches_pandas_filter(bookings, filters):
+    index = BitmapIndex(bookings, FILTER_COLUMNS)
+    selection = index.select(filters)
+    expected = pandas_mask(bookings, filters)
+
+    assert len(selection) == expected.sum()
+    assert (selection.mask == expected).all()
+    assert (selection.positions == np.flatnonzero(expected)).all()
+    assert selection.take(bookings).equals(bookings[expected])
+
+
+def test_full_selection_returns_frame_without_copy(bookings):
+    index = BitmapIndex(bookings, FILTER_COLUMNS)
+    selection = index.select({'hotel': index.values('hotel'), 'arrival_date_year': None})
+    assert selection.is_full
+    assert selection.take(bookings) is bookings
+
+
+def test_selections_combine_like_masks(bookings):
+    index = BitmapIndex(bookings, FILTER_COLUMNS)
+    a, b = index.select({'hotel': ['City Hotel']}), index.select({'arrival_date_year': [2016]})
+    mask_a, mask_b = pandas_mask(bookings, {'hotel': ['City Hotel']}), pandas_mask(bookings, {'arrival_date_year': [2016]})
+    assert ((a & b).mask == (mask_a & mask_b)).all()
+    assert ((a | b).mask == (mask_a | mask_b)).all()
@@ -0,0 +1,71 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.bookings import BOOKINGS_SCHEMA, DERIVED_SCHEMA, derive_columns, freeze_frame, iter_bookings
+########################################
+
+
+def test_schema_is_compact_and_lossless(raw_bookings, bookings):
+    for col, dtype in {**BOOKINGS_SCHEMA, **DERIVED_SCHEMA}.items():
+        if col not in bookings.columns:
+            continue
+        if str(dtype) == 'category':
+            assert isinstance(bookings[col].dtype, pd.CategoricalDtype), col
+        else:
+            assert bookings[col].dtype == pd.api.types.pandas_dtype(dtype), col
+    for col in ['lead_time', 'adr', 'stays_in_week_nights', 'children', 'agent']:
+        np.testing.assert_allclose(
+            bookings[col].to_numpy(dtype='float64', na_value=np.nan),
+            raw_bookings[col].to_numpy(dtype='float64'), rtol=1e-6, err_msg=col,
+        )
+
+
+def test_derived_columns_match_pandas(raw_bookings, bookings):
+    arrivals = pd.to_datetime(
+        raw_bookings['arrival_date_year'].astype(str) + '-' + raw_bookings['arrival_date_month']
+        + '-' + raw_bookings['arrival_date_day_of_month'].astype(str), format='%Y-%B-%d'
+    )
+    assert (bookings['dia'].to_numpy() == arrivals.to_numpy()).all()
+    expected_nights = raw_bookings['stays_in_weekend_nights'] + raw_bookings['stays_in_week_nights']
+    assert (bookings['total_nights'].to_numpy() == expected_nights.to_numpy()).all()
+
+
+def test_totals_do_not_overflow_compact_columns(raw_bookings):
+    # Sumandos que caben en int8 pero cuya suma no
+    raw = raw_bookings.head(3).copy()
+    raw['stays_in_weekend_nights'] = [100, 127, 0]
+    raw['stays_in_week_nights'] = [40, 127, 5]
+    raw['adults'] = [100, 127, 2]
+    raw['children'] = [30.0, 127.0, np.nan]
+    raw['babies'] = [5, 127, 0]
+    df = derive_columns(raw)
+
+    assert df['total_nights'].tolist() == [140, 254, 5]
+    assert df['total_guests'].tolist()[:2] == [135, 381]
+    assert pd.isna(df['total_guests'].iloc[2])
+    assert df['total_nights'].dtype == np.dtype('int16')
+
+
+def test_chunked_derivation_matches_full_load(bookings_csv, bookings):
+    # Las columnas derivadas de una reserva no dependen del resto del bloque
+    chunked = pd.concat(iter_bookings(bookings_csv, chunksize=700), ignore_index=True)
+    for col in ['dia', 'total_nights', 'total_guests', 'season', 'lead_time_category', 'adr_bin']:
+        assert chunked[col].astype(object).equals(bookings[col].astype(object)), col
+
+
+def test_frozen_frame_shares_read_only_data(bookings):
+    frozen = freeze_frame(bookings)
+    pd.testing.assert_frame_equal(frozen, bookings)
+
+    # Columnas numéricas sin copia y sin escritura posible
+    adr = frozen['adr'].to_numpy()
+    assert np.shares_memory(adr, bookings['adr'].to_numpy())
+    with pytest.raises(ValueError):
+        adr[0] = 0
+    with pytest.raises(ValueError):
+        frozen['hotel'].array.codes[0] = 0
+    with pytest.raises(ValueError):
+        frozen['children'].array._data[0] = 0
@@ -0,0 +1,35 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+
+from utils.aggregation import AggregationEngine
+from utils.column_store import HOT_COLUMNS, load_column_store, open_column_store
+from tests.test_aggregation import KEYS, METRICS, VALUES, assert_same
+########################################
+
+
+def test_store_matches_bookings_columns(bookings_csv, bookings, tmp_path):
+    arrays = load_column_store(bookings_csv, tmp_path / "cache")
+    assert list(arrays) == HOT_COLUMNS
+    for col, values in arrays.items():
+        assert isinstance(values, np.memmap)
+        assert values.dtype == bookings[col].dtype
+        np.testing.assert_array_equal(values, bookings[col].to_numpy())
+
+
+def test_store_is_reused_and_invalidated(bookings_csv, raw_bookings, tmp_path):
+    cache_dir = tmp_path / "cache"
+    load_column_store(bookings_csv, cache_dir)
+    assert open_column_store(bookings_csv, cache_dir) is not None
+
+    raw_bookings.iloc[:100].to_csv(bookings_csv, index=False)
+    assert open_column_store(bookings_csv, cache_dir) is None
+    assert len(load_column_store(bookings_csv, cache_dir)['adr']) == 100
+
+
+def test_engine_on_mapped_columns_matches_dataframe(bookings_csv, bookings, tmp_path):
+    arrays = load_column_store(bookings_csv, tmp_path / "cache")
+    mapped = AggregationEngine(bookings, KEYS, VALUES, arrays=arrays).compute(None, METRICS)
+    expected = AggregationEngine(bookings, KEYS, VALUES).compute(None, METRICS)
+    for metric in METRICS:
+        assert_same(mapped[metric.name], expected[metric.name])
@@ -0,0 +1,47 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import os
+
+import pandas as pd
+
+from utils.bookings import DERIVED_VERSION, load_bookings
+from utils.columnar_cache import file_fingerprint, read_cached_frame, write_cached_frame
+########################################
+
+
+def test_cache_round_trip_matches_csv(bookings_csv, bookings, tmp_path):
+    cache_dir = tmp_path / "cache"
+    first = load_bookings(bookings_csv, cache_dir)
+    cached = read_cached_frame(bookings_csv, cache_dir, version=DERIVED_VERSION)
+
+    assert cached is not None
+    pd.testing.assert_frame_equal(first, bookings)
+    # Mismos tipos que el camino sin caché, incluida la unidad de las fechas
+    pd.testing.assert_frame_equal(cached, bookings)
+
+
+def test_cache_invalidated_by_content_and_version(bookings_csv, tmp_path):
+    cache_dir = tmp_path / "cache"
+    load_bookings(bookings_csv, cache_dir)
+    assert read_cached_frame(bookings_csv, cache_dir, version='otra') is None
+
+    lines = bookings_csv.read_text(encoding='utf-8').splitlines()
+    bookings_csv.write_text('\n'.join(lines + lines[1:2]) + '\n', encoding='utf-8')
+    assert read_cached_frame(bookings_csv, cache_dir, version=DERIVED_VERSION) is None
+
+
+def test_touched_file_reuses_cache_by_hash(bookings_csv, tmp_path):
+    cache_dir = tmp_path / "cache"
+    df = load_bookings(bookings_csv, cache_dir)
+    before = file_fingerprint(bookings_csv)
+    os.utime(bookings_csv, ns=(before['mtime_ns'] + 10**9, before['mtime_ns'] + 10**9))
+
+    cached = read_cached_frame(bookings_csv, cache_dir, version=DERIVED_VERSION)
+    assert cached is not None and len(cached) == len(df)
+
+
+def test_write_error_warns(bookings, bookings_csv, tmp_path, recwarn):
+    blocker = tmp_path / "no_es_directorio"
+    blocker.write_text("")
+    assert not write_cached_frame(bookings, bookings_csv, blocker, version=DERIVED_VERSION)
+    assert any(issubclass(w.category, RuntimeWarning) for w in recwarn)
@@ -0,0 +1,54 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.date_dimension import (
+    MONTH_MAP, SEASON_MAP, arrival_dates, date_dimension, date_keys, parse_iso_dates, year_month_keys, year_month_labels,
+)
+########################################
+
+
+def test_arrival_dates_match_to_datetime(raw_bookings):
+    month = raw_bookings['arrival_date_month'].map(MONTH_MAP)
+    got = arrival_dates(raw_bookings['arrival_date_year'], month, raw_bookings['arrival_date_day_of_month'])
+    expected = pd.to_datetime(pd.DataFrame({
+        'year': raw_bookings['arrival_date_year'], 'month': month, 'day': raw_bookings['arrival_date_day_of_month'],
+    }))
+    np.testing.assert_array_equal(got, expected.to_numpy().astype('datetime64[D]'))
+
+
+@pytest.mark.parametrize('year, month, day', [(2017, 2, 29), (2016, 4, 31), (2016, 13, 1), (2016, 1, 0)])
+def test_arrival_dates_reject_invalid_days(year, month, day):
+    with pytest.raises(ValueError):
+        arrival_dates([2016, year], [1, month], [1, day])
+
+
+def test_parse_iso_dates_matches_to_datetime():
+    values = pd.Series(['2015-07-01', None, '2016-02-29', '2015-07-01'])
+    got = parse_iso_dates(values)
+    expected = pd.to_datetime(values).to_numpy().astype('datetime64[D]')
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_date_dimension_matches_pandas_attributes():
+    table = date_dimension('2015-12-25', '2017-01-10')
+    dates = pd.DatetimeIndex(table['date'])
+    iso = dates.isocalendar()
+
+    np.testing.assert_array_equal(table.index, date_keys(table['date']))
+    assert table['year'].tolist() == dates.year.tolist()
+    assert table['month'].tolist() == dates.month.tolist()
+    assert table['day'].tolist() == dates.day.tolist()
+    assert table['weekday'].tolist() == dates.weekday.tolist()
+    assert table['iso_year'].tolist() == iso['year'].tolist()
+    assert table['iso_week'].tolist() == iso['week'].tolist()
+    assert table['year_month'].astype(str).tolist() == dates.strftime('%Y-%m').tolist()
+    assert table['season'].astype(str).tolist() == [SEASON_MAP[m] for m in dates.month_name()]
+
+
+def test_year_month_keys_round_trip():
+    keys = year_month_keys([2015, 2016, 2017], [12, 1, 7])
+    assert list(keys) == sorted(keys)
+    assert year_month_labels(keys) == ['2015-12', '2016-01', '2017-07']
@@ -0,0 +1,71 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import pytest
+
+from utils.heavy_hitters import HeavyHitters, SpaceSaving, exact_counts
+from tests.conftest import filtered
+from tests.test_olap_cube import FILTER_STATES
+########################################
+
+
+def assert_bounds(sketch, true_counts):
+    # Cada contador acota por exceso su recuento con error <= `bound`; los valores sin contador no superan `floor`
+    report = sketch.report()
+    for value, row in sketch.counts.iterrows():
+        true = true_counts.get(value, 0)
+        assert row['count'] - row['error'] <= true <= row['count']
+        assert row['count'] - true <= report['bound']
+    for value, true in true_counts.items():
+        if value not in sketch.counts.index:
+            assert true <= sketch.floor <= report['bound']
+    assert report['total'] == sum(true_counts.values())
+
+
+@pytest.mark.parametrize('column', ['country', 'agent'])
+def test_small_sketch_is_exact(bookings, column):
+    expected = exact_counts(bookings, column).set_index('value')
+    sketch = SpaceSaving.from_counts(expected, capacity=len(expected))
+    report = sketch.report()
+
+    assert report['exact'] and report['bound'] == 0 and report['guaranteed']
+    top = expected.sort_values('count', ascending=False, kind='stable').iloc[:10]
+    ranking = sketch.ranking()
+    assert ranking['count'].tolist() == top['count'].tolist()
+    assert ranking.set_index('value')['canceled'].to_dict() == top['canceled'].to_dict()
+
+
+@pytest.mark.parametrize('capacity', [3, 8])
+def test_merged_summaries_keep_their_bounds(bookings, capacity):
+    # Resúmenes recortados por bloque y sumados: la cota debe seguir valiendo tras cada suma
+    chunks = [bookings.iloc[i:i + 400] for i in range(0, len(bookings), 400)]
+    merged = SpaceSaving(capacity)
+    for chunk in chunks:
+        counts = exact_counts(chunk, 'country').set_index('value')
+        merged = merged.merge(SpaceSaving.from_counts(counts, capacity))
+
+    true_counts = bookings['country'].value_counts().to_dict()
+    assert not merged.report()['exact']
+    assert_bounds(merged, true_counts)
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_top_matches_exact_counts(bookings, filters):
+    hitters = HeavyHitters.from_chunks(
+        [bookings.iloc[i:i + 500] for i in range(0, len(bookings), 500)], capacity=6,
+    )
+    data = filtered(bookings, filters)
+    expected = exact_counts(data, 'country')
+    assert_bounds(hitters.sketch('country', filters), expected.set_index('value')['count'].to_dict())
+
+    # Si las cotas no garantizan el ranking se usa la fuente exacta; si lo
+    # garantizan, ningún valor fuera del ranking es más frecuente que uno dentro
+    ranking, report = hitters.top('country', filters, n=5, exact=lambda: expected)
+    true_counts = expected.set_index('value')['count']
+    if report['source'] == 'exact':
+        want = expected.sort_values(['count', 'value'], ascending=[False, True]).iloc[:5]
+        assert ranking['value'].tolist() == want['value'].tolist()
+        assert ranking['count'].tolist() == want['count'].tolist()
+    else:
+        assert report['guaranteed']
+        outside = true_counts.drop(ranking['value']).max()
+        assert true_counts[ranking['value']].min() >= outside
@@ -0,0 +1,55 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pytest
+
+from utils.interval_index import StayIndex
+from tests.conftest import filtered
+from tests.test_olap_cube import FILTER_STATES
+########################################
+
+WINDOWS = [
+    ('2015-08-01', '2015-08-02'), ('2016-02-20', '2016-03-15'), ('2017-12-30', '2018-01-05'), ('2016-05-01', '2016-05-01'),
+]
+
+
+def overlap_mask(df, start, end, filters):
+    # Estancias [llegada, llegada + noches) que solapan [start, end), fila a fila
+    arrival = df['dia'].to_numpy().astype('datetime64[D]')
+    nights = df['total_nights'].fillna(0).astype(int).to_numpy()
+    departure = arrival + nights.astype('timedelta64[D]')
+    mask = (nights > 0) & (arrival < np.datetime64(end)) & (departure > np.datetime64(start))
+    # Una ventana vacía no solapa con nada
+    mask &= np.datetime64(start) < np.datetime64(end)
+    return mask & df.index.isin(filtered(df, filters).index)
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+@pytest.mark.parametrize('start, end', WINDOWS)
+def test_overlap_queries_match_brute_force(bookings, start, end, filters):
+    index = StayIndex(bookings)
+    mask = overlap_mask(bookings, start, end, filters)
+    nights = bookings['total_nights'].fillna(0).to_numpy()
+    revenue = bookings['adr'].to_numpy(dtype='float64') * nights
+    canceled = bookings['is_canceled'].to_numpy() == 1
+
+    np.testing.assert_array_equal(index.overlapping(start, end, filters), np.flatnonzero(mask))
+    stats = index.stats(start, end, filters)
+    assert stats['count'] == mask.sum()
+    assert stats['canceled'] == (mask & canceled).sum()
+    assert stats['revenue'] == pytest.approx(revenue[mask].sum())
+    assert stats['canceled_revenue'] == pytest.approx(revenue[mask & canceled].sum())
+
+
+def test_stabbing_is_a_one_night_window(bookings):
+    index = StayIndex(bookings)
+    assert index.stabbing('2016-07-15')['count'] == overlap_mask(bookings, '2016-07-15', '2016-07-16', None).sum()
+
+
+def test_merge_matches_single_index(bookings):
+    full = StayIndex(bookings)
+    merged = StayIndex(bookings.iloc[:1800]).merge(StayIndex(bookings.iloc[1800:]))
+    for start, end in WINDOWS:
+        for filters in FILTER_STATES:
+            np.testing.assert_array_equal(merged.overlapping(start, end, filters), full.overlapping(start, end, filters))
+            assert merged.stats(start, end, filters) == pytest.approx(full.stats(start, end, filters))
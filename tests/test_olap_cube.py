@@ -0,0 +1,99 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.bookings import FILTER_COLUMNS
+from utils.olap_cube import (
+    CUBE_DIMENSIONS, ORDERED_DIMENSIONS, STREAM_DIMENSIONS, BookingsCube, load_bookings_cube,
+)
+from tests.conftest import filtered
+########################################
+
+FILTER_STATES = [
+    None,
+    {'hotel': ['City Hotel'], 'arrival_date_year': range(2016, 2017), 'customer_type': ['Transient']},
+    {'hotel': None, 'arrival_date_year': [2015, 2017], 'customer_type': None},
+]
+
+
+def pandas_slice(df, dimension, filters):
+    # Medidas por valor de la dimensión con un groupby sobre las reservas filtradas
+    grouped = filtered(df, filters).groupby(dimension, observed=True, sort=True)
+    return pd.DataFrame({
+        'count': grouped.size(),
+        'canceled': grouped['is_canceled'].sum(),
+        'adr_sum': grouped['adr'].sum(),
+        'lead_sum': grouped['lead_time'].sum(),
+    }).reset_index()
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+@pytest.mark.parametrize('dimension', ['meal', 'season', 'lead_time_category', 'adr_bin', 'country', 'is_canceled'])
+def test_slice_matches_pandas_groupby(bookings, dimension, filters):
+    cube = BookingsCube.build(bookings)
+    got = cube.slice(dimension, filters, drop_empty=True)
+    expected = pandas_slice(bookings, dimension, filters)
+
+    assert got[dimension].astype(object).tolist() == expected[dimension].astype(object).tolist()
+    assert got['count'].tolist() == expected['count'].tolist()
+    assert got['canceled'].tolist() == expected['canceled'].tolist()
+    np.testing.assert_allclose(got['adr_sum'], expected['adr_sum'], rtol=1e-5)
+    assert got['lead_sum'].tolist() == expected['lead_sum'].tolist()
+
+
+def test_ordered_dimensions_keep_empty_categories(bookings):
+    # Un estado de filtros sin reservas de lead time 0 ni ADR por encima de 200
+    data = bookings[(bookings['lead_time'] > 0) & (bookings['adr'] <= 200)]
+    cube = BookingsCube.build(data)
+    for dimension in ['lead_time_category', 'adr_bin']:
+        result = cube.slice(dimension)
+        assert result[dimension].astype(str).tolist() == ORDERED_DIMENSIONS[dimension]
+        assert (result['count'] == 0).sum() == 1
+        # Las tasas se piden sin las categorías vacías
+        assert (cube.slice(dimension, drop_empty=True)['count'] > 0).all()
+    # Las dimensiones sin orden propio solo devuelven los valores observados
+    assert len(cube.slice('meal')) == data['meal'].nunique()
+
+
+def test_slice_keeps_filter_keys(bookings):
+    cube = BookingsCube.build(bookings)
+    got = cube.slice('meal', keep=('hotel',), drop_empty=True)
+    expected = bookings.groupby(['hotel', 'meal'], observed=True).size()
+    assert got.set_index(['hotel', 'meal'])['count'].astype(object).to_dict() == expected.astype(object).to_dict()
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_totals_match_pandas(bookings, filters):
+    totals = BookingsCube.build(bookings).totals(filters)
+    data = filtered(bookings, filters)
+    assert totals['count'] == len(data)
+    assert totals['canceled'] == data['is_canceled'].sum()
+    assert totals['nights_sum'] == data['total_nights'].sum()
+
+
+def test_chunks_merge_and_update_match_build(bookings):
+    full = BookingsCube.build(bookings, STREAM_DIMENSIONS)
+    chunks = [bookings.iloc[i:i + 700] for i in range(0, len(bookings), 700)]
+    folded = BookingsCube.from_chunks(iter(chunks), STREAM_DIMENSIONS)
+    updated = BookingsCube.build(chunks[0], STREAM_DIMENSIONS)
+    for chunk in chunks[1:]:
+        updated.update(chunk)
+
+    for cube in (folded, updated):
+        for dimension in STREAM_DIMENSIONS:
+            a, b = full.slice(dimension, drop_empty=True), cube.slice(dimension, drop_empty=True)
+            pd.testing.assert_frame_equal(a.astype(str), b.astype(str), obj=str(dimension))
+
+
+def test_streamed_cube_matches_build(bookings_csv, bookings, tmp_path):
+    streamed = load_bookings_cube(bookings_csv, tmp_path / "cache", chunksize=900)
+    cached = load_bookings_cube(bookings_csv, tmp_path / "cache", chunksize=900)
+    full = BookingsCube.build(bookings, STREAM_DIMENSIONS)
+    for cube in (streamed, cached):
+        for dimension in CUBE_DIMENSIONS:
+            a, b = full.slice(dimension, drop_empty=True), cube.slice(dimension, drop_empty=True)
+            pd.testing.assert_frame_equal(a.astype(str), b.astype(str), obj=dimension)
+    assert streamed.values('hotel') == sorted(bookings['hotel'].unique())
+    assert set(streamed.keys) == set(FILTER_COLUMNS)
@@ -0,0 +1,87 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.on_the_books import OnTheBooks
+from tests.conftest import filtered
+from tests.test_olap_cube import FILTER_STATES
+########################################
+
+AS_OF = np.arange(np.datetime64('2014-06-01'), np.datetime64('2018-01-01'), 17)
+
+
+def booking_events(df):
+    # Alta, llegada y baja (solo canceladas) de cada reserva, como días
+    arrival = df['dia'].to_numpy().astype('datetime64[D]')
+    created = arrival - df['lead_time'].to_numpy().astype('timedelta64[D]')
+    status = pd.to_datetime(df['reservation_status_date']).to_numpy().astype('datetime64[D]')
+    removed = np.where(np.isnat(status), arrival, status)
+    removed = np.minimum(np.maximum(removed, created), arrival)
+    canceled = df['is_canceled'].to_numpy() == 1
+    return created, arrival, removed, canceled
+
+
+def brute_force_snapshot(df, as_of, filters):
+    # Cartera a cada fecha recorriendo todas las reservas
+    created, arrival, removed, canceled = booking_events(filtered(df, filters))
+    rows = []
+    for t in as_of:
+        gone = canceled & (removed <= t)
+        rows.append({
+            'on_books': int(((created <= t) & (arrival >= t) & ~gone).sum()),
+            'to_cancel': int((canceled & (created <= t) & (removed > t)).sum()),
+            'created': int((created == t).sum()),
+            'canceled': int((canceled & (removed == t)).sum()),
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_snapshot_matches_brute_force(bookings, filters):
+    got = OnTheBooks(bookings).snapshot(AS_OF, filters)
+    expected = brute_force_snapshot(bookings, AS_OF, filters)
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), expected, check_dtype=False)
+    assert got.index.tolist() == pd.DatetimeIndex(AS_OF).tolist()
+
+
+def test_merge_matches_single_build(bookings):
+    full = OnTheBooks(bookings)
+    merged = OnTheBooks(bookings.iloc[:1300]).merge(OnTheBooks(bookings.iloc[1300:]))
+    assert (merged.first_day, merged.last_day) == (full.first_day, full.last_day)
+    for filters in FILTER_STATES:
+        pd.testing.assert_frame_equal(merged.snapshot(AS_OF, filters), full.snapshot(AS_OF, filters))
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_pickup_matches_brute_force(bookings, filters):
+    got = OnTheBooks(bookings).pickup('2016-07-01', '2016-07-31', days_before=120, filters=filters)
+    created, arrival, removed, canceled = booking_events(filtered(bookings, filters))
+    target = (arrival >= np.datetime64('2016-07-01')) & (arrival <= np.datetime64('2016-07-31'))
+
+    for row in got.itertuples():
+        t = np.datetime64(row.as_of, 'D')
+        gone = target & canceled & (removed <= t)
+        assert row.created == (target & (created <= t)).sum()
+        assert row.canceled == gone.sum()
+        assert row.on_books == row.created - row.canceled
+        assert row.to_cancel == (target & canceled & (created <= t)).sum() - gone.sum()
+    assert got['days_before'].tolist() == list(range(120, -1, -1))
+
+
+@pytest.mark.parametrize('by', ['month', 'season'])
+def test_pace_matches_brute_force(bookings, by):
+    filters = FILTER_STATES[2]
+    got = OnTheBooks(bookings).pace(filters, by=by, max_days=90)
+    data = filtered(bookings, filters)
+    created, arrival, removed, canceled = booking_events(data)
+    period = (data['dia'].dt.month_name() if by == 'month' else data['season'].astype(str)).to_numpy()
+    lead = np.minimum((arrival - created).astype(int), 90)
+    cancel_lead = np.minimum((arrival - removed).astype(int), 90)
+
+    for row in got.itertuples():
+        in_period = period == row.period
+        assert row.created == (in_period & (lead >= row.days_before)).sum()
+        assert row.canceled == (in_period & canceled & (cancel_lead >= row.days_before)).sum()
+    assert set(period) <= set(got['period'])
@@ -0,0 +1,172 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.partitioned_store as partitioned_store
+from utils.bookings import load_bookings
+from utils.olap_cube import BookingsCube
+from utils.partitioned_store import IncrementalView, PartitionedBookings
+from tests.conftest import filtered, make_raw_bookings
+from tests.test_olap_cube import FILTER_STATES
+########################################
+
+
+def sorted_rows(df):
+    # Mismas reservas en el mismo orden, sea cual sea la partición de la que salen
+    df = df[sorted(df.columns)]
+    return df.sort_values(list(df.columns), ignore_index=True)
+
+
+def snapshot(root):
+    # Ficheros del dataset con su contenido, para comprobar que no cambia
+    return {p.relative_to(root): p.read_bytes() for p in sorted(root.rglob('*')) if p.is_file()}
+
+
+@pytest.fixture
+def split_csvs(tmp_path):
+    # Reservas repartidas en un CSV inicial y otro de reservas nuevas
+    raw = make_raw_bookings(n=2000, seed=1)
+    first, second = tmp_path / "inicial.csv", tmp_path / "nuevas.csv"
+    raw.iloc[:1200].to_csv(first, index=False)
+    raw.iloc[1200:].to_csv(second, index=False)
+    full = tmp_path / "completo.csv"
+    raw.to_csv(full, index=False)
+    return first, second, load_bookings(full, use_cache=False)
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_read_matches_pandas_filter(bookings_csv, bookings, tmp_path, filters):
+    dataset = PartitionedBookings.from_csv(bookings_csv, tmp_path / "dataset", chunksize=1500)
+    got = dataset.read(filters)
+    expected = filtered(bookings, filters)
+
+    assert len(got) == len(expected)
+    pd.testing.assert_frame_equal(
+        sorted_rows(got).astype(object), sorted_rows(expected).astype(object), check_dtype=False,
+    )
+    if filters is None:
+        assert got.dtypes.astype(str).to_dict() == bookings.dtypes.astype(str).to_dict()
+
+
+def test_partitions_prune_unselected_hotels_and_years(bookings_csv, tmp_path):
+    dataset = PartitionedBookings.from_csv(bookings_csv, tmp_path / "dataset")
+    selected = dataset.partitions({'hotel': ['City Hotel'], 'arrival_date_year': [2016]})
+    assert [p.relative_to(dataset.root).as_posix() for p in selected] == [
+        "hotel=City Hotel/arrival_date_year=2016",
+    ]
+    assert len(dataset.partitions()) == 6
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_partition_cubes_match_cube_of_bookings(bookings_csv, bookings, tmp_path, filters):
+    dataset = PartitionedBookings.from_csv(bookings_csv, tmp_path / "dataset", chunksize=1500)
+    expected = BookingsCube.build(bookings)
+    for dimension in ['meal', 'lead_time_category', 'country']:
+        got = dataset.cube(filters).slice(dimension, filters)
+        want = expected.slice(dimension, filters)
+        assert got[dimension].astype(str).tolist() == want[dimension].astype(str).tolist()
+        assert got['count'].tolist() == want['count'].tolist()
+        np.testing.assert_allclose(got['adr_sum'], want['adr_sum'], rtol=1e-5)
+
+
+def test_append_equals_full_import(split_csvs, tmp_path):
+    first, second, full = split_csvs
+    dataset = PartitionedBookings.from_csv(first, tmp_path / "dataset", chunksize=600)
+    version = dataset.version
+
+    n_rows, touched = dataset.append_csv(second, chunksize=400)
+
+    assert n_rows == 800 and touched
+    assert dataset.version == version + 1
+    assert PartitionedBookings(dataset.root).version == dataset.version
+    pd.testing.assert_frame_equal(sorted_rows(dataset.read()), sorted_rows(full))
+    got = dataset.cube().slice('meal')
+    want = BookingsCube.build(full).slice('meal')
+    assert got['count'].tolist() == want['count'].tolist()
+
+
+def test_failed_append_leaves_dataset_unchanged(split_csvs, tmp_path, monkeypatch):
+    first, second, full = split_csvs
+    dataset = PartitionedBookings.from_csv(first, tmp_path / "dataset")
+    before = snapshot(dataset.root)
+    version = dataset.version
+    read_chunks = partitioned_store.iter_bookings
+
+    def failing_chunks(path, chunksize):
+        # Un primer bloque bueno y un fallo de lectura en el segundo
+        chunks = read_chunks(path, chunksize)
+        yield next(chunks)
+        raise OSError("lectura interrumpida")
+
+    monkeypatch.setattr(partitioned_store, 'iter_bookings', failing_chunks)
+    with pytest.raises(OSError):
+        dataset.append_csv(second, chunksize=400)
+    assert dataset.version == version
+    assert snapshot(dataset.root) == before
+
+    # El reintento añade el fichero entero en una versión nueva
+    monkeypatch.setattr(partitioned_store, 'iter_bookings', read_chunks)
+    dataset.append_csv(second, chunksize=400)
+    assert dataset.version == version + 1
+    pd.testing.assert_frame_equal(sorted_rows(dataset.read()), sorted_rows(full))
+
+
+def test_failed_publish_rolls_back_parts_and_cubes(split_csvs, tmp_path, monkeypatch):
+    first, second, _ = split_csvs
+    dataset = PartitionedBookings.from_csv(first, tmp_path / "dataset")
+    before = snapshot(dataset.root)
+
+    def failing_manifest(self):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(PartitionedBookings, '_write_manifest', failing_manifest)
+    with pytest.raises(OSError):
+        dataset.append_csv(second)
+    assert snapshot(dataset.root) == before
+    assert dataset.manifest == PartitionedBookings(dataset.root).manifest
+
+
+def test_append_rejects_file_already_added(split_csvs, tmp_path):
+    first, second, _ = split_csvs
+    dataset = PartitionedBookings.from_csv(first, tmp_path / "dataset")
+    dataset.append_csv(second)
+    version = dataset.version
+    with pytest.raises(ValueError):
+        dataset.append_csv(second)
+    with pytest.raises(ValueError):
+        dataset.append_csv(first)
+    assert dataset.version == version
+
+
+def test_orphan_parts_are_hidden_and_discarded(split_csvs, tmp_path):
+    first, second, full = split_csvs
+    dataset = PartitionedBookings.from_csv(first, tmp_path / "dataset")
+    # Fichero de una escritura interrumpida con la versión siguiente
+    orphan = dataset.files()[0]
+    orphan_copy = orphan.with_name(f"part-{dataset.version:06d}-00000.parquet")
+    orphan_copy.write_bytes(orphan.read_bytes())
+
+    assert orphan_copy not in dataset.files()
+    dataset.append_csv(second)
+    pd.testing.assert_frame_equal(sorted_rows(dataset.read()), sorted_rows(full))
+
+
+def test_incremental_view_reads_only_new_batches(split_csvs, tmp_path):
+    first, second, full = split_csvs
+    dataset = PartitionedBookings.from_csv(first, tmp_path / "dataset")
+    reads = []
+
+    def build(df):
+        reads.append(len(df))
+        return BookingsCube.build(df)
+
+    view = IncrementalView(dataset, build, ['hotel', 'arrival_date_year', 'customer_type', 'meal', 'is_canceled', 'adr', 'lead_time'])
+    view.get()
+    dataset.append_csv(second)
+    cube = view.get()
+
+    assert reads == [1200, 800]
+    want = BookingsCube.build(full).slice('meal')
+    assert cube.slice('meal')['count'].tolist() == want['count'].tolist()
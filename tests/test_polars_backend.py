@@ -0,0 +1,46 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import pytest
+
+from utils.olap_cube import STREAM_DIMENSIONS, BookingsCube
+from tests.test_aggregation import FILTERS, METRICS, assert_same
+from tests.test_olap_cube import FILTER_STATES
+
+pytest.importorskip('polars')
+from utils.polars_backend import PolarsBookings  # noqa: E402
+########################################
+
+DIMENSIONS = [
+    'meal', 'season', 'lead_time_category', 'adr_bin', 'total_nights', 'total_guests', 'year_month',
+    ('lead_time_category', 'total_nights'),
+]
+
+
+@pytest.fixture
+def backends(bookings_csv, bookings):
+    # Planes de Polars frente al cubo construido con pandas
+    return PolarsBookings(bookings_csv), BookingsCube.build(bookings, STREAM_DIMENSIONS)
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+@pytest.mark.parametrize('dimension', DIMENSIONS)
+def test_slice_matches_cube(backends, dimension, filters):
+    polars, cube = backends
+    assert_same(polars.slice(dimension, filters), cube.slice(dimension, filters))
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_slice_keeping_hotel_and_totals_match_cube(backends, filters):
+    polars, cube = backends
+    assert_same(polars.slice('meal', filters, keep=('hotel',)), cube.slice('meal', filters, keep=('hotel',)))
+    assert polars.totals(filters).to_dict() == pytest.approx(cube.totals(filters).to_dict())
+
+
+def test_values_and_compute_match_cube(backends):
+    polars, cube = backends
+    for key in ['hotel', 'arrival_date_year', 'customer_type']:
+        assert polars.values(key) == cube.values(key)
+    metrics = [m for m in METRICS if cube.supports(m)]
+    got, expected = polars.compute(FILTERS, metrics), cube.compute(FILTERS, metrics)
+    for metric in metrics:
+        assert_same(got[metric.name], expected[metric.name])
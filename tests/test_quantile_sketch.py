@@ -0,0 +1,70 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pytest
+
+from utils.quantile_sketch import SUMMARY_QUANTILES, KLLSketch, QuantileSketches
+from tests.conftest import filtered
+from tests.test_olap_cube import FILTER_STATES
+########################################
+
+QS = np.linspace(0, 1, 41)
+
+
+def rank_distance(sorted_values, value, q):
+    # Distancia (en posiciones) entre el rango de `value` en los datos y el pedido para el cuantil `q`
+    target = q * (len(sorted_values) - 1)
+    lo = np.searchsorted(sorted_values, value, side='left')
+    hi = np.searchsorted(sorted_values, value, side='right')
+    return max(lo - target, target - hi, 0)
+
+
+def assert_rank_error(sketch, values):
+    values = np.sort(values[~np.isnan(values)])
+    assert sketch.n == len(values)
+    assert (sketch.min, sketch.max) == (values[0], values[-1])
+    for q, value in zip(QS, sketch.quantiles(QS)):
+        # La interpolación entre dos valores contiguos añade como mucho una posición
+        assert rank_distance(values, value, q) <= sketch.rank_error + 1
+
+
+def test_small_sketch_is_exact():
+    values = np.random.default_rng(0).lognormal(4, 0.6, 200)
+    sketch = KLLSketch.from_values(values, k=256)
+    assert sketch.exact and sketch.relative_error == 0
+    np.testing.assert_allclose(sketch.quantiles(QS), np.quantile(values, QS))
+
+
+@pytest.mark.parametrize('k', [32, 128])
+def test_rank_error_bound_holds(k):
+    values = np.random.default_rng(1).lognormal(4, 0.6, 50_000)
+    values[::97] = np.nan
+    sketch = KLLSketch.from_values(values, k=k)
+    assert not sketch.exact
+    assert_rank_error(sketch, values)
+    # El resumen ocupa O(k log(n/k)), no O(n)
+    assert sum(map(len, sketch.levels)) < 10 * k
+
+
+def test_merged_chunks_keep_the_bound():
+    values = np.random.default_rng(2).integers(0, 700, 40_000).astype('float64')
+    merged = KLLSketch(64)
+    for chunk in np.array_split(values, 13):
+        merged = merged.merge(KLLSketch.from_values(chunk, k=64))
+    assert_rank_error(merged, values)
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_summary_matches_pandas_quantiles(bookings, filters):
+    sketches = QuantileSketches.from_chunks(bookings.iloc[i:i + 700] for i in range(0, len(bookings), 700))
+    summary = sketches.summary('adr', filters, by='hotel').set_index('hotel')
+    data = filtered(bookings, filters)
+
+    for hotel, group in data.groupby('hotel', observed=True):
+        values = group['adr'].to_numpy(dtype='float64')
+        row = summary.loc[hotel]
+        assert (row['count'], row['min'], row['max']) == (len(values), values.min(), values.max())
+        sketch = sketches.sketch('adr', {**(filters or {}), 'hotel': [hotel]})
+        assert_rank_error(sketch, values)
+        if sketch.exact:
+            np.testing.assert_allclose(row[list(SUMMARY_QUANTILES)], np.quantile(values, list(SUMMARY_QUANTILES.values())))
@@ -0,0 +1,93 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from utils import result_cache
+from utils.result_cache import ResultCache
+########################################
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' pasa a ser la menos usada
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_memory_budget_evicts_and_skips_oversized_values():
+    cache = ResultCache(max_bytes=3000)
+    cache.put('a', np.zeros(200))  # 1600 bytes
+    cache.put('b', np.zeros(200))
+    assert cache.get('a') is None and cache.get('b') is not None
+    assert cache.stats()['bytes'] == 1600
+    cache.put('big', np.zeros(1000))  # mayor que todo el presupuesto
+    assert cache.get('big') is None
+    assert cache.get('b') is not None
+
+
+def test_ttl_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.put('a', 1)
+    now[0] += 5
+    assert cache.get('a') == 1
+    now[0] += 10
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1 and stats['entries'] == 0
+
+
+def test_get_or_compute_caches_none_results():
+    cache = ResultCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute('k', lambda: calls.append(1)) is None
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResultCache()
+    calls = []
+    start = threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 42
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_compute('k', compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [42] * 8
+    assert len(calls) == 1
+
+
+def test_failed_compute_releases_waiters():
+    cache = ResultCache()
+
+    def boom():
+        raise ValueError('fallo')
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute('k', boom)
+    # La clave no queda bloqueada: el siguiente intento vuelve a calcular
+    assert cache.get_or_compute('k', lambda: 7) == 7
+    assert cache._in_flight == {}
@@ -0,0 +1,46 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import pytest
+
+from utils.olap_cube import STREAM_DIMENSIONS, BookingsCube
+from tests.test_aggregation import FILTERS, METRICS, assert_same
+from tests.test_olap_cube import FILTER_STATES
+
+pytest.importorskip('duckdb')
+from utils.sql_backend import SQLBookings  # noqa: E402
+########################################
+
+DIMENSIONS = [
+    'meal', 'season', 'lead_time_category', 'adr_bin', 'total_nights', 'total_guests', 'year_month',
+    ('lead_time_category', 'total_nights'),
+]
+
+
+@pytest.fixture
+def backends(bookings_csv, bookings):
+    # Consultas en SQL frente al cubo construido con pandas
+    return SQLBookings(bookings_csv), BookingsCube.build(bookings, STREAM_DIMENSIONS)
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+@pytest.mark.parametrize('dimension', DIMENSIONS)
+def test_slice_matches_cube(backends, dimension, filters):
+    sql, cube = backends
+    assert_same(sql.slice(dimension, filters), cube.slice(dimension, filters))
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_slice_keeping_hotel_and_totals_match_cube(backends, filters):
+    sql, cube = backends
+    assert_same(sql.slice('meal', filters, keep=('hotel',)), cube.slice('meal', filters, keep=('hotel',)))
+    assert sql.totals(filters).to_dict() == pytest.approx(cube.totals(filters).to_dict())
+
+
+def test_values_and_compute_match_cube(backends):
+    sql, cube = backends
+    for key in ['hotel', 'arrival_date_year', 'customer_type']:
+        assert sql.values(key) == cube.values(key)
+    metrics = [m for m in METRICS if cube.supports(m)]
+    got, expected = sql.compute(FILTERS, metrics), cube.compute(FILTERS, metrics)
+    for metric in metrics:
+        assert_same(got[metric.name], expected[metric.name])
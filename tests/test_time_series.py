@@ -0,0 +1,100 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.time_series import DailyCube
+from tests.conftest import filtered
+from tests.test_olap_cube import FILTER_STATES
+########################################
+
+
+def pandas_monthly(df, filters):
+    # Serie mensual por hotel con un groupby sobre las reservas filtradas
+    data = filtered(df, filters)
+    grouped = data.groupby([data['dia'].dt.strftime('%Y-%m').rename('period'), 'hotel'], observed=True)
+    return pd.DataFrame({
+        'count': grouped.size(),
+        'canceled': grouped['is_canceled'].sum(),
+        'adr_sum': grouped['adr'].sum(),
+        'nights_sum': grouped['total_nights'].sum(),
+    })
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_monthly_series_matches_pandas_groupby(bookings, filters):
+    series = DailyCube.build(bookings).resample(filters, freq='month', by=('hotel',))
+    expected = pandas_monthly(bookings, filters)
+
+    # La serie es densa: los meses sin llegadas de un hotel quedan a cero
+    got = series.set_index(['period', 'hotel'])
+    assert got.loc[expected.index, 'count'].tolist() == expected['count'].tolist()
+    assert got.loc[expected.index, 'canceled'].tolist() == expected['canceled'].tolist()
+    assert got.loc[expected.index, 'nights_sum'].tolist() == expected['nights_sum'].tolist()
+    np.testing.assert_allclose(got.loc[expected.index, 'adr_sum'], expected['adr_sum'], rtol=1e-5)
+    assert got['count'].sum() == len(filtered(bookings, filters))
+
+
+def test_chunks_and_merge_match_build(bookings):
+    full = DailyCube.build(bookings)
+    chunks = DailyCube.from_chunks(bookings.iloc[i:i + 700] for i in range(0, len(bookings), 700))
+    by_hotel = [DailyCube.build(part) for _, part in bookings.groupby('hotel', observed=True)]
+    merged = by_hotel[0].merge(by_hotel[1])
+
+    for cube in (chunks, merged):
+        assert (cube.first_day, cube.hotels, cube.customer_types) == (full.first_day, full.hotels, full.customer_types)
+        np.testing.assert_allclose(cube.values, full.values)
+
+
+def test_write_and_read_round_trip(bookings, tmp_path):
+    cube = DailyCube.build(bookings)
+    cube.write(tmp_path / "daily.npz")
+    read = DailyCube.read(tmp_path / "daily.npz")
+    assert (read.first_day, read.hotels, read.customer_types) == (cube.first_day, cube.hotels, cube.customer_types)
+    np.testing.assert_array_equal(read.values, cube.values)
+    assert DailyCube.read(tmp_path / "otro.npz") is None
+
+
+def brute_force_occupancy(df, filters):
+    # Cada reserva ocupa las noches de [llegada, llegada + noches), expandida noche a noche
+    years = (filters or {}).get('arrival_date_year')
+    data = filtered(df, {**(filters or {}), 'arrival_date_year': None})
+    nights = data['total_nights'].fillna(0).astype(int).to_numpy()
+    dates = np.repeat(data['dia'].to_numpy().astype('datetime64[D]'), nights)
+    dates += np.concatenate([np.arange(n) for n in nights]).astype('timedelta64[D]')
+    hotels = np.repeat(data['hotel'].astype(str).to_numpy(), nights)
+    # Las noches se filtran por su propio año
+    keep = np.ones(len(dates), dtype=bool)
+    if years is not None:
+        keep = np.isin(dates.astype('datetime64[Y]').astype(int) + 1970, list(years))
+    return pd.Series(1, index=pd.MultiIndex.from_arrays([dates[keep], hotels[keep]])).groupby(level=[0, 1]).sum()
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_occupancy_matches_exploded_nights(bookings, filters):
+    occupancy = DailyCube.build(bookings).occupancy(filters, by=('hotel',))
+    expected = brute_force_occupancy(bookings, filters)
+
+    got = {
+        (np.datetime64(date, 'D'), hotel): n
+        for date, hotel, n in occupancy.itertuples(index=False) if n
+    }
+    assert got == {(np.datetime64(date, 'D'), hotel): n for (date, hotel), n in expected.items()}
+
+
+
+@pytest.mark.parametrize('filters', FILTER_STATES)
+def test_weekday_grid_matches_daily_counts(bookings, filters):
+    grid = DailyCube.build(bookings).weekday_grid(filters)
+    data = filtered(bookings, filters)
+    daily = data.groupby([data['hotel'].astype(str), data['dia']], observed=True)['is_canceled'].agg(['size', 'sum'])
+
+    assert (pd.DatetimeIndex(grid.weeks).weekday == 0).all()
+    for (hotel, day), (arrivals, canceled) in daily.iterrows():
+        # Semana (desde el primer lunes) y día de la semana de cada fecha
+        week = (np.datetime64(day, 'D') - grid.weeks[0]).astype(int) // 7
+        h, weekday = grid.hotels.index(hotel), day.weekday()
+        assert grid.arrivals[h, week, weekday] == arrivals
+        assert grid.canceled[h, week, weekday] == canceled
+    assert np.nansum(grid.arrivals) == len(data)
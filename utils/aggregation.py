@@ -0,0 +1,234 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.date_dimension import year_month_keys, year_month_labels
+########################################
+
+# Por encima de este número de combinaciones posibles, las claves compuestas se
+# compactan con np.unique en lugar de indexar un array denso
+MAX_DENSE_GROUPS = 10_000_000
+
+
+class Metric(NamedTuple):
+    """
+    Agregado que necesita la página: recuento de filas por `by` y, opcionalmente,
+    suma de las columnas `values` en cada grupo. Con `by=()` se obtienen totales.
+    """
+    name: str
+    by: tuple = ()
+    values: tuple = ()
+
+
+def _year_month(df):
+    # Clave entera año*12 + mes; la etiqueta 'YYYY-MM' se calcula solo por nivel
+    return year_month_keys(df['arrival_date_year'], df['month_num']), year_month_labels
+
+
+# Claves que no son columnas del DataFrame sino que se derivan al construir el motor
+DERIVED_KEYS = {
+    'year_month': (('arrival_date_year', 'month_num'), _year_month),
+}
+
+
+def _small_int(codes, n_levels):
+    # Códigos en el menor tipo entero que admite el número de niveles (-1 = nulo)
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_levels < np.iinfo(dtype).max:
+            return codes.astype(dtype)
+    return codes.astype(np.int64)
+
+
+class AggregationEngine:
+    """
+    Motor de agregación en una pasada para todos los gráficos de una página.
+
+    Al construirse factoriza una sola vez las columnas de agrupación (códigos
+    enteros compartidos por todos los agregados). En cada rerun `compute`
+    extrae una vez las filas seleccionadas de esas columnas y resuelve cada
+    agregado con `np.bincount` sobre claves enteras, sin `groupby` ni copias del
+    DataFrame.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas con las columnas derivadas de `load_bookings`.
+    keys : list
+        Columnas (o claves de `DERIVED_KEYS`) por las que se podrá agrupar.
+    values : list
+        Columnas numéricas que se podrán sumar.
+    arrays : dict, opcional
+        Arrays ya preparados para algunas de `values` (p.ej. las columnas
+        mapeadas en memoria de `utils.column_store`), en el orden de filas de
+        `df`. Se usan tal cual en lugar de copiar la columna a float64.
+    """
+
+    def __init__(self, df, keys, values, arrays=None):
+        self.n_rows = len(df)
+        self.codes = {}
+        self.levels = {}
+        for key in keys:
+            if key in DERIVED_KEYS:
+                sources, derive = DERIVED_KEYS[key]
+                if not all(col in df.columns for col in sources):
+                    continue
+                raw, labeler = derive(df)
+                codes, uniques = pd.factorize(raw, sort=True)
+                levels = pd.Index(labeler(uniques), name=key)
+            elif key in df.columns:
+                col = df[key]
+                if isinstance(col.dtype, pd.CategoricalDtype):
+                    # Se conservan las categorías (y su orden) como niveles
+                    codes, levels = col.cat.codes.to_numpy(), col.cat.categories
+                    levels = pd.CategoricalIndex(levels, categories=levels, ordered=col.cat.ordered, name=key)
+                else:
+                    codes, uniques = pd.factorize(col, sort=True)
+                    levels = pd.Index(uniques, name=key)
+            else:
+                continue
+            self.codes[key] = _small_int(np.asarray(codes), len(levels))
+            self.levels[key] = levels
+
+        arrays = arrays or {}
+        self.values = {}
+        for col in values:
+            if col in arrays:
+                if len(arrays[col]) != self.n_rows:
+                    raise ValueError(f"La columna '{col}' tiene {len(arrays[col])} filas y el DataFrame {self.n_rows}")
+                self.values[col] = arrays[col]
+            elif col in df.columns:
+                self.values[col] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+
+    def supports(self, metric):
+        """Indica si el motor tiene todas las claves y valores de `metric`."""
+        return all(k in self.codes for k in metric.by) and all(v in self.values for v in metric.values)
+
+    def compute(self, selection, metrics):
+        """
+        Calcula todos los agregados de `metrics` sobre las filas seleccionadas.
+
+        Parámetros:
+        -----------
+        selection : Selection | None
+            Filas a agregar (ver `utils.bitmap_index`). None equivale a todas.
+        metrics : list
+            Lista de `Metric`. Los agregados que el motor no soporta se omiten.
+
+        Retorna:
+        --------
+        dict
+            Diccionario nombre -> pd.DataFrame con las columnas de agrupación,
+            `count` y `<valor>_sum` por cada columna de `values`. Para los
+            totales (`by=()`) el DataFrame tiene una única fila.
+        """
+        metrics = [m for m in metrics if self.supports(m)]
+        positions = None if selection is None or selection.is_full else selection.positions
+
+        # Una única extracción de las filas seleccionadas por columna usada
+        used_keys = {k for m in metrics for k in m.by}
+        used_values = {v for m in metrics for v in m.values}
+        codes = {k: self.codes[k] if positions is None else self.codes[k][positions] for k in used_keys}
+        values = {v: self.values[v] if positions is None else self.values[v][positions] for v in used_values}
+        n_selected = self.n_rows if positions is None else len(positions)
+
+        # Las claves compuestas se comparten entre agregados con el mismo `by`
+        group_cache = {}
+        bundle = {}
+        for metric in metrics:
+            if metric.by not in group_cache:
+                group_cache[metric.by] = self._group_ids(metric.by, codes, n_selected)
+            group_ids, valid, n_groups, decode = group_cache[metric.by]
+
+            counts = np.bincount(group_ids, minlength=n_groups)
+            result = {'count': counts}
+            for col in metric.values:
+                weights = values[col] if valid is None else values[col][valid]
+                result[f'{col}_sum'] = np.bincount(group_ids, weights=np.nan_to_num(weights), minlength=n_groups)
+
+            present = counts > 0 if metric.by else np.ones(1, dtype=bool)
+            columns = dict(decode(present))
+            columns.update({name: arr[present] for name, arr in result.items()})
+            bundle[metric.name] = pd.DataFrame(columns)
+
+        return bundle
+
+    def _group_ids(self, by, codes, n_selected):
+        """Clave entera de grupo por fila (combinando varias columnas) y su decodificación."""
+        if not by:
+            return np.zeros(n_selected, dtype=np.intp), None, 1, lambda present: {}
+
+        key_codes = [codes[k] for k in by]
+        valid = np.logical_and.reduce([c >= 0 for c in key_codes])
+        if valid.all():
+            valid = None
+        else:
+            key_codes = [c[valid] for c in key_codes]
+
+        shape = tuple(len(self.levels[k]) for k in by)
+        if np.prod(shape, dtype=np.float64) <= MAX_DENSE_GROUPS:
+            group_ids = np.ravel_multi_index(key_codes, shape) if len(by) > 1 else key_codes[0].astype(np.intp)
+            n_groups = int(np.prod(shape))
+
+            def decode(present):
+                level_codes = np.unravel_index(np.flatnonzero(present), shape)
+                return {k: self.levels[k].take(c) for k, c in zip(by, level_codes)}
+        else:
+            stacked = np.stack([c.astype(np.int64) for c in key_codes], axis=1)
+            uniques, group_ids = np.unique(stacked, axis=0, return_inverse=True)
+            group_ids = group_ids.ravel()
+            n_groups = len(uniques)
+
+            def decode(present):
+                rows = uniques[present]
+                return {k: self.levels[k].take(rows[:, i]) for i, k in enumerate(by)}
+
+        return group_ids, valid, n_groups, decode
+
+
+def histogram_stats(hist, by, value, count='count'):
+    """
+    Media, mediana y recuento de `value` por grupo a partir de un histograma.
+
+    La mediana sigue el criterio de pandas: con un número par de observaciones
+    es la media de los dos valores centrales.
+
+    Parámetros:
+    -----------
+    hist : pd.DataFrame
+        Recuentos por (`by`, `value`), p.ej. un agregado de `AggregationEngine`.
+    by : str | None
+        Columna de agrupación. Con None se resume el histograma completo.
+    value : str
+        Columna con los valores del histograma.
+    count : str
+        Columna con el número de observaciones de cada valor.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Columnas `by` (si se indica), 'mean', 'median' y 'count'.
+    """
+    groups = [(None, hist)] if by is None else hist.groupby(by, observed=True, sort=True)
+    rows = []
+    for group, part in groups:
+        part = part[part[count] > 0].sort_values(value)
+        vals = part[value].to_numpy(dtype='float64')
+        counts = part[count].to_numpy()
+        total = counts.sum()
+        if total == 0:
+            rows.append({by: group, 'mean': np.nan, 'median': np.nan, 'count': 0})
+            continue
+        cum = np.cumsum(counts)
+        lower = vals[np.searchsorted(cum, (total - 1) // 2, side='right')]
+        upper = vals[np.searchsorted(cum, total // 2, side='right')]
+        rows.append({
+            by: group,
+            'mean': (vals * counts).sum() / total,
+            'median': (lower + upper) / 2,
+            'count': total,
+        })
+    columns = ['mean', 'median', 'count'] if by is None else [by, 'mean', 'median', 'count']
+    return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,88 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+########################################
+
+# Versión de los tramos. Cualquier cambio de límites o etiquetas debe
+# incrementarla: forma parte de la versión de las columnas derivadas.
+BINS_VERSION = 2
+
+# Tramos de lead time (a, b]. El último tramo es abierto para que la
+# categoría de una reserva no dependa del resto de filas (p.ej. del bloque)
+LEAD_TIME_BINS = [-1, 0, 7, 30, 90, 180, np.inf]
+LEAD_TIME_LABELS = ['Mismo día', '1 semana', '1 mes', '3 meses', '6 meses', 'Más de 6 meses']
+
+# Rangos de ADR usados en el análisis de cancelación por precio
+ADR_BINS = [0, 50, 100, 150, 200, 500]
+ADR_LABELS = ['€0-50', '€51-100', '€101-150', '€151-200', '>€200']
+
+
+class Binning(NamedTuple):
+    """Tramos (a, b] de una columna numérica, con una etiqueta por tramo."""
+    column: str
+    edges: list
+    labels: list
+
+
+# Columnas de tramos que se guardan al cargar las reservas: nombre -> tramos
+BINNINGS = {
+    'lead_time_category': Binning('lead_time', LEAD_TIME_BINS, LEAD_TIME_LABELS),
+    'adr_bin': Binning('adr', ADR_BINS, ADR_LABELS),
+}
+
+
+def bin_codes(values, edges):
+    """
+    Código entero del tramo (a, b] de cada valor con `np.searchsorted`.
+
+    Parámetros:
+    -----------
+    values : array-like
+        Valores numéricos (los nulos se aceptan).
+    edges : list
+        Límites crecientes de los tramos.
+
+    Retorna:
+    --------
+    np.ndarray
+        Códigos int8: 0 para el primer tramo, -1 para nulos y valores fuera
+        de los límites (igual que `pd.cut`).
+    """
+    values = pd.Series(values).to_numpy(dtype='float64', na_value=np.nan)
+    codes = np.searchsorted(np.asarray(edges, dtype='float64'), values, side='left') - 1
+    codes[(codes >= len(edges) - 1) | np.isnan(values)] = -1
+    return codes.astype(np.int8)
+
+
+def bin_column(values, binning):
+    """Categórica ordenada con las etiquetas de `binning` a partir de sus códigos."""
+    return pd.Categorical.from_codes(bin_codes(values, binning.edges), categories=binning.labels, ordered=True)
+
+
+def apply_binnings(df, binnings=BINNINGS):
+    """
+    Añade a `df` las columnas de tramos de `binnings` cuya columna de origen existe.
+
+    Cada columna es una categórica cuyos códigos (int8) son el número de
+    tramo, así que los histogramas y tasas por tramo se resuelven con
+    `np.bincount` sobre los códigos, sin volver a cortar los valores.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas con las columnas de origen.
+    binnings : dict
+        Diccionario nombre -> `Binning`.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        El mismo DataFrame con las columnas de tramos.
+    """
+    for name, binning in binnings.items():
+        if binning.column in df.columns:
+            df[name] = bin_column(df[binning.column], binning)
+    return df
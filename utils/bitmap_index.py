@@ -0,0 +1,150 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+########################################
+
+# Número de bits a 1 de cada byte posible, para contar filas sin desempaquetar
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class Selection:
+    """
+    Selección ligera de filas de un DataFrame, representada como un bitmap
+    empaquetado (1 bit por fila). Las posiciones y el DataFrame filtrado solo
+    se materializan cuando se piden.
+    """
+
+    def __init__(self, bits, n_rows, is_full=False):
+        self.bits = bits
+        self.n_rows = n_rows
+        self.is_full = is_full
+        self._positions = None
+
+    def __len__(self):
+        if self.is_full:
+            return self.n_rows
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    @property
+    def mask(self):
+        """Máscara booleana de longitud `n_rows`."""
+        return np.unpackbits(self.bits, count=self.n_rows).view(bool)
+
+    @property
+    def positions(self):
+        """Posiciones (enteros) de las filas seleccionadas, en orden."""
+        if self._positions is None:
+            if self.is_full:
+                self._positions = np.arange(self.n_rows)
+            else:
+                self._positions = np.flatnonzero(self.mask)
+        return self._positions
+
+    def take(self, df):
+        """
+        Devuelve las filas seleccionadas de `df`. Si la selección cubre todas
+        las filas se devuelve `df` tal cual, sin copia.
+        """
+        if self.is_full:
+            return df
+        return df.take(self.positions)
+
+    def __and__(self, other):
+        return Selection(self.bits & other.bits, self.n_rows, self.is_full and other.is_full)
+
+    def __or__(self, other):
+        return Selection(self.bits | other.bits, self.n_rows, self.is_full or other.is_full)
+
+
+class BitmapIndex:
+    """
+    Índice de bitmaps por valor para las columnas de filtrado del sidebar.
+
+    Para cada columna indexada se guarda un bitmap empaquetado por valor
+    distinto. Un estado de filtros se resuelve con OR entre los valores
+    elegidos de cada columna y AND entre columnas, operando sobre n/8 bytes
+    en lugar de comparar y copiar el DataFrame completo.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame a indexar. El índice se refiere a posiciones de fila, así que
+        solo es válido mientras el orden de `df` no cambie.
+    columns : list
+        Columnas a indexar. Las que no existen en `df` se ignoran.
+    """
+
+    def __init__(self, df, columns):
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            self.bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(uniques)
+            }
+        n_bytes = (self.n_rows + 7) // 8
+        self._empty = np.zeros(n_bytes, dtype=np.uint8)
+        self._full = np.packbits(np.ones(self.n_rows, dtype=bool))
+
+    def values(self, column):
+        """Valores distintos (ordenados) de una columna indexada."""
+        return list(self.bitmaps.get(column, {}))
+
+    def bitmap(self, column, values):
+        """
+        Bitmap de las filas cuyo valor en `column` está en `values` (OR).
+
+        Parámetros:
+        -----------
+        column : str
+            Columna indexada.
+        values : iterable
+            Valores aceptados. Los valores que no aparecen en los datos no
+            aportan filas.
+
+        Retorna:
+        --------
+        np.ndarray
+            Bitmap empaquetado (uint8) de longitud ceil(n_rows / 8).
+        """
+        column_bitmaps = self.bitmaps[column]
+        result = self._empty.copy()
+        for value in values:
+            bits = column_bitmaps.get(value)
+            if bits is not None:
+                result |= bits
+        return result
+
+    def select(self, filters):
+        """
+        Resuelve un estado de filtros a una selección de filas.
+
+        Parámetros:
+        -----------
+        filters : dict
+            Diccionario columna -> valores aceptados. Un valor None (o una
+            columna que no está indexada) significa "sin filtrar". Si la lista
+            de valores cubre todos los valores de la columna tampoco se filtra.
+
+        Retorna:
+        --------
+        Selection
+            Selección con las filas que cumplen todos los filtros.
+        """
+        bits = None
+        for col, values in filters.items():
+            if values is None or col not in self.bitmaps:
+                continue
+            values = set(values)
+            if values.issuperset(self.bitmaps[col]):
+                continue
+            col_bits = self.bitmap(col, values)
+            bits = col_bits if bits is None else np.bitwise_and(bits, col_bits, out=bits)
+
+        if bits is None:
+            return Selection(self._full, self.n_rows, is_full=True)
+        return Selection(bits, self.n_rows)
@@ -0,0 +1,286 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.binning import BINNINGS, BINS_VERSION, apply_binnings
+from utils.columnar_cache import file_fingerprint, read_cached_frame, write_cached_frame
+from utils.date_dimension import MONTH_MAP, SEASON_MAP, SEASON_ORDER, arrival_dates
+########################################
+
+# Versión de las columnas derivadas ("<derivación>.<tramos>"). Cualquier cambio
+# en `derive_columns` debe incrementar la primera parte para invalidar las
+# cachés columnares existentes; la segunda es la versión de `utils.binning`.
+DERIVED_VERSION = f"5.{BINS_VERSION}"
+
+# Dimensiones por las que filtra el sidebar de los dashboards
+FILTER_COLUMNS = ['hotel', 'arrival_date_year', 'customer_type']
+
+# Cadenas que pandas lee como nulos en el CSV (p.ej. country = 'NULL'); los
+# motores alternativos a pandas las necesitan para leer el CSV igual
+CSV_NULL_STRINGS = ['', 'NA', 'N/A', 'NULL', 'NaN', 'nan', 'null']
+
+# Filas por bloque en la ingesta por streaming de CSVs que no caben en memoria
+STREAM_CHUNK_ROWS = 1_000_000
+
+# Esquema compacto del DataFrame de reservas. Las dimensiones de texto se
+# guardan como categóricas (códigos enteros + diccionario), los contadores como
+# enteros pequeños y `adr` en float32. `children`, `agent` y `company` tienen
+# nulos, por lo que usan enteros anulables en lugar de float64.
+BOOKINGS_SCHEMA = {
+    'hotel': 'category',
+    'country': 'category',
+    'market_segment': 'category',
+    'distribution_channel': 'category',
+    'deposit_type': 'category',
+    'customer_type': 'category',
+    'meal': 'category',
+    'reserved_room_type': 'category',
+    'assigned_room_type': 'category',
+    'reservation_status': 'category',
+    'arrival_date_month': pd.CategoricalDtype(list(MONTH_MAP), ordered=True),
+    'is_canceled': 'int8',
+    'is_repeated_guest': 'int8',
+    'adults': 'int8',
+    'babies': 'int8',
+    'children': 'Int8',
+    'stays_in_weekend_nights': 'int8',
+    'stays_in_week_nights': 'int8',
+    'arrival_date_day_of_month': 'int8',
+    'arrival_date_week_number': 'int8',
+    'previous_cancellations': 'int8',
+    'previous_bookings_not_canceled': 'int8',
+    'booking_changes': 'int8',
+    'required_car_parking_spaces': 'int8',
+    'total_of_special_requests': 'int8',
+    'lead_time': 'int16',
+    'arrival_date_year': 'int16',
+    'days_in_waiting_list': 'int16',
+    'agent': 'Int16',
+    'company': 'Int16',
+    'adr': 'float32',
+}
+
+# Tipos de las columnas derivadas por `derive_columns`
+DERIVED_SCHEMA = {
+    'month_num': 'int8',
+    'total_nights': 'int16',
+    'total_guests': 'Int16',
+    'season': pd.CategoricalDtype(SEASON_ORDER, ordered=True),
+    **{name: pd.CategoricalDtype(binning.labels, ordered=True) for name, binning in BINNINGS.items()},
+}
+
+
+def default_cache_dir(csv_path):
+    """Directorio de caché por defecto: `.cache` junto al CSV de origen."""
+    return Path(csv_path).resolve().parent / ".cache"
+
+
+def _fits(series, dtype):
+    """Comprueba que los valores de `series` caben en el tipo entero `dtype`."""
+    dtype = pd.api.types.pandas_dtype(dtype)
+    info = np.iinfo(getattr(dtype, 'numpy_dtype', dtype))
+    values = series.dropna()
+    if len(values) == 0:
+        return True
+    if not np.all(np.mod(values, 1) == 0):
+        return False
+    return info.min <= values.min() and values.max() <= info.max
+
+
+def apply_schema(df, schema=BOOKINGS_SCHEMA):
+    """
+    Convierte las columnas presentes en `df` a los tipos compactos de `schema`.
+
+    Los enteros solo se reducen si todos los valores caben en el tipo destino;
+    si no, se deja que pandas elija el menor tipo válido en lugar de desbordar.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame de reservas.
+    schema : dict
+        Diccionario columna -> tipo destino.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        El mismo DataFrame con los tipos convertidos.
+    """
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        kind = pd.api.types.pandas_dtype(dtype)
+        if pd.api.types.is_integer_dtype(kind):
+            if _fits(df[col], kind):
+                df[col] = df[col].astype(kind)
+            elif df[col].isna().any():
+                df[col] = df[col].astype('Int64')
+            else:
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+        else:
+            df[col] = df[col].astype(kind)
+    return df
+
+
+def derive_columns(df):
+    """
+    Añade al DataFrame de reservas las columnas derivadas que usan los dashboards.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas tal y como se leen de `hotel_bookings_processed.csv`.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        El mismo DataFrame con `month_num`, `dia`, `total_nights`, `total_guests`,
+        `season` y las columnas de tramos de `utils.binning` (`lead_time_category`
+        y `adr_bin`) cuando sus columnas de origen existen.
+    """
+    apply_schema(df)
+
+    # Crear columna de fecha de llegada. El mes es categórico en el orden de
+    # MONTH_MAP, así que su número es el código + 1; la fecha sale de
+    # aritmética entera sobre (año, mes, día)
+    if 'arrival_date_year' in df.columns and 'arrival_date_month' in df.columns and 'arrival_date_day_of_month' in df.columns:
+        df['month_num'] = (df['arrival_date_month'].cat.codes + 1).astype('int8')
+        df['dia'] = arrival_dates(df['arrival_date_year'], df['month_num'], df['arrival_date_day_of_month'])
+
+    # Total de noches. Los sumandos son int8 del esquema compacto: se suman en
+    # 32 bits para no desbordar y `DERIVED_SCHEMA` compacta después el resultado
+    if 'stays_in_weekend_nights' in df.columns and 'stays_in_week_nights' in df.columns:
+        df['total_nights'] = df['stays_in_weekend_nights'].astype('int32') + df['stays_in_week_nights'].astype('int32')
+
+    # Total de huéspedes (anulable: `children` tiene nulos)
+    if 'adults' in df.columns and 'children' in df.columns and 'babies' in df.columns:
+        df['total_guests'] = (
+            df['adults'].astype('Int32') + df['children'].astype('Int32') + df['babies'].astype('Int32')
+        )
+
+    # Temporada
+    if 'arrival_date_month' in df.columns:
+        df['season'] = df['arrival_date_month'].map(SEASON_MAP)
+
+    # Tramos de lead time y ADR como categóricas con códigos enteros (int8)
+    apply_binnings(df)
+
+    return apply_schema(df, DERIVED_SCHEMA)
+
+
+def _read_only(values):
+    values = values.view()
+    values.flags.writeable = False
+    return values
+
+
+def freeze_frame(df):
+    """
+    Versión de solo lectura de `df` para compartirla entre sesiones.
+
+    Los arrays de cada columna se marcan como no escribibles (las columnas
+    numéricas sin copiarse), así que cualquier asignación en el sitio falla en
+    lugar de cambiar los datos que ven las demás sesiones. Las columnas de
+    texto de Arrow ya son inmutables y se conservan tal cual.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas, p.ej. de `load_bookings`.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        DataFrame con los mismos valores y tipos.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values, pd.Categorical):
+            columns[col] = pd.Categorical.from_codes(_read_only(values.codes), dtype=values.dtype)
+        elif isinstance(values, pd.arrays.IntegerArray):
+            data = values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0)
+            columns[col] = pd.arrays.IntegerArray(_read_only(data), _read_only(values.isna()))
+        elif isinstance(df[col].dtype, np.dtype):
+            columns[col] = _read_only(df[col].to_numpy())
+        else:
+            columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def read_bookings_csv(csv_path, **kwargs):
+    """
+    Lee el CSV de reservas pidiendo ya como categóricas las dimensiones de texto,
+    para no materializar millones de cadenas de Python durante el parseo.
+    """
+    category_cols = {col: 'category' for col, dtype in BOOKINGS_SCHEMA.items() if str(dtype) == 'category'}
+    return pd.read_csv(csv_path, dtype=category_cols, **kwargs)
+
+
+def iter_bookings(csv_path, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Recorre el CSV de reservas por bloques, con las columnas derivadas y el
+    esquema compacto aplicados a cada bloque.
+
+    Solo hay un bloque en memoria a la vez, así que permite agregar ficheros
+    mayores que la RAM disponible.
+
+    Parámetros:
+    -----------
+    csv_path : str | Path
+        Ruta del CSV procesado de reservas.
+    chunksize : int
+        Número de filas por bloque.
+
+    Retorna:
+    --------
+    Iterator[pd.DataFrame]
+        Bloques de reservas con las columnas de `derive_columns`.
+    """
+    with read_bookings_csv(csv_path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield derive_columns(chunk)
+
+
+def load_bookings(csv_path, cache_dir=None, use_cache=True):
+    """
+    Carga el CSV de reservas con sus columnas derivadas y el esquema compacto
+    `BOOKINGS_SCHEMA`, usando una caché Parquet.
+
+    La caché se guarda en disco junto con la huella del CSV (tamaño, fecha de
+    modificación y hash del contenido), por lo que sobrevive a reinicios del
+    servidor. Mientras el CSV no cambie, el arranque lee la caché columnar en
+    lugar de volver a parsear el CSV y derivar las columnas.
+
+    Parámetros:
+    -----------
+    csv_path : str | Path
+        Ruta del CSV procesado de reservas.
+    cache_dir : str | Path, opcional
+        Directorio de la caché. Por defecto, `.cache` junto al CSV.
+    use_cache : bool
+        Si es False se lee siempre el CSV y no se escribe caché.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Reservas con las columnas derivadas.
+    """
+    if not use_cache:
+        return derive_columns(read_bookings_csv(csv_path))
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir(csv_path)
+
+    df = read_cached_frame(csv_path, cache_dir, version=DERIVED_VERSION)
+    if df is not None:
+        return df
+
+    # La huella se toma antes de leer para no registrar una versión posterior del CSV
+    fingerprint = file_fingerprint(csv_path)
+    df = derive_columns(read_bookings_csv(csv_path))
+    write_cached_frame(df, csv_path, cache_dir, version=DERIVED_VERSION, fingerprint=fingerprint)
+    return df
@@ -0,0 +1,169 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.bookings import DERIVED_VERSION, apply_schema, default_cache_dir, read_bookings_csv
+from utils.columnar_cache import file_fingerprint, read_valid_manifest, write_manifest
+########################################
+
+# Columnas numéricas que los dashboards suman en cada rerun: las de
+# `ENGINE_VALUES` que el motor de agregados toma del almacén (`total_nights` es
+# derivada y no está en el CSV)
+HOT_COLUMNS = [
+    'is_canceled',
+    'adr',
+    'lead_time',
+]
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _store_dir(source, cache_dir):
+    return Path(cache_dir) / f"{Path(source).stem}.columns"
+
+
+def _column_array(series):
+    # Array NumPy con el tipo compacto de la columna; los enteros con nulos pasan a float64 con NaN
+    if isinstance(series.dtype, np.dtype):
+        return series.to_numpy()
+    if series.isna().any():
+        return series.to_numpy(dtype='float64', na_value=np.nan)
+    return series.to_numpy(dtype=series.dtype.numpy_dtype)
+
+
+def write_column_store(df, source, cache_dir, columns=HOT_COLUMNS, fingerprint=None):
+    """
+    Guarda columnas de `df` como ficheros `.npy` (uno por columna) junto a un
+    manifiesto con la huella de `source`, el número de filas y los tipos.
+
+    Cada fichero se escribe de forma atómica y el manifiesto va el último, así
+    que un proceso que abre el almacén nunca ve columnas a medio escribir.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas (al menos con las columnas de `columns` que existan).
+    source : str | Path
+        Fichero fuente (CSV) del que proceden las columnas.
+    cache_dir : str | Path
+        Directorio de la caché.
+    columns : list
+        Columnas a guardar.
+    fingerprint : dict, opcional
+        Huella del fuente tomada antes de leerlo.
+
+    Retorna:
+    --------
+    Path
+        Directorio del almacén.
+    """
+    directory = _store_dir(source, cache_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    if fingerprint is None:
+        fingerprint = file_fingerprint(source)
+
+    dtypes = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = _column_array(df[col])
+        target = directory / f"{col}.npy"
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values, allow_pickle=False)
+        os.replace(tmp_path, target)
+        dtypes[col] = values.dtype.str
+
+    write_manifest(directory / MANIFEST_NAME, fingerprint, DERIVED_VERSION, n_rows=len(df), columns=dtypes)
+    return directory
+
+
+def open_column_store(source, cache_dir, columns=HOT_COLUMNS):
+    """
+    Abre el almacén de columnas de `source` mapeado en memoria.
+
+    Los arrays se abren con `np.load(mmap_mode='r')`: no se leen al abrirlos y
+    sus páginas se comparten (vía la caché de páginas del sistema) entre todos
+    los procesos que abren el mismo almacén. Son de solo lectura.
+
+    Parámetros:
+    -----------
+    source : str | Path
+        Fichero fuente (CSV).
+    cache_dir : str | Path
+        Directorio de la caché.
+    columns : list
+        Columnas a abrir.
+
+    Retorna:
+    --------
+    dict | None
+        Diccionario columna -> np.memmap, o None si el almacén no existe, no
+        tiene alguna de las columnas o el fuente ha cambiado.
+    """
+    directory = _store_dir(source, cache_dir)
+    manifest = read_valid_manifest(source, directory / MANIFEST_NAME, DERIVED_VERSION)
+    if manifest is None or not all(col in manifest['columns'] for col in columns):
+        return None
+    try:
+        arrays = {col: np.load(directory / f"{col}.npy", mmap_mode='r') for col in columns}
+    except (OSError, ValueError):
+        return None
+    if any(len(values) != manifest['n_rows'] for values in arrays.values()):
+        return None
+    return arrays
+
+
+def load_column_store(csv_path, cache_dir=None, columns=HOT_COLUMNS):
+    """
+    Columnas calientes de las reservas mapeadas en memoria, creando el almacén
+    desde el CSV (leyendo solo esas columnas) si no existe o está obsoleto.
+
+    Parámetros:
+    -----------
+    csv_path : str | Path
+        Ruta del CSV procesado de reservas.
+    cache_dir : str | Path, opcional
+        Directorio de la caché. Por defecto, `.cache` junto al CSV.
+    columns : list
+        Columnas del almacén.
+
+    Retorna:
+    --------
+    dict
+        Diccionario columna -> np.memmap (de solo lectura), en el orden de filas del CSV.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir(csv_path)
+
+    arrays = open_column_store(csv_path, cache_dir, columns)
+    if arrays is not None:
+        return arrays
+
+    # La huella se toma antes de leer para no registrar una versión posterior del CSV
+    fingerprint = file_fingerprint(csv_path)
+    df = apply_schema(read_bookings_csv(csv_path, usecols=lambda col: col in columns))
+    write_column_store(df, csv_path, cache_dir, columns, fingerprint=fingerprint)
+    return open_column_store(csv_path, cache_dir, [col for col in columns if col in df.columns])
+
+
+if __name__ == '__main__':
+    # Preproceso antes de arrancar los workers: python -m utils.column_store [CSV]
+    default_csv = Path(__file__).resolve().parents[1] / "1. Datos" / "hotel_bookings_processed.csv"
+    parser = argparse.ArgumentParser(description="Crea el almacén de columnas .npy mapeadas en memoria.")
+    parser.add_argument('csv', nargs='?', default=default_csv, help="CSV procesado de reservas")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    arrays = load_column_store(args.csv)
+    print(f"Almacén listo en {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    arrays = open_column_store(args.csv, default_cache_dir(args.csv))
+    print(f"Apertura: {(time.perf_counter() - start) * 1000:.1f} ms")
+    for col, values in arrays.items():
+        print(f"  {col:>24}: {values.dtype} x {len(values):,} ({values.nbytes / 1024 ** 2:.1f} MB)")
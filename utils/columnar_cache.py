@@ -0,0 +1,206 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import hashlib
+import json
+import os
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (motor de Parquet para pandas)
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    PARQUET_DISPONIBLE = False
+########################################
+
+# Tamaño del bloque de lectura al calcular el hash del fichero fuente
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def file_fingerprint(path, with_hash=True):
+    """
+    Calcula la huella de un fichero: tamaño, fecha de modificación y hash del contenido.
+
+    Parámetros:
+    -----------
+    path : str | Path
+        Ruta del fichero.
+    with_hash : bool
+        Si es False se omite el hash (lectura completa del fichero) y solo se
+        devuelven tamaño y fecha de modificación.
+
+    Retorna:
+    --------
+    dict
+        Diccionario con las claves 'size', 'mtime_ns' y, opcionalmente, 'blake2b'.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    if with_hash:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(block)
+        fingerprint['blake2b'] = digest.hexdigest()
+
+    return fingerprint
+
+
+def _cache_paths(source, cache_dir):
+    source = Path(source)
+    cache_dir = Path(cache_dir)
+    return cache_dir / f"{source.stem}.parquet", cache_dir / f"{source.stem}.manifest.json"
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_valid_manifest(source, manifest_path, version=1):
+    """
+    Devuelve el manifiesto de una caché de `source` si sigue siendo válida.
+
+    Si tamaño y fecha de modificación coinciden con el manifiesto, la caché se usa
+    sin releer el fichero fuente. Si solo cambia la fecha (p.ej. el fichero se ha
+    vuelto a copiar), se recalcula el hash del contenido y la caché se reutiliza
+    cuando este coincide.
+
+    Parámetros:
+    -----------
+    source : str | Path
+        Fichero fuente (CSV) del que procede la caché.
+    manifest_path : str | Path
+        Manifiesto escrito con `write_manifest`.
+    version : int
+        Versión de la transformación aplicada al fuente.
+
+    Retorna:
+    --------
+    dict | None
+        Manifiesto (con los campos adicionales que se guardaron), o None.
+    """
+    manifest = _read_manifest(manifest_path)
+    if manifest is None or manifest.get('version') != version:
+        return None
+
+    current = file_fingerprint(source, with_hash=False)
+    if current['size'] != manifest.get('size'):
+        return None
+
+    if current['mtime_ns'] != manifest.get('mtime_ns'):
+        current = file_fingerprint(source)
+        if current['blake2b'] != manifest.get('blake2b'):
+            return None
+        # Mismo contenido con otra fecha: se actualiza el manifiesto
+        manifest.update(current)
+        write_manifest(manifest_path, manifest, version)
+    return manifest
+
+
+def read_cached_frame(source, cache_dir, version=1):
+    """
+    Devuelve el DataFrame cacheado para `source` si la caché sigue siendo válida
+    (ver `read_valid_manifest`).
+
+    Parámetros:
+    -----------
+    source : str | Path
+        Fichero fuente (CSV) del que procede la caché.
+    cache_dir : str | Path
+        Directorio donde se guarda la caché.
+    version : int
+        Versión de la transformación aplicada al fuente. Una caché escrita con
+        otra versión se considera inválida.
+
+    Retorna:
+    --------
+    pd.DataFrame | None
+        DataFrame cacheado, o None si no hay caché válida.
+    """
+    if not PARQUET_DISPONIBLE:
+        return None
+
+    parquet_path, manifest_path = _cache_paths(source, cache_dir)
+    manifest = read_valid_manifest(source, manifest_path, version) if parquet_path.exists() else None
+    # Las cachés sin la unidad de sus fechas (escritas por versiones anteriores) se reconstruyen
+    if manifest is None or 'datetimes' not in manifest:
+        return None
+
+    try:
+        df = pd.read_parquet(parquet_path)
+    except Exception as e:
+        warnings.warn(f"Error leyendo la caché columnar: {e}", RuntimeWarning, stacklevel=2)
+        return None
+    # Parquet guarda las fechas en ms/us: se recupera la unidad con la que se escribieron
+    datetimes = manifest.get('datetimes', {})
+    return df.astype(datetimes) if datetimes else df
+
+
+def _tmp_path(path):
+    # Nombre temporal único por proceso para que dos escrituras no se pisen
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def write_manifest(manifest_path, fingerprint, version=1, **extra):
+    """
+    Guarda (de forma atómica) el manifiesto de una caché: la huella del fuente,
+    la versión y los campos adicionales de `extra`.
+    """
+    manifest_path = Path(manifest_path)
+    manifest = dict(fingerprint, version=version, **extra)
+    tmp_path = _tmp_path(manifest_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def write_cached_frame(df, source, cache_dir, version=1, fingerprint=None):
+    """
+    Guarda `df` como caché Parquet de `source` junto a su manifiesto de huella.
+
+    La escritura es atómica (fichero temporal + renombrado), de modo que un
+    proceso concurrente nunca lee una caché a medio escribir.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame ya derivado a cachear.
+    source : str | Path
+        Fichero fuente (CSV) del que procede `df`.
+    cache_dir : str | Path
+        Directorio donde se guarda la caché.
+    version : int
+        Versión de la transformación aplicada al fuente.
+    fingerprint : dict, opcional
+        Huella del fuente tomada antes de leerlo. Si no se indica se calcula
+        ahora, con el riesgo de registrar una versión posterior a la leída.
+
+    Retorna:
+    --------
+    bool
+        True si la caché se ha escrito correctamente.
+    """
+    if not PARQUET_DISPONIBLE:
+        return False
+
+    parquet_path, manifest_path = _cache_paths(source, cache_dir)
+    try:
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(source)
+        tmp_path = _tmp_path(parquet_path)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+        datetimes = {col: str(dtype) for col, dtype in df.dtypes.items() if pd.api.types.is_datetime64_dtype(dtype)}
+        write_manifest(manifest_path, fingerprint, version, datetimes=datetimes)
+        return True
+    except Exception as e:
+        warnings.warn(f"Error escribiendo la caché columnar: {e}", RuntimeWarning, stacklevel=2)
+        return False
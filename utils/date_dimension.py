@@ -0,0 +1,127 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+########################################
+
+MONTH_MAP = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4,
+    'May': 5, 'June': 6, 'July': 7, 'August': 8,
+    'September': 9, 'October': 10, 'November': 11, 'December': 12
+}
+
+SEASON_MAP = {
+    'December': 'Invierno', 'January': 'Invierno', 'February': 'Invierno',
+    'March': 'Primavera', 'April': 'Primavera', 'May': 'Primavera',
+    'June': 'Verano', 'July': 'Verano', 'August': 'Verano',
+    'September': 'Otoño', 'October': 'Otoño', 'November': 'Otoño'
+}
+
+SEASON_ORDER = ['Primavera', 'Verano', 'Otoño', 'Invierno']
+
+# Temporada de cada mes (índice 0 = enero), como código de SEASON_ORDER
+SEASON_CODES = np.array([SEASON_ORDER.index(SEASON_MAP[month]) for month in MONTH_MAP], dtype=np.int8)
+
+# Día de la semana (lunes = 0) del 1970-01-01, origen de las claves de fecha
+EPOCH_WEEKDAY = 3
+
+
+def arrival_dates(year, month, day):
+    """
+    Fechas `datetime64[D]` a partir de año, mes y día con aritmética entera
+    (meses desde 1970 + días), sin pasar por texto ni `pd.to_datetime`.
+
+    Parámetros:
+    -----------
+    year, month, day : array-like
+        Componentes enteros de la fecha (mes de 1 a 12).
+
+    Retorna:
+    --------
+    np.ndarray
+        Array `datetime64[D]`.
+    """
+    year = np.asarray(year, dtype=np.int64)
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1)
+    # Un día fuera del mes (p.ej. 31 de abril) pasaría al mes siguiente
+    invalid = (month < 1) | (month > 12) | (day < 1) | (dates.astype('datetime64[M]') != months)
+    if invalid.any():
+        first = np.flatnonzero(invalid)[0]
+        raise ValueError(f"Fecha no válida: {year[first]}-{month[first]}-{day[first]}")
+    return dates
+
+
+def date_keys(dates):
+    """Clave entera de fecha: días desde 1970-01-01 (int32)."""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int32)
+
+
+def parse_iso_dates(values):
+    """
+    Fechas `datetime64[D]` de textos 'YYYY-MM-DD' (p.ej. `reservation_status_date`),
+    convirtiendo una sola vez cada valor distinto. Los nulos quedan como NaT.
+    """
+    codes, uniques = pd.factorize(pd.Series(values))
+    parsed = np.asarray(uniques, dtype=str).astype('datetime64[D]')
+    # El código -1 (nulo) toma el NaT añadido al final
+    return np.append(parsed, np.datetime64('NaT', 'D'))[codes]
+
+
+def year_month_keys(year, month):
+    """Clave entera de mes: año * 12 + mes - 1 (ordena cronológicamente)."""
+    return np.asarray(year, dtype=np.int32) * 12 + np.asarray(month, dtype=np.int32) - 1
+
+
+def year_month_labels(keys):
+    """Etiquetas 'YYYY-MM' de claves de `year_month_keys` (una por clave, no por fila)."""
+    return [f"{int(key) // 12}-{int(key) % 12 + 1:02d}" for key in keys]
+
+
+def date_dimension(first, last):
+    """
+    Tabla de calendario con una fila por día entre `first` y `last`.
+
+    Se indexa por la clave entera de `date_keys`, de modo que los atributos de
+    cualquier fecha (mes, semana ISO, temporada, día de la semana) se obtienen
+    con una indexación por posición, sin formatear fechas por fila.
+
+    Parámetros:
+    -----------
+    first, last : str | np.datetime64
+        Primer y último día (incluidos).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Índice `date_key` y columnas `date`, `year`, `month`, `day`,
+        `year_month_key`, `year_month` (categórica ordenada), `iso_year`,
+        `iso_week`, `weekday` (lunes = 0) y `season`.
+    """
+    dates = np.arange(np.datetime64(first, 'D'), np.datetime64(last, 'D') + 1)
+    keys = date_keys(dates)
+    months = dates.astype('datetime64[M]').astype(np.int64)
+    year = (months // 12 + 1970).astype(np.int16)
+    month = (months % 12 + 1).astype(np.int8)
+    ym_keys = year_month_keys(year, month)
+    ym_levels = np.unique(ym_keys)
+    iso = pd.DatetimeIndex(dates).isocalendar()
+
+    return pd.DataFrame({
+        'date': dates,
+        'year': year,
+        'month': month,
+        'day': (dates - dates.astype('datetime64[M]')).astype(np.int8) + 1,
+        'year_month_key': ym_keys,
+        'year_month': pd.Categorical.from_codes(
+            np.searchsorted(ym_levels, ym_keys), categories=year_month_labels(ym_levels), ordered=True
+        ),
+        'iso_year': iso['year'].to_numpy(dtype=np.int16),
+        'iso_week': iso['week'].to_numpy(dtype=np.int8),
+        'weekday': ((keys + EPOCH_WEEKDAY) % 7).astype(np.int8),
+        'season': pd.Categorical.from_codes(SEASON_CODES[month - 1], categories=SEASON_ORDER, ordered=True),
+    }, index=pd.Index(keys, name='date_key'))
+
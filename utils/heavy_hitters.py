@@ -0,0 +1,286 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+
+from utils.bookings import FILTER_COLUMNS, STREAM_CHUNK_ROWS, derive_columns, read_bookings_csv
+########################################
+
+# Columnas de alta cardinalidad con ranking de valores más frecuentes
+HEAVY_HITTER_COLUMNS = ['country', 'agent', 'company']
+
+# Columnas del CSV necesarias para construir los resúmenes
+HEAVY_HITTER_SOURCE_COLUMNS = HEAVY_HITTER_COLUMNS + ['is_canceled']
+
+# Contadores por resumen (celda y columna). Si una celda tiene menos valores
+# distintos, su resumen es exacto
+HEAVY_HITTER_CAPACITY = 128
+
+
+def exact_counts(df, column):
+    """
+    Recuento exacto de reservas y cancelaciones por valor de `column`, con la
+    forma de `SpaceSaving.ranking` (alternativa exacta a los resúmenes).
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas con `column` e `is_canceled`.
+    column : str
+        Columna a contar. Los nulos se ignoran.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Columnas `value`, `count` y `canceled`, ordenadas por valor.
+    """
+    counts = df.groupby(column, observed=True, sort=True)['is_canceled'].agg(['size', 'sum'])
+    return pd.DataFrame({
+        'value': counts.index.to_numpy(),
+        'count': counts['size'].to_numpy(dtype=np.int64),
+        'canceled': counts['sum'].to_numpy(dtype=np.int64),
+    })
+
+
+class SpaceSaving:
+    """
+    Resumen mergeable de los valores más frecuentes (Space-Saving) con, como
+    mucho, `capacity` contadores.
+
+    Cada contador guarda una estimación por exceso del recuento (`count`), su
+    error máximo (`error`) y las cancelaciones de las `count - error`
+    apariciones contadas. `floor` acota el recuento de cualquier valor sin
+    contador. Al sumar dos resúmenes, a un valor que falta en uno se le suma
+    el `floor` de ese resumen como recuento y como error; al recortar a
+    `capacity` contadores, el mayor recuento descartado pasa al `floor`. Con
+    `floor == 0` el resumen es exacto.
+
+    Parámetros:
+    -----------
+    capacity : int
+        Número máximo de contadores.
+    counts : pd.DataFrame, opcional
+        Contadores con índice de valor y columnas `count`, `error` y `canceled`.
+    floor : int
+        Cota del recuento de los valores sin contador.
+    total : int
+        Número de apariciones resumidas.
+    """
+
+    def __init__(self, capacity=HEAVY_HITTER_CAPACITY, counts=None, floor=0, total=0):
+        self.capacity = capacity
+        if counts is None:
+            counts = pd.DataFrame({'count': [], 'error': [], 'canceled': []}, dtype=np.int64)
+        self.counts = counts
+        self.floor = int(floor)
+        self.total = int(total)
+
+    @classmethod
+    def from_counts(cls, counts, capacity=HEAVY_HITTER_CAPACITY):
+        """
+        Resumen a partir de recuentos exactos (p.ej. de un bloque de reservas).
+
+        Parámetros:
+        -----------
+        counts : pd.DataFrame
+            Índice de valor y columnas `count` y `canceled`.
+        capacity : int
+            Número máximo de contadores.
+        """
+        counts = counts.assign(error=0)[['count', 'error', 'canceled']].astype(np.int64)
+        return cls(capacity, total=counts['count'].sum())._truncate(counts)
+
+    def _truncate(self, counts):
+        # Conserva los `capacity` mayores recuentos (desempate por valor); el mayor descartado acota el resto
+        counts = counts.sort_index().sort_values('count', ascending=False, kind='stable')
+        self.counts = counts.iloc[:self.capacity]
+        if len(counts) > self.capacity:
+            self.floor = max(self.floor, int(counts['count'].iloc[self.capacity]))
+        return self
+
+    def merge(self, other):
+        """
+        Suma dos resúmenes (de celdas o bloques disjuntos).
+
+        Retorna:
+        --------
+        SpaceSaving
+            Nuevo resumen con la capacidad mayor de ambos.
+        """
+        index = self.counts.index.union(other.counts.index)
+        merged = pd.DataFrame(0, index=index, columns=['count', 'error', 'canceled'], dtype=np.int64)
+        for summary in (self, other):
+            counts = summary.counts.reindex(index)
+            missing = counts['count'].isna().to_numpy()
+            # Un valor sin contador pudo aparecer hasta `floor` veces en ese resumen
+            merged['count'] += np.where(missing, summary.floor, counts['count'].to_numpy(dtype='float64')).astype(np.int64)
+            merged['error'] += np.where(missing, summary.floor, counts['error'].to_numpy(dtype='float64')).astype(np.int64)
+            merged['canceled'] += counts['canceled'].fillna(0).to_numpy(dtype=np.int64)
+        result = SpaceSaving(max(self.capacity, other.capacity), floor=self.floor + other.floor,
+                             total=self.total + other.total)
+        return result._truncate(merged)
+
+    def ranking(self, n=10):
+        """
+        Los `n` valores con mayor recuento estimado.
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Columnas `value`, `count` (cota superior), `error`, `lower`
+            (apariciones contadas, cota inferior) y `canceled` (cancelaciones de
+            esas apariciones).
+        """
+        top = self.counts.iloc[:n]
+        return pd.DataFrame({
+            'value': top.index.to_numpy(),
+            'count': top['count'].to_numpy(dtype=np.int64),
+            'error': top['error'].to_numpy(dtype=np.int64),
+            'lower': (top['count'] - top['error']).to_numpy(dtype=np.int64),
+            'canceled': top['canceled'].to_numpy(dtype=np.int64),
+        })
+
+    def report(self, n=10):
+        """
+        Cotas de error del ranking de los `n` primeros.
+
+        Retorna:
+        --------
+        dict
+            `total` (apariciones), `floor` (cota de los valores sin contador),
+            `max_error` (mayor error de los `n` primeros), `bound` (mayor
+            error posible del recuento de cualquier valor: el de los
+            contadores o el `floor`; a diferencia de total / capacidad, vale
+            también tras sumar resúmenes), `exact` (recuentos exactos) y
+            `guaranteed` (los `n` primeros son seguro los `n` más frecuentes:
+            su menor cota inferior no baja de la cota superior de cualquier
+            otro valor).
+        """
+        counts = self.counts['count'].to_numpy(dtype=np.int64)
+        lower = counts[:n] - self.counts['error'].to_numpy(dtype=np.int64)[:n]
+        # Mayor recuento posible fuera de los `n` primeros
+        outside = max(int(counts[n]) if len(counts) > n else 0, self.floor)
+        return {
+            'total': self.total,
+            'floor': self.floor,
+            'max_error': int(self.counts['error'].iloc[:n].max()) if len(lower) else 0,
+            'bound': max(self.floor, int(self.counts['error'].max()) if len(self.counts) else 0),
+            'exact': self.floor == 0,
+            'guaranteed': bool(len(lower) == 0 or lower.min() >= outside),
+        }
+
+
+class HeavyHitters:
+    """
+    Resúmenes Space-Saving por celda de las columnas de filtro para las
+    columnas de `HEAVY_HITTER_COLUMNS`.
+
+    El ranking de cualquier estado de filtros sale de sumar los resúmenes de
+    las celdas seleccionadas (unas decenas de contadores por celda), sin
+    recontar reservas. Si las cotas no garantizan el ranking y hay una fuente
+    exacta, se recurre a ella.
+
+    Parámetros:
+    -----------
+    sketches : dict
+        Columna -> {celda (tupla de valores de `keys`) -> SpaceSaving}.
+    keys : list
+        Columnas de filtro que definen las celdas.
+    capacity : int
+        Contadores por resumen.
+    """
+
+    def __init__(self, sketches, keys=FILTER_COLUMNS, capacity=HEAVY_HITTER_CAPACITY):
+        self.sketches = sketches
+        self.keys = list(keys)
+        self.capacity = capacity
+
+    @classmethod
+    def build(cls, df, columns=HEAVY_HITTER_COLUMNS, keys=FILTER_COLUMNS, capacity=HEAVY_HITTER_CAPACITY):
+        """Resúmenes de un DataFrame de reservas: un recuento exacto por (celda, valor), recortado."""
+        keys = [k for k in keys if k in df.columns]
+        sketches = {}
+        for column in columns:
+            if column not in df.columns:
+                continue
+            counts = df.groupby(keys + [column], observed=True, sort=True)['is_canceled'].agg(['size', 'sum'])
+            counts.columns = ['count', 'canceled']
+            sketches[column] = {
+                cell if isinstance(cell, tuple) else (cell,):
+                    SpaceSaving.from_counts(cell_counts.droplevel(keys), capacity)
+                for cell, cell_counts in counts.groupby(level=keys, observed=True, sort=True)
+            }
+        return cls(sketches, keys, capacity)
+
+    @classmethod
+    def from_chunks(cls, chunks, columns=HEAVY_HITTER_COLUMNS, keys=FILTER_COLUMNS, capacity=HEAVY_HITTER_CAPACITY):
+        """Construye los resúmenes plegando bloques de reservas (p.ej. de `iter_bookings`)."""
+        result = cls({column: {} for column in columns}, keys, capacity)
+        for chunk in chunks:
+            result = result.merge(cls.build(chunk, columns, keys, capacity))
+        return result
+
+    @classmethod
+    def from_csv(cls, csv_path, chunksize=STREAM_CHUNK_ROWS, keys=FILTER_COLUMNS):
+        """Construye los resúmenes recorriendo el CSV por bloques, solo con las columnas necesarias."""
+        columns = set(HEAVY_HITTER_SOURCE_COLUMNS) | set(keys)
+        with read_bookings_csv(csv_path, chunksize=chunksize, usecols=lambda col: col in columns) as reader:
+            return cls.from_chunks((derive_columns(chunk) for chunk in reader), keys=keys)
+
+    def merge(self, other):
+        """Suma celda a celda los resúmenes de otro `HeavyHitters` (de reservas disjuntas)."""
+        sketches = {}
+        for column in set(self.sketches) | set(other.sketches):
+            cells = dict(self.sketches.get(column, {}))
+            for cell, sketch in other.sketches.get(column, {}).items():
+                cells[cell] = cells[cell].merge(sketch) if cell in cells else sketch
+            sketches[column] = cells
+        return HeavyHitters(sketches, self.keys or other.keys, max(self.capacity, other.capacity))
+
+    def _selected(self, cell, filters):
+        # La celda cumple el estado de filtros
+        for key, value in zip(self.keys, cell):
+            values = (filters or {}).get(key)
+            if values is not None and value not in list(values):
+                return False
+        return True
+
+    def sketch(self, column, filters=None):
+        """Resumen de `column` para el estado de filtros (suma de las celdas seleccionadas)."""
+        merged = SpaceSaving(self.capacity)
+        for cell, sketch in self.sketches.get(column, {}).items():
+            if self._selected(cell, filters):
+                merged = merged.merge(sketch)
+        return merged
+
+    def top(self, column, filters=None, n=10, exact=None):
+        """
+        Los `n` valores más frecuentes de `column` para el estado de filtros.
+
+        Parámetros:
+        -----------
+        column : str
+            Columna de `HEAVY_HITTER_COLUMNS`.
+        filters : dict, opcional
+            Estado de filtros (columnas de `keys`).
+        n : int
+            Tamaño del ranking.
+        exact : callable, opcional
+            Devuelve los recuentos exactos (forma de `exact_counts`). Se usa
+            solo si las cotas del resumen no garantizan el ranking.
+
+        Retorna:
+        --------
+        tuple
+            (ranking, informe): el DataFrame de `SpaceSaving.ranking` y el
+            diccionario de `SpaceSaving.report`, con `source` = 'sketch' o
+            'exact'.
+        """
+        sketch = self.sketch(column, filters)
+        report = dict(sketch.report(n), source='sketch')
+        if report['guaranteed'] or exact is None:
+            return sketch.ranking(n), report
+
+        counts = exact().set_index('value')[['count', 'canceled']]
+        exact_sketch = SpaceSaving.from_counts(counts, capacity=max(len(counts), 1))
+        return exact_sketch.ranking(n), dict(exact_sketch.report(n), source='exact')
@@ -0,0 +1,202 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+
+from utils.bookings import FILTER_COLUMNS, derive_columns, read_bookings_csv
+from utils.date_dimension import date_keys
+########################################
+
+# Columnas del CSV necesarias para construir el índice de estancias
+STAY_SOURCE_COLUMNS = [
+    'hotel', 'arrival_date_year', 'arrival_date_month', 'arrival_date_day_of_month', 'customer_type',
+    'stays_in_weekend_nights', 'stays_in_week_nights', 'is_canceled', 'adr',
+]
+
+# Columnas derivadas que usa el índice
+STAY_COLUMNS = ['dia', 'total_nights', 'is_canceled', 'adr']
+
+# Medidas acumuladas por estancia: con sumas prefijas en el orden de llegadas
+# y en el de salidas, el agregado de las estancias que solapan una ventana
+# sale de dos búsquedas binarias por celda
+STAY_MEASURES = ['count', 'canceled', 'revenue', 'canceled_revenue']
+
+
+def _prefix(values):
+    # Sumas prefijas con un 0 inicial: la suma de [i, j) es p[j] - p[i]
+    return np.concatenate([[0.0], np.cumsum(values, dtype='float64')])
+
+
+class StayIndex:
+    """
+    Índice de intervalos de las estancias [llegada, salida), con salida =
+    llegada + noches, agrupado por celdas de las columnas de filtro.
+
+    En cada celda se guardan las llegadas y las salidas ordenadas, con sumas
+    prefijas de las medidas de `STAY_MEASURES`. Una estancia solapa la ventana
+    [inicio, fin) si llega antes de `fin` y sale después de `inicio`; como toda
+    estancia que sale antes de `inicio` también llegó antes de `fin`, el
+    agregado de las que solapan es (llegadas < fin) - (salidas <= inicio): dos
+    `np.searchsorted` por celda, O(log n). Las estancias de 0 noches no ocupan
+    ninguna noche y no se indexan.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas con las columnas de `STAY_COLUMNS` y las de `keys`.
+    keys : list
+        Columnas de filtro que definen las celdas.
+    """
+
+    def __init__(self, df, keys=FILTER_COLUMNS):
+        self.keys = [k for k in keys if k in df.columns]
+        nights = np.nan_to_num(df['total_nights'].to_numpy(dtype='float64', na_value=np.nan)).astype(np.int64)
+        stays = nights > 0
+        starts = date_keys(df['dia'].to_numpy()[stays]).astype(np.int64)
+
+        if self.keys:
+            cell_index = pd.MultiIndex.from_frame(df.loc[stays, self.keys].reset_index(drop=True))
+            cell_codes, cells = cell_index.factorize(sort=True)
+            cells = pd.MultiIndex.from_tuples(list(cells), names=self.keys)
+        else:
+            cell_codes, cells = np.zeros(len(starts), dtype=np.int64), pd.RangeIndex(1)
+
+        canceled = df['is_canceled'].to_numpy(dtype='float64', na_value=0)[stays]
+        adr = df['adr'].to_numpy(dtype='float64', na_value=np.nan)[stays]
+        # Posición de cada estancia en `df`, para devolver las filas que solapan
+        self._index(cells, cell_codes, np.flatnonzero(stays), len(df), starts, nights[stays], canceled,
+                    np.nan_to_num(adr) * nights[stays])
+
+    def _index(self, cells, cell_codes, rows, n_rows, starts, nights, canceled, revenue):
+        # Guarda las columnas por estancia y calcula los órdenes y las sumas prefijas por celda
+        self.cells = cells
+        self.cell_codes = cell_codes
+        self.rows = rows
+        self.n_rows = n_rows
+        self.arrival_days = starts
+        self.nights = nights
+        self.canceled = canceled
+        self.revenue = revenue
+        ends = starts + nights
+        measures = {
+            'count': np.ones(len(starts)),
+            'canceled': canceled,
+            'revenue': revenue,
+            'canceled_revenue': revenue * canceled,
+        }
+
+        # Orden por (celda, llegada) y por (celda, salida)
+        self.start_order = np.lexsort((starts, cell_codes))
+        self.end_order = np.lexsort((ends, cell_codes))
+        self.starts = starts[self.start_order]
+        self.ends = ends[self.end_order]
+        self.max_nights = int(nights.max()) if len(nights) else 0
+        # Límites de cada celda en los arrays ordenados (los mismos en ambos órdenes)
+        self.bounds = np.searchsorted(cell_codes[self.start_order], np.arange(len(cells) + 1))
+        self.start_sums = {name: _prefix(values[self.start_order]) for name, values in measures.items()}
+        self.end_sums = {name: _prefix(values[self.end_order]) for name, values in measures.items()}
+
+    @classmethod
+    def from_csv(cls, csv_path, keys=FILTER_COLUMNS):
+        """Construye el índice leyendo del CSV solo las columnas que necesita."""
+        columns = set(STAY_SOURCE_COLUMNS) | set(keys)
+        return cls(derive_columns(read_bookings_csv(csv_path, usecols=lambda col: col in columns)), keys)
+
+    def merge(self, other):
+        """
+        Suma dos índices (de reservas disjuntas, p.ej. un lote añadido al
+        dataset): une las celdas y vuelve a calcular órdenes y sumas prefijas,
+        sin releer las reservas de ninguno de los dos. Las posiciones de
+        `other` pasan a contar a continuación de las filas de este índice.
+
+        Retorna:
+        --------
+        StayIndex
+            Nuevo índice con las estancias de ambos.
+        """
+        cells = self.cells.union(other.cells)
+        merged = StayIndex.__new__(StayIndex)
+        merged.keys = self.keys or other.keys
+        merged._index(
+            cells,
+            np.concatenate([cells.get_indexer(index.cells)[index.cell_codes] for index in (self, other)]),
+            np.concatenate([self.rows, other.rows + self.n_rows]),
+            self.n_rows + other.n_rows,
+            *(np.concatenate([getattr(self, name), getattr(other, name)])
+              for name in ('arrival_days', 'nights', 'canceled', 'revenue')),
+        )
+        return merged
+
+    def _selected_cells(self, filters):
+        # Posiciones de las celdas que cumplen el estado de filtros
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, values in (filters or {}).items():
+            if values is None or col not in self.keys:
+                continue
+            mask &= self.cells.get_level_values(col).isin(list(values))
+        return np.flatnonzero(mask)
+
+    @staticmethod
+    def _day(value):
+        return int(date_keys(np.datetime64(value, 'D')))
+
+    def stats(self, start, end, filters=None):
+        """
+        Agregados de las estancias que solapan la ventana de noches [start, end).
+
+        Parámetros:
+        -----------
+        start, end : str | np.datetime64 | date
+            Primera noche de la ventana y día siguiente a la última.
+        filters : dict, opcional
+            Estado de filtros (columnas de `keys`).
+
+        Retorna:
+        --------
+        dict
+            Medidas de `STAY_MEASURES`: estancias, canceladas, ingresos
+            (ADR x noches de toda la estancia) e ingresos de las canceladas.
+        """
+        start, end = self._day(start), self._day(end)
+        totals = dict.fromkeys(STAY_MEASURES, 0.0)
+        if end <= start:
+            return totals
+        for cell in self._selected_cells(filters):
+            lo, hi = self.bounds[cell], self.bounds[cell + 1]
+            # Estancias que llegan antes de `end` menos las que ya han salido en `start`
+            arrived = lo + np.searchsorted(self.starts[lo:hi], end, side='left')
+            departed = lo + np.searchsorted(self.ends[lo:hi], start, side='right')
+            for name in STAY_MEASURES:
+                totals[name] += (self.start_sums[name][arrived] - self.start_sums[name][lo]
+                                 - self.end_sums[name][departed] + self.end_sums[name][lo])
+        return totals
+
+    def stabbing(self, night, filters=None):
+        """Agregados de las estancias alojadas la noche `night` (ventana de una noche)."""
+        return self.stats(night, np.datetime64(night, 'D') + 1, filters)
+
+    def overlapping(self, start, end, filters=None):
+        """
+        Posiciones (en el DataFrame de origen) de las estancias que solapan
+        [start, end). Las candidatas son las que llegan entre
+        `start - max_nights` y `end` (búsqueda binaria); de ellas se quedan las
+        que salen después de `start`, así que el coste es O(log n + k).
+
+        Retorna:
+        --------
+        np.ndarray
+            Posiciones ordenadas de las filas que solapan.
+        """
+        start, end = self._day(start), self._day(end)
+        if end <= start:
+            return np.empty(0, dtype=np.int64)
+        found = []
+        for cell in self._selected_cells(filters):
+            lo, hi = self.bounds[cell], self.bounds[cell + 1]
+            first = lo + np.searchsorted(self.starts[lo:hi], start - self.max_nights, side='right')
+            last = lo + np.searchsorted(self.starts[lo:hi], end, side='left')
+            candidates = self.start_order[first:last]
+            # Salida de cada candidata (en el orden de llegadas)
+            departures = self.starts[first:last] + self.nights[candidates]
+            found.append(self.rows[candidates[departures > start]])
+        return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
@@ -0,0 +1,484 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.binning import BINNINGS
+from utils.bookings import (
+    DERIVED_VERSION, FILTER_COLUMNS, SEASON_ORDER, STREAM_CHUNK_ROWS, default_cache_dir, iter_bookings,
+)
+from utils.columnar_cache import file_fingerprint, read_cached_frame, write_cached_frame
+from utils.date_dimension import year_month_keys, year_month_labels
+########################################
+
+# Dimensiones de análisis precalculadas en el cubo (además de las claves de filtro)
+CUBE_DIMENSIONS = [
+    'hotel',
+    'is_canceled',
+    'meal',
+    'customer_type',
+    'season',
+    'lead_time_category',
+    'distribution_channel',
+    'market_segment',
+    'is_repeated_guest',
+    'deposit_type',
+    'country',
+    'adr_bin',
+]
+
+# Dimensiones adicionales del modo streaming: sin filas en memoria, los
+# histogramas por fila que resuelve `AggregationEngine` también salen del cubo.
+# Una tupla es una dimensión compuesta (una celda por combinación de valores).
+STREAM_DIMENSIONS = CUBE_DIMENSIONS + [
+    'total_guests',
+    'total_nights',
+    'lead_time',
+    'year_month',
+    ('lead_time_category', 'total_nights'),
+]
+
+# Medidas acumuladas por celda: nombre -> (columna origen, agregación)
+CUBE_MEASURES = {
+    'count': ('is_canceled', 'size'),
+    'canceled': ('is_canceled', 'sum'),
+    'adr_sum': ('adr', 'sum'),
+    'nights_sum': ('total_nights', 'sum'),
+    'lead_sum': ('lead_time', 'sum'),
+}
+
+# Medida del cubo que equivale a la suma `<columna>_sum` de `AggregationEngine`
+ENGINE_SUMS = {
+    'is_canceled': 'canceled',
+    'adr': 'adr_sum',
+    'total_nights': 'nights_sum',
+    'lead_time': 'lead_sum',
+}
+
+
+def _year_month(df):
+    # Etiqueta 'YYYY-MM' formateada una vez por valor distinto, no por fila
+    codes = pd.Categorical(year_month_keys(df['arrival_date_year'], df['month_num']))
+    codes = codes.rename_categories(year_month_labels(codes.categories))
+    return pd.Series(codes, index=df.index)
+
+
+# Dimensiones que no son columnas del DataFrame sino que se derivan al construir
+# el cubo: dimensión -> (columnas necesarias, función que la calcula)
+DERIVED_DIMENSIONS = {
+    'year_month': (('arrival_date_year', 'month_num'), _year_month),
+}
+
+
+# Dimensiones con orden propio (el de sus categóricas ordenadas). Los backends
+# que no trabajan con categóricas de pandas ordenan sus resultados con él.
+ORDERED_DIMENSIONS = {
+    'season': SEASON_ORDER,
+    **{name: binning.labels for name, binning in BINNINGS.items()},
+}
+
+
+def _dimension_columns(dim):
+    # Columnas (niveles del índice) de una dimensión simple o compuesta
+    return list(dim) if isinstance(dim, tuple) else [dim]
+
+
+def complete_categories(result, dimension, keep=()):
+    """
+    Completa el resultado de un `slice` con los valores sin reservas de una
+    dimensión ordenada (medidas a 0), en el orden de la dimensión, igual que el
+    `value_counts` de una categórica. Las demás dimensiones no se tocan.
+
+    Sirve para recuentos y distribuciones (una barra de altura 0 mantiene el
+    eje completo). Las tasas y medias de una categoría sin reservas son 0/0:
+    quien las calcule debe pedir el `slice` con `drop_empty=True`, igual que un
+    `groupby` con `observed=True` descarta esas categorías.
+
+    Parámetros:
+    -----------
+    result : pd.DataFrame
+        Resultado plano de `slice` (columnas `keep`, la dimensión y medidas).
+    dimension : str | tuple
+        Dimensión del resultado.
+    keep : tuple
+        Claves de filtro conservadas como columnas.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Una fila por combinación de valores de `keep` presentes y categoría.
+    """
+    if dimension not in ORDERED_DIMENSIONS:
+        return result
+    categories = ORDERED_DIMENSIONS[dimension]
+    by = list(keep) + [dimension]
+    if keep:
+        index = pd.MultiIndex.from_product([sorted(result[col].unique()) for col in keep] + [categories], names=by)
+    else:
+        index = pd.Index(categories, name=dimension)
+    measures = [col for col in result.columns if col not in by]
+    result = result.set_index(by)[measures].reindex(index, fill_value=0).reset_index()
+    result[dimension] = pd.Categorical(result[dimension], categories=categories, ordered=True)
+    return result
+
+
+def _table_name(dim):
+    return '__'.join(_dimension_columns(dim))
+
+
+def _table_from_frame(frame, dim, keys):
+    # Reconstruye la tabla indexada de una dimensión a partir de su versión plana
+    table_keys = [k for k in keys if k in frame.columns]
+    levels = table_keys + [c for c in _dimension_columns(dim) if c not in table_keys]
+    return frame.set_index(levels), table_keys
+
+
+class BookingsCube:
+    """
+    Cubo OLAP precalculado de reservas.
+
+    Para cada dimensión de análisis guarda una tabla pequeña con las medidas de
+    `CUBE_MEASURES` por (hotel, arrival_date_year, customer_type, valor de la
+    dimensión). Cualquier gráfico de recuento o tasa de cancelación por una
+    dimensión se obtiene filtrando y sumando esa tabla, cuyo tamaño no depende
+    del número de reservas.
+
+    Parámetros:
+    -----------
+    tables : dict
+        Diccionario dimensión -> DataFrame indexado por claves + dimensión.
+    keys : list
+        Columnas de filtro que forman parte de cada celda.
+    """
+
+    def __init__(self, tables, keys):
+        self.tables = tables
+        self.keys = keys
+
+    @classmethod
+    def build(cls, df, dimensions=CUBE_DIMENSIONS, keys=FILTER_COLUMNS):
+        """
+        Construye el cubo recorriendo las reservas una vez por dimensión.
+
+        Parámetros:
+        -----------
+        df : pd.DataFrame
+            Reservas con las columnas derivadas de `load_bookings`.
+        dimensions : list
+            Dimensiones a precalcular. Las que no existen en `df` se omiten.
+        keys : list
+            Columnas de filtro que forman parte de cada celda.
+
+        Retorna:
+        --------
+        BookingsCube
+        """
+        keys = [k for k in keys if k in df.columns]
+        measures = {name: spec for name, spec in CUBE_MEASURES.items() if spec[0] in df.columns}
+
+        frame = df[list(dict.fromkeys(keys + [spec[0] for spec in measures.values()]))].copy()
+        # Las sumas se acumulan en float64/int64 aunque las columnas sean compactas
+        for name, (col, agg) in measures.items():
+            if agg == 'sum':
+                frame[col] = frame[col].astype('float64' if col == 'adr' else 'int64')
+
+        tables = {}
+        for dim in dimensions:
+            group_values = {}
+            for col in _dimension_columns(dim):
+                if col in keys:
+                    # Si la dimensión es también clave de filtro, la celda ya la contiene
+                    continue
+                if col in DERIVED_DIMENSIONS:
+                    sources, derive = DERIVED_DIMENSIONS[col]
+                    if not all(source in df.columns for source in sources):
+                        break
+                    group_values[col] = derive(df)
+                elif col in df.columns:
+                    group_values[col] = df[col]
+                else:
+                    break
+            else:
+                levels = keys + list(group_values)
+                group_keys = [frame[k] for k in keys]
+                group_keys += [values.rename(f'__{col}') for col, values in group_values.items()]
+                table = frame.groupby(group_keys, observed=True).agg(**measures)
+                table.index = table.index.set_names(levels)
+                tables[dim] = table
+
+        return cls(tables, keys)
+
+    @classmethod
+    def from_chunks(cls, chunks, dimensions=STREAM_DIMENSIONS, keys=FILTER_COLUMNS):
+        """
+        Construye el cubo plegando bloques de reservas uno a uno.
+
+        Cada bloque se reduce a su propio cubo y se acumula sobre el anterior,
+        así que la memoria depende del tamaño del cubo y del bloque, no del
+        número total de reservas.
+
+        Parámetros:
+        -----------
+        chunks : iterable
+            Bloques de reservas derivados, p.ej. de `iter_bookings`.
+        dimensions : list
+            Dimensiones a precalcular.
+        keys : list
+            Columnas de filtro que forman parte de cada celda.
+
+        Retorna:
+        --------
+        BookingsCube
+        """
+        cube = None
+        for chunk in chunks:
+            part = cls.build(chunk, dimensions, keys)
+            cube = part if cube is None else cube.merge(part)
+        return cube if cube is not None else cls({}, [])
+
+    def merge(self, other):
+        """
+        Suma celda a celda dos cubos con las mismas claves (p.ej. de dos bloques
+        de reservas distintos).
+
+        Parámetros:
+        -----------
+        other : BookingsCube
+            Cubo a acumular.
+
+        Retorna:
+        --------
+        BookingsCube
+            Nuevo cubo con las tablas de ambos sumadas.
+        """
+        tables = dict(self.tables)
+        for dim, table in other.tables.items():
+            if dim not in tables:
+                tables[dim] = table
+                continue
+            # Las categorías de cada bloque difieren: se combinan como valores
+            combined = pd.concat([tables[dim], table])
+            tables[dim] = combined.groupby(level=list(combined.index.names), observed=True).sum()
+        return BookingsCube(tables, self.keys or other.keys)
+
+    def update(self, df):
+        """
+        Acumula en el cubo, en el sitio, las reservas de `df` (p.ej. las de un
+        fichero de reservas nuevas). El coste depende de `df` y del tamaño del
+        cubo, no del histórico ya agregado.
+
+        Parámetros:
+        -----------
+        df : pd.DataFrame
+            Reservas derivadas a añadir.
+
+        Retorna:
+        --------
+        BookingsCube
+            El propio cubo actualizado.
+        """
+        dimensions = list(self.tables) or STREAM_DIMENSIONS
+        merged = self.merge(BookingsCube.build(df, dimensions, self.keys or FILTER_COLUMNS))
+        self.tables, self.keys = merged.tables, merged.keys
+        return self
+
+    def _mask(self, table, filters):
+        mask = np.ones(len(table), dtype=bool)
+        for col, values in (filters or {}).items():
+            if values is None or col not in self.keys:
+                continue
+            mask &= table.index.get_level_values(col).isin(list(values))
+        return mask
+
+    def slice(self, dimension, filters=None, keep=(), drop_empty=False):
+        """
+        Suma las celdas del cubo que cumplen el estado de filtros.
+
+        Parámetros:
+        -----------
+        dimension : str
+            Dimensión de análisis (una de `tables`).
+        filters : dict, opcional
+            Diccionario columna de filtro -> valores aceptados (None = todos),
+            el mismo que recibe `BitmapIndex.select`.
+        keep : tuple
+            Claves de filtro que se mantienen como columnas del resultado en lugar
+            de sumarse (p.ej. 'hotel' para una serie por hotel).
+        drop_empty : bool
+            Si es True se descartan los valores sin reservas (para tasas y
+            medias, que en ellos no están definidas). Si no, las dimensiones
+            ordenadas (`ORDERED_DIMENSIONS`) incluyen todas sus categorías, con
+            medidas a 0 las que no tienen reservas (ver `complete_categories`).
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Una fila por valor de la dimensión (en su orden natural) con las
+            columnas de medidas (`count`, `canceled`, `adr_sum`, ...).
+        """
+        table = self.tables[dimension]
+        table = table[self._mask(table, filters)]
+        group_levels = list(dict.fromkeys(list(keep) + _dimension_columns(dimension)))
+        result = table.groupby(level=group_levels, observed=True).sum().reset_index()
+        if drop_empty:
+            return result[result['count'] > 0].reset_index(drop=True)
+        return complete_categories(result, dimension, keep)
+
+    def totals(self, filters=None):
+        """Medidas totales para el estado de filtros (sin desglosar por dimensión)."""
+        table = self.tables['is_canceled']
+        return table[self._mask(table, filters)].sum()
+
+    def values(self, key):
+        """Valores distintos (ordenados) de una clave de filtro presentes en el cubo."""
+        return sorted(self.tables['is_canceled'].index.unique(level=key))
+
+    def supports(self, metric):
+        """Indica si el cubo puede resolver un `Metric` de `utils.aggregation`."""
+        dimension = self._metric_dimension(metric)
+        sums_ok = all(v in ENGINE_SUMS for v in metric.values)
+        return sums_ok and (dimension is None or dimension in self.tables)
+
+    def _metric_dimension(self, metric):
+        # Las claves de filtro de `by` se conservan con `keep`; el resto es la dimensión
+        columns = tuple(c for c in metric.by if c not in self.keys)
+        if not columns:
+            return 'is_canceled' if metric.by else None
+        return columns[0] if len(columns) == 1 else columns
+
+    def compute(self, filters, metrics):
+        """
+        Resuelve los agregados de página desde el cubo, con la misma forma que
+        `AggregationEngine.compute` (columnas de `by`, `count` y `<valor>_sum`).
+        Permite servir la página sin tener las reservas en memoria.
+
+        Parámetros:
+        -----------
+        filters : dict
+            Estado de filtros (ver `slice`).
+        metrics : list
+            Lista de `Metric`. Los agregados que el cubo no soporta se omiten.
+
+        Retorna:
+        --------
+        dict
+            Diccionario nombre -> pd.DataFrame.
+        """
+        bundle = {}
+        for metric in metrics:
+            if not self.supports(metric):
+                continue
+            dimension = self._metric_dimension(metric)
+            if dimension is None:
+                result = self.totals(filters).to_frame().T
+            else:
+                keep = tuple(c for c in metric.by if c in self.keys)
+                result = self.slice(dimension, filters, keep=keep, drop_empty=True)
+                if dimension == 'is_canceled' and 'is_canceled' not in metric.by:
+                    # Agregado solo por claves de filtro: se suma el desglose auxiliar
+                    result = result.groupby(list(metric.by), observed=True, as_index=False).sum()
+                result = result.sort_values(list(metric.by), ignore_index=True)
+            sums = {f'{v}_sum': result[ENGINE_SUMS[v]] for v in metric.values}
+            bundle[metric.name] = pd.concat(
+                [result[list(metric.by)], result['count'].astype('int64').rename('count'), pd.DataFrame(sums)],
+                axis=1,
+            )
+        return bundle
+
+    def save(self, source, cache_dir, fingerprint=None):
+        """
+        Guarda las tablas del cubo como caché Parquet de `source` (una por
+        dimensión, con el manifiesto de huella de `utils.columnar_cache`).
+        """
+        if fingerprint is None:
+            fingerprint = file_fingerprint(source)
+        for dim, table in self.tables.items():
+            write_cached_frame(table.reset_index(), source, Path(cache_dir) / 'cube' / _table_name(dim),
+                               version=DERIVED_VERSION, fingerprint=fingerprint)
+
+    @classmethod
+    def load(cls, source, cache_dir, dimensions=STREAM_DIMENSIONS, keys=FILTER_COLUMNS):
+        """
+        Lee el cubo guardado con `save` si sigue siendo válido para `source`.
+
+        Retorna:
+        --------
+        BookingsCube | None
+            Cubo, o None si falta alguna tabla o el fuente ha cambiado.
+        """
+        tables = {}
+        table_keys = []
+        for dim in dimensions:
+            frame = read_cached_frame(source, Path(cache_dir) / 'cube' / _table_name(dim), version=DERIVED_VERSION)
+            if frame is None:
+                return None
+            tables[dim], table_keys = _table_from_frame(frame, dim, keys)
+        return cls(tables, table_keys)
+
+    def write_tables(self, directory):
+        """Guarda cada tabla del cubo como `<dimensión>.parquet` en `directory`."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for dim, table in self.tables.items():
+            target = directory / f"{_table_name(dim)}.parquet"
+            tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            table.reset_index().to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, target)
+
+    @classmethod
+    def read_tables(cls, directory, dimensions=STREAM_DIMENSIONS, keys=FILTER_COLUMNS):
+        """
+        Lee un cubo guardado con `write_tables`. Las dimensiones sin fichero se
+        omiten, igual que en `build` cuando falta su columna.
+
+        Retorna:
+        --------
+        BookingsCube | None
+            Cubo, o None si el directorio no tiene ninguna tabla.
+        """
+        tables = {}
+        table_keys = []
+        for dim in dimensions:
+            path = Path(directory) / f"{_table_name(dim)}.parquet"
+            if path.exists():
+                tables[dim], table_keys = _table_from_frame(pd.read_parquet(path), dim, keys)
+        return cls(tables, table_keys) if tables else None
+
+
+def load_bookings_cube(csv_path, cache_dir=None, chunksize=STREAM_CHUNK_ROWS, dimensions=STREAM_DIMENSIONS):
+    """
+    Cubo de reservas construido por streaming, sin cargar el CSV completo.
+
+    El CSV se recorre por bloques de `chunksize` filas y cada bloque se pliega
+    en el cubo. El resultado se guarda junto a la huella del CSV, de modo que
+    los arranques siguientes leen solo las tablas agregadas.
+
+    Parámetros:
+    -----------
+    csv_path : str | Path
+        Ruta del CSV procesado de reservas.
+    cache_dir : str | Path, opcional
+        Directorio de la caché. Por defecto, `.cache` junto al CSV.
+    chunksize : int
+        Número de filas por bloque.
+    dimensions : list
+        Dimensiones a precalcular.
+
+    Retorna:
+    --------
+    BookingsCube
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir(csv_path)
+
+    cube = BookingsCube.load(csv_path, cache_dir, dimensions)
+    if cube is not None:
+        return cube
+
+    fingerprint = file_fingerprint(csv_path)
+    cube = BookingsCube.from_chunks(iter_bookings(csv_path, chunksize), dimensions)
+    cube.save(csv_path, cache_dir, fingerprint=fingerprint)
+    return cube
@@ -0,0 +1,299 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+
+from utils.bookings import FILTER_COLUMNS, derive_columns, read_bookings_csv
+from utils.date_dimension import MONTH_MAP, SEASON_CODES, SEASON_ORDER, date_keys, parse_iso_dates
+########################################
+
+# Columnas del CSV necesarias para reconstruir la cartera de reservas
+BOOK_SOURCE_COLUMNS = [
+    'hotel', 'arrival_date_year', 'arrival_date_month', 'arrival_date_day_of_month', 'customer_type',
+    'lead_time', 'is_canceled', 'reservation_status_date',
+]
+
+# Columnas (derivadas) que usa `OnTheBooks`
+BOOK_COLUMNS = ['dia', 'lead_time', 'is_canceled', 'reservation_status_date']
+
+# Eventos de la cartera, cada uno como array ordenado por celda:
+#   created: alta de cada reserva (llegada - lead_time)
+#   arrivals: llegada de cada reserva (sale de la cartera de llegadas futuras)
+#   removed: baja de las canceladas (fecha de estado)
+#   created_canceled / arrivals_canceled: alta y llegada de las canceladas
+BOOK_EVENTS = ['created', 'arrivals', 'removed', 'created_canceled', 'arrivals_canceled']
+
+
+# Días de antelación de las curvas de ritmo; las reservas hechas antes se acumulan en el último
+PACE_MAX_DAYS = 365
+
+
+def _count_until(values, as_of, side='right'):
+    # Número de eventos de un array ordenado hasta cada fecha (incluida con side='right')
+    return np.searchsorted(values, as_of, side=side)
+
+
+class OnTheBooks:
+    """
+    Cartera de reservas ("on the books") reconstruida a cualquier fecha pasada.
+
+    Cada reserva entra en la cartera el día en que se hizo (llegada -
+    lead_time) y, si se cancela, sale el día de su `reservation_status_date`
+    (acotado entre el alta y la llegada: una cancelación posterior a la llegada
+    es un no-show). La cartera a fecha t son las reservas dadas de alta hasta t,
+    no canceladas todavía y con llegada desde t.
+
+    Con los eventos ordenados por celda de filtros, la cartera de cualquier
+    conjunto de fechas sale de recuentos acumulados con `np.searchsorted`:
+
+        cartera(t) = altas(<= t) - llegadas(< t) - bajas(<= t) + llegadas canceladas(< t)
+
+    (toda reserva llegada antes de t ya se había dado de alta, y toda
+    cancelada llegada antes de t ya se había dado de baja). El coste es
+    O(log n) por fecha y celda, sin volver a filtrar reservas por fecha.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Reservas con las columnas de `BOOK_COLUMNS` y las de `keys`.
+    keys : list
+        Columnas de filtro que definen las celdas.
+    """
+
+    def __init__(self, df, keys=FILTER_COLUMNS):
+        self.keys = [k for k in keys if k in df.columns]
+        arrivals = date_keys(df['dia'].to_numpy()).astype(np.int64)
+        created = arrivals - df['lead_time'].to_numpy(dtype='float64', na_value=0).astype(np.int64)
+        canceled = df['is_canceled'].to_numpy(dtype='float64', na_value=0) == 1
+        status = parse_iso_dates(df['reservation_status_date'])
+        # Sin fecha de estado, la cancelación se data en la llegada
+        removed = np.where(np.isnat(status), arrivals, status.astype(np.int64))
+        removed = np.clip(removed, created, arrivals)
+
+        if self.keys:
+            cell_index = pd.MultiIndex.from_frame(df[self.keys].reset_index(drop=True))
+            cell_codes, cells = cell_index.factorize(sort=True)
+            cells = pd.MultiIndex.from_tuples(list(cells), names=self.keys)
+        else:
+            cell_codes, cells = np.zeros(len(arrivals), dtype=np.int64), pd.RangeIndex(1)
+
+        # Día de baja de las canceladas (el máximo entero en las demás)
+        removed_days = np.where(canceled, removed, np.iinfo(np.int64).max)
+        self._index(cells, cell_codes, arrivals, created, removed_days, canceled)
+
+    def _index(self, cells, cell_codes, arrivals, created, removed_days, canceled):
+        # Guarda las columnas por reserva y ordena los eventos por (celda, día)
+        self.cells = cells
+        # Columnas por reserva para las consultas sobre una ventana de llegadas
+        self.cell_codes = cell_codes
+        self.arrival_days = arrivals
+        self.created_days = created
+        self.removed_days = removed_days
+        self.canceled = canceled
+        # Mes de llegada (0 = enero) de cada reserva, para agrupar las curvas de ritmo
+        self.arrival_months = (arrivals.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12)
+
+        events = {
+            'created': (created, np.ones(len(arrivals), dtype=bool)),
+            'arrivals': (arrivals, np.ones(len(arrivals), dtype=bool)),
+            'removed': (removed_days, canceled),
+            'created_canceled': (created, canceled),
+            'arrivals_canceled': (arrivals, canceled),
+        }
+        # Por evento: días ordenados por (celda, día) y límites de cada celda
+        self.events = {}
+        for name, (days, selected) in events.items():
+            order = np.lexsort((days[selected], cell_codes[selected]))
+            bounds = np.searchsorted(cell_codes[selected][order], np.arange(len(self.cells) + 1))
+            self.events[name] = (days[selected][order], bounds)
+
+    @classmethod
+    def from_csv(cls, csv_path, keys=FILTER_COLUMNS):
+        """Construye la cartera leyendo del CSV solo las columnas que necesita."""
+        columns = set(BOOK_SOURCE_COLUMNS) | set(keys)
+        return cls(derive_columns(read_bookings_csv(csv_path, usecols=lambda col: col in columns)), keys)
+
+    def merge(self, other):
+        """
+        Suma dos carteras (de reservas disjuntas, p.ej. un lote añadido al
+        dataset): une las celdas y vuelve a ordenar los eventos, sin releer
+        las reservas de ninguna de las dos.
+
+        Retorna:
+        --------
+        OnTheBooks
+            Nueva cartera con las reservas de ambas.
+        """
+        cells = self.cells.union(other.cells)
+        merged = OnTheBooks.__new__(OnTheBooks)
+        merged.keys = self.keys or other.keys
+        merged._index(
+            cells,
+            np.concatenate([cells.get_indexer(book.cells)[book.cell_codes] for book in (self, other)]),
+            *(np.concatenate([getattr(self, name), getattr(other, name)])
+              for name in ('arrival_days', 'created_days', 'removed_days', 'canceled')),
+        )
+        return merged
+
+    @property
+    def first_day(self):
+        """Primer día con reservas en cartera (alta más antigua)."""
+        return np.datetime64(int(self.created_days.min()), 'D')
+
+    @property
+    def last_day(self):
+        """Última llegada."""
+        return np.datetime64(int(self.arrival_days.max()), 'D')
+
+    def _selected_cells(self, filters):
+        # Posiciones de las celdas que cumplen el estado de filtros
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, values in (filters or {}).items():
+            if values is None or col not in self.keys:
+                continue
+            mask &= self.cells.get_level_values(col).isin(list(values))
+        return np.flatnonzero(mask)
+
+    def _counts(self, name, as_of, cells, side='right'):
+        # Eventos `name` hasta cada fecha, sumados en las celdas seleccionadas
+        days, bounds = self.events[name]
+        total = np.zeros(len(as_of), dtype=np.int64)
+        for cell in cells:
+            total += _count_until(days[bounds[cell]:bounds[cell + 1]], as_of, side)
+        return total
+
+    def snapshot(self, as_of, filters=None):
+        """
+        Cartera de llegadas futuras a cada fecha de `as_of`.
+
+        Parámetros:
+        -----------
+        as_of : array-like
+            Fechas de corte (p.ej. un `np.arange` de días).
+        filters : dict, opcional
+            Estado de filtros (columnas de `keys`).
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Índice `as_of` y columnas `on_books` (reservas en cartera),
+            `to_cancel` (de ellas, las que se cancelarán después), `created`
+            (altas del día) y `canceled` (cancelaciones del día).
+        """
+        as_of_days = date_keys(np.asarray(as_of, dtype='datetime64[D]')).astype(np.int64)
+        cells = self._selected_cells(filters)
+        created = self._counts('created', as_of_days, cells)
+        removed = self._counts('removed', as_of_days, cells)
+        on_books = (created - self._counts('arrivals', as_of_days, cells, side='left') - removed
+                    + self._counts('arrivals_canceled', as_of_days, cells, side='left'))
+        # Canceladas en cartera: dadas de alta y todavía sin baja (su baja es anterior a la llegada)
+        to_cancel = self._counts('created_canceled', as_of_days, cells) - removed
+        return pd.DataFrame({
+            'on_books': on_books,
+            'to_cancel': to_cancel,
+            'created': created - self._counts('created', as_of_days - 1, cells),
+            'canceled': removed - self._counts('removed', as_of_days - 1, cells),
+        }, index=pd.DatetimeIndex(as_of_days.astype('datetime64[D]'), name='as_of'))
+
+    def pickup(self, start, end, days_before=365, filters=None):
+        """
+        Curva de captación de las llegadas entre `start` y `end` (incluidas):
+        cartera de esas llegadas en cada uno de los `days_before` días previos
+        a `start`.
+
+        Las reservas de la ventana se seleccionan una vez; después, altas y
+        bajas se ordenan y la cartera de todas las fechas sale de dos
+        `np.searchsorted`.
+
+        Parámetros:
+        -----------
+        start, end : str | np.datetime64 | date
+            Primera y última llegada de la ventana objetivo.
+        days_before : int
+            Días de antelación de la curva.
+        filters : dict, opcional
+            Estado de filtros (columnas de `keys`).
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Una fila por día de antelación (de `days_before` a 0) con `as_of`,
+            `days_before`, `on_books`, `to_cancel`, `created` (altas
+            acumuladas) y `canceled` (bajas acumuladas).
+        """
+        start = int(date_keys(np.datetime64(start, 'D')))
+        end = int(date_keys(np.datetime64(end, 'D')))
+        target = np.isin(self.cell_codes, self._selected_cells(filters))
+        target &= (self.arrival_days >= start) & (self.arrival_days <= end)
+
+        created = np.sort(self.created_days[target])
+        removed = np.sort(self.removed_days[target])
+        created_canceled = np.sort(self.created_days[target & self.canceled])
+        days_out = np.arange(days_before, -1, -1)
+        as_of = start - days_out
+
+        gross = _count_until(created, as_of)
+        canceled = _count_until(removed, as_of)
+        return pd.DataFrame({
+            'as_of': as_of.astype('datetime64[D]'),
+            'days_before': days_out,
+            'on_books': gross - canceled,
+            'to_cancel': _count_until(created_canceled, as_of) - canceled,
+            'created': gross,
+            'canceled': canceled,
+        })
+
+    def pace(self, filters=None, by='month', max_days=PACE_MAX_DAYS):
+        """
+        Curvas de ritmo de reservas: altas y cancelaciones acumuladas por días
+        antes de la llegada, una curva por mes o temporada de llegada.
+
+        Cada reserva aporta un alta a los `lead_time` días antes de su llegada
+        y, si se cancela, una baja a (llegada - fecha de cancelación) días. Un
+        único `np.bincount` sobre (periodo, días de antelación) da la matriz de
+        eventos, y su suma acumulada desde la mayor antelación, las curvas; sin
+        un bucle por periodo.
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Estado de filtros (columnas de `keys`).
+        by : str
+            'month' (una curva por mes de llegada) o 'season'.
+        max_days : int
+            Mayor antelación de las curvas.
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Una fila por (periodo, días antes de la llegada, de `max_days` a 0)
+            con `period`, `days_before`, `created` (altas hechas con al menos esa
+            antelación), `canceled` (bajas ya producidas) y `on_books` (la
+            diferencia).
+        """
+        selected = np.isin(self.cell_codes, self._selected_cells(filters))
+        months = self.arrival_months[selected]
+        if by == 'season':
+            codes, labels = SEASON_CODES[months].astype(np.int64), SEASON_ORDER
+        else:
+            codes, labels = months, list(MONTH_MAP)
+
+        arrivals = self.arrival_days[selected]
+        n_cells = len(labels) * (max_days + 1)
+        lead = np.minimum(arrivals - self.created_days[selected], max_days)
+        created = np.bincount(codes * (max_days + 1) + lead, minlength=n_cells)
+
+        canceled_rows = self.canceled[selected]
+        cancel_lead = np.minimum(arrivals - self.removed_days[selected], max_days)[canceled_rows]
+        canceled = np.bincount(codes[canceled_rows] * (max_days + 1) + cancel_lead, minlength=n_cells)
+
+        # Acumulado desde la mayor antelación: columna d = eventos con antelación >= d
+        created = created.reshape(len(labels), max_days + 1)[:, ::-1].cumsum(axis=1)
+        canceled = canceled.reshape(len(labels), max_days + 1)[:, ::-1].cumsum(axis=1)
+        return pd.DataFrame({
+            'period': np.repeat(labels, max_days + 1),
+            'days_before': np.tile(np.arange(max_days, -1, -1), len(labels)),
+            'created': created.ravel(),
+            'canceled': canceled.ravel(),
+            'on_books': (created - canceled).ravel(),
+        })
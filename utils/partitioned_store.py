@@ -0,0 +1,556 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import argparse
+import copy
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+from utils.columnar_cache import file_fingerprint
+from utils.bookings import (
+    DERIVED_SCHEMA, DERIVED_VERSION, FILTER_COLUMNS, STREAM_CHUNK_ROWS,
+    apply_schema, iter_bookings,
+)
+from utils.olap_cube import STREAM_DIMENSIONS, BookingsCube
+from utils.time_series import DailyCube
+########################################
+
+# Columnas de partición del dataset, en orden de anidamiento de directorios
+PARTITION_COLUMNS = ['hotel', 'arrival_date_year']
+
+MANIFEST_NAME = '_manifest.json'
+
+# Subdirectorio de cada partición con su cubo de agregados
+CUBE_DIR = '_cube'
+
+# Fichero de cada partición con su cubo diario de llegadas
+DAILY_CUBE_FILE = '_daily.npz'
+
+# Versión de la estructura de las particiones (ficheros de agregados que
+# acompañan a los Parquet). Un dataset de otra versión se vuelve a importar
+LAYOUT_VERSION = 5
+
+DEFAULT_DATASET_PATH = Path(__file__).resolve().parents[1] / "1. Datos" / "hotel_bookings_dataset"
+
+
+def _partition_dir(root, hotel, year):
+    # Directorios estilo Hive (hotel=.../arrival_date_year=...) con el valor escapado
+    return Path(root) / f"hotel={quote(str(hotel), safe=' ')}" / f"arrival_date_year={int(year)}"
+
+
+def _partition_value(path):
+    return unquote(path.name.split('=', 1)[1])
+
+
+def _part_version(path):
+    # Versión del dataset que escribió un fichero `part-<versión>-<bloque>.parquet`
+    return int(path.stem.split('-')[1])
+
+
+def _new_manifest():
+    return {
+        'version': DERIVED_VERSION, 'layout': LAYOUT_VERSION, 'columns': [], 'values': {},
+        'n_parts': 0, 'sources': [],
+    }
+
+
+def _remove(path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+
+class PartitionedBookings:
+    """
+    Dataset de reservas en Parquet particionado por hotel y año de llegada.
+
+    Cada partición es un directorio `hotel=<hotel>/arrival_date_year=<año>` con
+    uno o varios ficheros `part-*.parquet` (ya derivados y con el esquema
+    compacto) y el cubo de agregados de sus reservas en `_cube/`. Un estado de
+    filtros del sidebar solo lee los directorios de los hoteles y años
+    seleccionados; el filtro de tipo de cliente se aplica al leer cada fichero.
+    Las reservas nuevas se añaden como ficheros nuevos y actualizan solo los
+    cubos de las particiones que tocan. Cada lote añadido es una versión del
+    dataset que se publica entera o no se publica (ver `write_batches`).
+
+    Parámetros:
+    -----------
+    root : str | Path
+        Directorio raíz del dataset.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.manifest = self._read_manifest()
+
+    @property
+    def exists(self):
+        """Indica si el dataset está creado y es de la versión actual de columnas derivadas y de estructura."""
+        return (
+            self.manifest is not None
+            and self.manifest.get('version') == DERIVED_VERSION
+            and self.manifest.get('layout') == LAYOUT_VERSION
+        )
+
+    @property
+    def keys(self):
+        """Columnas de filtro disponibles en el dataset."""
+        return list((self.manifest or {}).get('values', {}))
+
+    @property
+    def version(self):
+        """Número de escrituras del dataset; cambia con cada lote de reservas añadido."""
+        return (self.manifest or {}).get('n_parts', 0)
+
+    def values(self, column):
+        """Valores distintos (ordenados) de una columna de filtro."""
+        return list(self.manifest['values'][column])
+
+    def refresh(self):
+        """Relee el manifiesto por si otro proceso ha añadido reservas al dataset."""
+        manifest = self._read_manifest()
+        if manifest is not None:
+            self.manifest = manifest
+        return self
+
+    @classmethod
+    def from_csv(cls, csv_path, root, chunksize=STREAM_CHUNK_ROWS):
+        """
+        Importa el CSV de reservas al dataset particionado, por bloques.
+
+        Se escribe en un directorio temporal que sustituye al dataset anterior
+        solo al terminar, para que un lector nunca vea una importación a medias.
+
+        Parámetros:
+        -----------
+        csv_path : str | Path
+            Ruta del CSV procesado de reservas.
+        root : str | Path
+            Directorio raíz del dataset.
+        chunksize : int
+            Número de filas por bloque de lectura.
+
+        Retorna:
+        --------
+        PartitionedBookings
+        """
+        root = Path(root)
+        tmp_root = root.with_name(f"{root.name}.{os.getpid()}.tmp")
+        if tmp_root.exists():
+            shutil.rmtree(tmp_root)
+
+        dataset = cls(tmp_root)
+        dataset.manifest = _new_manifest()
+        dataset.write_batches(iter_bookings(csv_path, chunksize), source=file_fingerprint(csv_path)['blake2b'])
+
+        if root.exists():
+            shutil.rmtree(root)
+        os.replace(tmp_root, root)
+        return cls(root)
+
+    def write(self, df):
+        """
+        Añade las filas de `df` al dataset como una versión nueva: un fichero
+        nuevo por partición tocada, cuyos cubos (de agregados y diario) se
+        actualizan con esas filas.
+
+        Parámetros:
+        -----------
+        df : pd.DataFrame
+            Reservas derivadas (p.ej. de `derive_columns`).
+
+        Retorna:
+        --------
+        list
+            Particiones (hotel, año) que han recibido filas.
+        """
+        return self.write_batches([df])
+
+    def write_batches(self, chunks, source=None):
+        """
+        Añade varios bloques de reservas al dataset como una única versión.
+
+        Todo se prepara con nombres temporales: los Parquet de cada bloque y los
+        cubos de cada partición tocada, actualizados en memoria. Solo al final
+        se renombran los Parquet, se sustituyen los cubos y se escribe el
+        manifiesto con la versión nueva; si algo falla, se borran los
+        temporales y se restauran los cubos anteriores, de modo que el dataset
+        queda como estaba. Los lectores solo ven los ficheros de las versiones
+        del manifiesto, así que nunca ven un lote a medias.
+
+        Parámetros:
+        -----------
+        chunks : iterable
+            Bloques de reservas derivadas (p.ej. de `iter_bookings`).
+        source : str, opcional
+            Huella del fichero de origen, que se anota en el manifiesto para
+            no añadirlo dos veces (ver `append_csv`).
+
+        Retorna:
+        --------
+        list
+            Particiones (hotel, año) que han recibido filas.
+        """
+        manifest = copy.deepcopy(self.manifest) if self.manifest is not None else _new_manifest()
+        part_id = manifest['n_parts']
+        # Ficheros de una escritura interrumpida sin publicar: se borran para
+        # que la versión nueva no los incluya
+        for orphan in self.root.glob('hotel=*/arrival_date_year=*/part-*.parquet'):
+            if _part_version(orphan) >= part_id:
+                orphan.unlink()
+        suffix = f"{os.getpid()}.tmp"
+
+        staged = []     # (temporal, definitivo) de cada Parquet escrito
+        partitions = {}  # (hotel, año) -> [directorio, cubo, cubo diario]
+        try:
+            for seq, df in enumerate(chunks):
+                for (hotel, year), part in df.groupby(PARTITION_COLUMNS, observed=True, sort=True):
+                    path = _partition_dir(self.root, hotel, year)
+                    path.mkdir(parents=True, exist_ok=True)
+                    target = path / f"part-{part_id:06d}-{seq:05d}.parquet"
+                    tmp_path = target.with_name(f"{target.name}.{suffix}")
+                    staged.append((tmp_path, target))
+                    part.drop(columns=PARTITION_COLUMNS).to_parquet(tmp_path, index=False)
+
+                    key = (hotel, int(year))
+                    if key not in partitions:
+                        partitions[key] = [
+                            path,
+                            BookingsCube.read_tables(path / CUBE_DIR) or BookingsCube({}, []),
+                            DailyCube.read(path / DAILY_CUBE_FILE) or DailyCube.empty(),
+                        ]
+                    partitions[key][1].update(part)
+                    partitions[key][2].update(part)
+
+                # El manifiesto guarda el orden de columnas y los valores de los filtros
+                if not manifest['columns']:
+                    manifest['columns'] = list(df.columns)
+                    # Parquet no guarda fechas en segundos: se anota la unidad para restaurarla
+                    manifest['datetimes'] = {
+                        col: str(dtype) for col, dtype in df.dtypes.items() if pd.api.types.is_datetime64_dtype(dtype)
+                    }
+                values = manifest['values']
+                for col in FILTER_COLUMNS:
+                    if col in df.columns:
+                        new = {v.item() if hasattr(v, 'item') else v for v in df[col].dropna().unique()}
+                        values[col] = sorted(set(values.get(col, [])) | new)
+
+            for path, cube, daily in partitions.values():
+                cube.write_tables(path / f"{CUBE_DIR}.{suffix}")
+                daily.write(path / f"{DAILY_CUBE_FILE}.{suffix}")
+
+            manifest['n_parts'] = part_id + 1
+            if source is not None:
+                manifest['sources'] = manifest.get('sources', []) + [source]
+            self._publish(staged, [path for path, _, _ in partitions.values()], manifest, suffix)
+        finally:
+            # Temporales que no llegaron a publicarse (no queda ninguno si todo fue bien)
+            for tmp_path, _ in staged:
+                _remove(tmp_path)
+            for path, _, _ in partitions.values():
+                _remove(path / f"{CUBE_DIR}.{suffix}")
+                _remove(path / f"{DAILY_CUBE_FILE}.{suffix}")
+        return sorted(partitions)
+
+    def _publish(self, staged, paths, manifest, suffix):
+        # Paso final de `write_batches`: Parquet a su nombre, cubos nuevos en su
+        # sitio y manifiesto. Se anota cada cambio para deshacerlo si uno falla
+        published = []
+        replaced = []  # (cubo vigente, copia del anterior)
+        try:
+            for tmp_path, target in staged:
+                os.replace(tmp_path, target)
+                published.append(target)
+            for path in paths:
+                for name in (CUBE_DIR, DAILY_CUBE_FILE):
+                    current = path / name
+                    backup = path / f"{name}.{suffix}.old"
+                    _remove(backup)
+                    if current.exists():
+                        os.replace(current, backup)
+                    replaced.append((current, backup))
+                    os.replace(path / f"{name}.{suffix}", current)
+            self.manifest = manifest
+            self._write_manifest()
+        except BaseException:
+            for current, backup in reversed(replaced):
+                _remove(current)
+                if backup.exists():
+                    os.replace(backup, current)
+            for target in published:
+                _remove(target)
+            self.manifest = self._read_manifest()
+            raise
+        for _, backup in replaced:
+            _remove(backup)
+
+    def append_csv(self, csv_path, chunksize=STREAM_CHUNK_ROWS):
+        """
+        Añade al dataset un fichero de reservas nuevas (mismo formato que el CSV
+        procesado). Solo se derivan las filas nuevas y solo se reescriben los
+        cubos de las particiones que reciben reservas. El fichero entero es una
+        versión del dataset: si falla a medias, el dataset no cambia. Un fichero
+        con el mismo contenido que otro ya añadido se rechaza con ValueError.
+
+        Parámetros:
+        -----------
+        csv_path : str | Path
+            Fichero con las reservas nuevas.
+        chunksize : int
+            Número de filas por bloque de lectura.
+
+        Retorna:
+        --------
+        tuple
+            (número de reservas añadidas, particiones (hotel, año) tocadas)
+        """
+        source = file_fingerprint(csv_path)['blake2b']
+        if source in (self.manifest or {}).get('sources', []):
+            raise ValueError(f"{csv_path} ya se añadió al dataset")
+
+        n_rows = 0
+
+        def chunks():
+            nonlocal n_rows
+            for chunk in iter_bookings(csv_path, chunksize):
+                n_rows += len(chunk)
+                yield chunk
+
+        touched = self.write_batches(chunks(), source=source)
+        return n_rows, touched
+
+    def cube(self, filters=None):
+        """
+        Cubo de agregados de las particiones que toca un estado de filtros,
+        sumando los cubos guardados de cada partición (sin leer reservas).
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Estado de filtros (ver `partitions`).
+
+        Retorna:
+        --------
+        BookingsCube
+        """
+        cube = BookingsCube({}, [])
+        for path in self.partitions(filters):
+            part = BookingsCube.read_tables(path / CUBE_DIR, STREAM_DIMENSIONS)
+            if part is not None:
+                cube = cube.merge(part)
+        return cube
+
+    def daily_cube(self, filters=None):
+        """
+        Cubo diario de llegadas de las particiones que toca un estado de
+        filtros, sumando los guardados en cada partición (sin leer reservas).
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Estado de filtros (ver `partitions`).
+
+        Retorna:
+        --------
+        DailyCube
+        """
+        daily = DailyCube.empty()
+        for path in self.partitions(filters):
+            part = DailyCube.read(path / DAILY_CUBE_FILE)
+            if part is not None:
+                daily = daily.merge(part)
+        return daily
+
+    def partitions(self, filters=None):
+        """
+        Directorios de partición que puede tocar un estado de filtros.
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Diccionario columna -> valores aceptados (None = todos), el mismo
+            que recibe `BitmapIndex.select`.
+
+        Retorna:
+        --------
+        list
+            Rutas de las particiones seleccionadas.
+        """
+        filters = filters or {}
+        hotels = filters.get('hotel')
+        years = filters.get('arrival_date_year')
+        hotels = None if hotels is None else {str(h) for h in hotels}
+        years = None if years is None else {int(y) for y in years}
+
+        selected = []
+        for hotel_dir in sorted(self.root.glob('hotel=*')):
+            if hotels is not None and _partition_value(hotel_dir) not in hotels:
+                continue
+            for year_dir in sorted(hotel_dir.glob('arrival_date_year=*')):
+                if years is not None and int(_partition_value(year_dir)) not in years:
+                    continue
+                selected.append(year_dir)
+        return selected
+
+    def files(self, filters=None, since=0, until=None):
+        """
+        Ficheros Parquet de las particiones que toca un estado de filtros,
+        escritos por las versiones del dataset de [since, until) (por
+        defecto, todas las publicadas en el manifiesto).
+        """
+        if until is None:
+            until = self.version
+        return [
+            f for path in self.partitions(filters) for f in sorted(path.glob('part-*.parquet'))
+            if since <= _part_version(f) < until
+        ]
+
+    def read(self, filters=None, columns=None, since=0, until=None):
+        """
+        Lee las reservas de las particiones seleccionadas.
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Estado de filtros. Hotel y año podan directorios; el resto de
+            columnas de filtro se aplican como filtro de filas al leer.
+        columns : list, opcional
+            Columnas a leer. Por defecto, todas.
+        since, until : int, opcional
+            Solo las reservas añadidas por las versiones del dataset de
+            [since, until), p.ej. los lotes añadidos desde la última lectura.
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Reservas con el mismo esquema que `load_bookings`.
+        """
+        filters = filters or {}
+        row_filters = [
+            (col, 'in', list(values)) for col, values in filters.items()
+            if values is not None and col not in PARTITION_COLUMNS and col in self.keys
+        ]
+        file_columns = None if columns is None else [c for c in columns if c not in PARTITION_COLUMNS]
+
+        frames = []
+        paths = self.files(filters, since, until)
+        for path in paths:
+            part = pd.read_parquet(path, columns=file_columns, filters=row_filters or None)
+            part['hotel'] = _partition_value(path.parent.parent)
+            part['arrival_date_year'] = int(_partition_value(path.parent))
+            frames.append(part)
+        if not frames:
+            # Selección vacía: se devuelve un DataFrame sin filas con el esquema del dataset
+            empty_from = self.files()[:1]
+            part = pd.read_parquet(empty_from[0], columns=file_columns).iloc[0:0] if empty_from else pd.DataFrame()
+            part['hotel'] = pd.Series(dtype='object')
+            part['arrival_date_year'] = pd.Series(dtype='int16')
+            frames.append(part)
+
+        # Las categorías de cada fichero difieren: se recalculan tras concatenar
+        df = pd.concat(frames, ignore_index=True)
+        order = [c for c in self.manifest['columns'] if c in df.columns]
+        df = apply_schema(df[order])
+        datetimes = {col: dtype for col, dtype in self.manifest.get('datetimes', {}).items() if col in df.columns}
+        return apply_schema(df.astype(datetimes), DERIVED_SCHEMA)
+
+    def _read_manifest(self):
+        try:
+            with open(self.root / MANIFEST_NAME, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        target = self.root / MANIFEST_NAME
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, target)
+
+
+class IncrementalView:
+    """
+    Estructura derivada de las reservas del dataset (un índice o un resumen
+    mergeable) que se mantiene al día con los lotes añadidos: en cada versión
+    nueva solo se leen los ficheros escritos desde la anterior, y su
+    estructura se suma a la existente con `merge`. Si el dataset se ha vuelto
+    a importar (su versión baja), se reconstruye entera.
+
+    Parámetros:
+    -----------
+    dataset : PartitionedBookings
+        Dataset de origen (se relee con `refresh`).
+    build : callable
+        Construye la estructura a partir de un DataFrame de reservas.
+    columns : list
+        Columnas que necesita `build`.
+    """
+
+    def __init__(self, dataset, build, columns):
+        self.dataset = dataset
+        self.build = build
+        self.columns = list(columns)
+        self.version = 0
+        self.value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Estructura al día con la versión actual del dataset."""
+        with self._lock:
+            version = self.dataset.version
+            if self.value is None or version < self.version:
+                self.value = self.build(self.dataset.read(columns=self.columns, until=version))
+            elif version > self.version and self.dataset.files(since=self.version, until=version):
+                added = self.dataset.read(columns=self.columns, since=self.version, until=version)
+                self.value = self.value.merge(self.build(added))
+            self.version = version
+            return self.value
+
+
+def open_partitioned_bookings(csv_path, root):
+    """
+    Abre el dataset particionado, importándolo antes desde el CSV si todavía
+    no existe o se creó con otra versión de las columnas derivadas.
+
+    Parámetros:
+    -----------
+    csv_path : str | Path
+        CSV procesado de reservas usado para la importación inicial.
+    root : str | Path
+        Directorio raíz del dataset.
+
+    Retorna:
+    --------
+    PartitionedBookings
+    """
+    dataset = PartitionedBookings(root)
+    if not dataset.exists:
+        dataset = PartitionedBookings.from_csv(csv_path, root)
+    return dataset
+
+
+if __name__ == '__main__':
+    # Uso: python -m utils.partitioned_store reservas_nuevas.csv [--dataset RUTA]
+    parser = argparse.ArgumentParser(description="Añade reservas nuevas al dataset particionado.")
+    parser.add_argument('delta', help="CSV con las reservas nuevas")
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH, help="Directorio raíz del dataset")
+    args = parser.parse_args()
+
+    dataset = PartitionedBookings(args.dataset)
+    if not dataset.exists:
+        parser.error(f"No existe un dataset válido en {args.dataset}")
+    try:
+        n_rows, touched = dataset.append_csv(args.delta)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{n_rows:,} reservas añadidas en {len(touched)} particiones:")
+    for hotel, year in touched:
+        print(f"  hotel={hotel}/arrival_date_year={year}")
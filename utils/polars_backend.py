@@ -0,0 +1,283 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.binning import ADR_BINS, ADR_LABELS, LEAD_TIME_BINS, LEAD_TIME_LABELS
+from utils.bookings import CSV_NULL_STRINGS, FILTER_COLUMNS, MONTH_MAP, SEASON_MAP
+from utils.date_dimension import year_month_labels
+from utils.olap_cube import (
+    CUBE_MEASURES, ENGINE_SUMS, ORDERED_DIMENSIONS, STREAM_DIMENSIONS, _dimension_columns, complete_categories,
+)
+
+try:
+    import polars as pl
+    POLARS_DISPONIBLE = True
+except ImportError:
+    pl = None
+    POLARS_DISPONIBLE = False
+########################################
+
+
+def _bins(values, edges, labels):
+    # Tramos (a, b] como `pd.cut`; fuera de rango queda nulo y un límite infinito deja el último tramo abierto
+    expr = pl.when(values <= edges[0]).then(None)
+    for upper, label in zip(edges[1:], labels):
+        expr = expr.when(values <= upper).then(pl.lit(label))
+    return expr.otherwise(None)
+
+
+def _derived_expressions():
+    # Columnas derivadas como expresiones de Polars: nombre -> (columnas necesarias, expresión).
+    # Reproducen `derive_columns` y las dimensiones derivadas del cubo.
+    month = pl.col('arrival_date_month')
+    return {
+        'month_num': (('arrival_date_month',), month.replace_strict(MONTH_MAP, default=None, return_dtype=pl.Int8)),
+        'total_nights': (('stays_in_weekend_nights', 'stays_in_week_nights'),
+                         pl.col('stays_in_weekend_nights') + pl.col('stays_in_week_nights')),
+        'total_guests': (('adults', 'children', 'babies'),
+                         (pl.col('adults') + pl.col('children') + pl.col('babies')).cast(pl.Int32)),
+        'season': (('arrival_date_month',), month.replace_strict(SEASON_MAP, default=None, return_dtype=pl.String)),
+        'lead_time_category': (('lead_time',), _bins(pl.col('lead_time'), LEAD_TIME_BINS, LEAD_TIME_LABELS)),
+        # `adr` en float32, igual que el esquema compacto de pandas
+        'adr_bin': (('adr',), _bins(pl.col('adr').cast(pl.Float32), ADR_BINS, ADR_LABELS)),
+    }
+
+
+def _measure_expressions(columns):
+    # Medidas de `CUBE_MEASURES` como agregaciones de Polars
+    measures = {}
+    for name, (col, agg) in CUBE_MEASURES.items():
+        if col not in columns:
+            continue
+        if agg == 'size':
+            measures[name] = pl.len().cast(pl.Int64)
+        elif col == 'adr':
+            measures[name] = pl.col('adr').cast(pl.Float32).cast(pl.Float64).sum()
+        else:
+            measures[name] = pl.col(col).sum().cast(pl.Int64)
+    return measures
+
+
+class PolarsBookings:
+    """
+    Reservas en un LazyFrame de Polars, con las columnas derivadas como
+    expresiones.
+
+    Ofrece la misma interfaz que `BookingsCube` (`slice`, `totals`, `compute`,
+    `values`, `keys` y `tables`). Cada consulta es un plan perezoso (filtro del
+    sidebar + group_by + agregados) que el optimizador de Polars fusiona y
+    ejecuta en paralelo, sin DataFrames intermedios. Un CSV se lee una sola vez
+    a memoria (columnar, de Arrow) junto con sus columnas derivadas, y las
+    consultas parten de ese DataFrame sin volver a analizar el fichero; un
+    Parquet se consulta directamente con filtro y proyección empujados a la
+    lectura.
+
+    Parámetros:
+    -----------
+    source : str | Path
+        CSV procesado de reservas o fichero Parquet con las mismas columnas.
+    dimensions : list
+        Dimensiones de análisis que se podrán consultar con `slice`.
+    keys : list
+        Columnas de filtro.
+    """
+
+    def __init__(self, source, dimensions=STREAM_DIMENSIONS, keys=FILTER_COLUMNS):
+        if not POLARS_DISPONIBLE:
+            raise ImportError("El backend Polars necesita el paquete `polars` (pip install polars)")
+
+        source = Path(source)
+        in_memory = source.suffix.lower() != '.parquet'
+        if in_memory:
+            frame = pl.read_csv(source, null_values=CSV_NULL_STRINGS).lazy()
+        else:
+            frame = pl.scan_parquet(source)
+
+        columns = frame.collect_schema().names()
+        derived = {
+            name: expr.alias(name) for name, (sources, expr) in _derived_expressions().items()
+            if name not in columns and all(col in columns for col in sources)
+        }
+        frame = frame.with_columns(*derived.values())
+        columns += list(derived)
+        if 'year_month' not in columns and {'arrival_date_year', 'month_num'} <= set(columns):
+            # Clave entera de `year_month_keys`; la etiqueta se pone al resultado agrupado
+            year_month = pl.col('arrival_date_year').cast(pl.Int32) * 12 + pl.col('month_num').cast(pl.Int32) - 1
+            frame = frame.with_columns(year_month.alias('year_month'))
+            columns.append('year_month')
+        if in_memory:
+            # Las columnas derivadas se calculan una vez, no en cada consulta
+            frame = frame.collect().lazy()
+
+        self.frame = frame
+        self.columns = columns
+        self.keys = [k for k in keys if k in columns]
+        self.tables = [dim for dim in dimensions if all(col in columns for col in _dimension_columns(dim))]
+        self.measures = _measure_expressions(columns)
+
+    def _filtered(self, filters, not_null=()):
+        predicates = [pl.col(col).is_not_null() for col in not_null]
+        for col, values in (filters or {}).items():
+            if values is None or col not in self.keys:
+                continue
+            predicates.append(pl.col(col).is_in([v.item() if hasattr(v, 'item') else v for v in values]))
+        return self.frame.filter(*predicates) if predicates else self.frame
+
+    def _aggregate(self, by, measures, filters):
+        # filter -> group_by -> agg -> sort en un único plan perezoso
+        query = self._filtered(filters, not_null=by)
+        if by:
+            query = query.group_by(by).agg(**measures).sort(by)
+        else:
+            query = query.select(**measures)
+        result = query.collect().to_pandas()
+        if 'year_month' in by:
+            result['year_month'] = year_month_labels(result['year_month'])
+        for col in by:
+            if col in ORDERED_DIMENSIONS:
+                result[col] = pd.Categorical(result[col], categories=ORDERED_DIMENSIONS[col], ordered=True)
+        if any(col in ORDERED_DIMENSIONS for col in by):
+            result = result.sort_values(list(by), ignore_index=True)
+        return result
+
+    def slice(self, dimension, filters=None, keep=(), drop_empty=False):
+        """
+        Medidas de `CUBE_MEASURES` por valor de la dimensión para el estado de
+        filtros, con la misma forma que `BookingsCube.slice`.
+        """
+        by = list(dict.fromkeys(list(keep) + _dimension_columns(dimension)))
+        result = self._aggregate(by, self.measures, filters)
+        return result if drop_empty else complete_categories(result, dimension, keep)
+
+    def totals(self, filters=None):
+        """Medidas totales para el estado de filtros (sin desglosar por dimensión)."""
+        return self._aggregate([], self.measures, filters).iloc[0]
+
+    def values(self, key):
+        """Valores distintos (ordenados) de una clave de filtro."""
+        return self.frame.select(pl.col(key).drop_nulls().unique().sort()).collect()[key].to_list()
+
+    def supports(self, metric):
+        """Indica si las columnas de un `Metric` de `utils.aggregation` existen en el LazyFrame."""
+        return all(c in self.columns for c in metric.by) and all(v in ENGINE_SUMS for v in metric.values)
+
+    def compute(self, filters, metrics):
+        """
+        Resuelve los agregados de página con un plan perezoso por agregado, con
+        la misma forma que `AggregationEngine.compute` (columnas de `by`,
+        `count` y `<valor>_sum`).
+
+        Parámetros:
+        -----------
+        filters : dict
+            Estado de filtros (ver `BookingsCube.slice`).
+        metrics : list
+            Lista de `Metric`. Los agregados no soportados se omiten.
+
+        Retorna:
+        --------
+        dict
+            Diccionario nombre -> pd.DataFrame.
+        """
+        bundle = {}
+        for metric in metrics:
+            if not self.supports(metric):
+                continue
+            measures = {'count': self.measures['count']}
+            measures.update({f'{v}_sum': self.measures[ENGINE_SUMS[v]] for v in metric.values})
+            bundle[metric.name] = self._aggregate(list(metric.by), measures, filters)
+        return bundle
+
+
+def compare_with_pandas(backend, cube, filters_list, metrics=()):
+    """
+    Compara un backend alternativo con el cubo de pandas, dimensión a dimensión
+    y agregado a agregado, para una lista de estados de filtros.
+
+    Los recuentos deben coincidir exactamente; las sumas de `adr`, con la
+    tolerancia del orden de suma en coma flotante.
+
+    Parámetros:
+    -----------
+    backend : PolarsBookings | SQLBookings
+        Backend a validar.
+    cube : BookingsCube
+        Cubo construido con la ruta pandas (`BookingsCube.build(load_bookings(...))`).
+    filters_list : list
+        Estados de filtros a comparar.
+    metrics : list
+        `Metric` de página a comparar además de las dimensiones.
+
+    Retorna:
+    --------
+    list
+        Descripción de las diferencias encontradas (vacía si todo coincide).
+    """
+    differences = []
+
+    def same(name, expected, got):
+        expected = expected.reset_index(drop=True)
+        got = got.reset_index(drop=True)
+        if list(expected.columns) != list(got.columns) or len(expected) != len(got):
+            differences.append(f"{name}: forma {expected.shape} != {got.shape}")
+            return
+        for col in expected.columns:
+            a, b = expected[col], got[col]
+            if pd.api.types.is_float_dtype(a) or pd.api.types.is_float_dtype(b):
+                ok = np.allclose(a.to_numpy(dtype='float64'), b.to_numpy(dtype='float64'), rtol=1e-9, equal_nan=True)
+            else:
+                ok = a.astype(str).tolist() == b.astype(str).tolist()
+            if not ok:
+                differences.append(f"{name}: columna '{col}' distinta")
+
+    for filters in filters_list:
+        for dim in cube.tables:
+            if dim in backend.tables:
+                same(f"{dim} {filters}", cube.slice(dim, filters), backend.slice(dim, filters))
+        expected = cube.compute(filters, metrics)
+        got = backend.compute(filters, metrics)
+        for name in expected:
+            same(f"{name} {filters}", expected[name], got[name])
+    return differences
+
+
+if __name__ == '__main__':
+    # Validación y comparativa con la ruta pandas: python -m utils.polars_backend [CSV]
+    from utils.aggregation import Metric
+    from utils.bookings import load_bookings
+    from utils.olap_cube import BookingsCube
+
+    default_csv = Path(__file__).resolve().parents[1] / "1. Datos" / "hotel_bookings_processed.csv"
+    parser = argparse.ArgumentParser(description="Valida el backend Polars contra el cubo de pandas.")
+    parser.add_argument('csv', nargs='?', default=default_csv, help="CSV procesado de reservas")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    backend = PolarsBookings(args.csv)
+    print(f"Polars: carga {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    cube = BookingsCube.build(load_bookings(args.csv), STREAM_DIMENSIONS)
+    print(f"pandas: carga y cubo {time.perf_counter() - start:.2f}s")
+
+    years = cube.values('arrival_date_year')
+    filters_list = [{}] + [
+        {'hotel': [hotel], 'arrival_date_year': range(years[0] + 1, years[-1] + 1), 'customer_type': None}
+        for hotel in cube.values('hotel')
+    ]
+    metrics = [
+        Metric('totales', values=('is_canceled', 'adr', 'lead_time', 'total_nights')),
+        Metric('mensual', by=('year_month', 'hotel')),
+        Metric('lead_noches', by=('lead_time_category', 'total_nights')),
+    ]
+    start = time.perf_counter()
+    differences = compare_with_pandas(backend, cube, filters_list, metrics)
+    print(f"Comparación: {time.perf_counter() - start:.2f}s, {len(differences)} diferencias")
+    for difference in differences:
+        print(f"  {difference}")
+    sys.exit(1 if differences else 0)
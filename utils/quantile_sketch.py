@@ -0,0 +1,292 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import numpy as np
+import pandas as pd
+
+from utils.bookings import FILTER_COLUMNS, STREAM_CHUNK_ROWS, derive_columns, read_bookings_csv
+########################################
+
+# Columnas numéricas con resumen de cuantiles
+QUANTILE_COLUMNS = ['adr', 'lead_time', 'total_nights']
+
+# Celdas de los resúmenes: las columnas de filtro más el segmento de mercado
+QUANTILE_KEYS = FILTER_COLUMNS + ['market_segment']
+
+# Columnas del CSV necesarias para construir los resúmenes (las noches se derivan)
+QUANTILE_SOURCE_COLUMNS = ['adr', 'lead_time', 'stays_in_weekend_nights', 'stays_in_week_nights', 'market_segment']
+
+# Tamaño del nivel superior de cada resumen: con menos valores el resumen es exacto
+KLL_K = 256
+
+# Decrecimiento de la capacidad de los niveles inferiores
+KLL_DECAY = 2 / 3
+
+# Cuantiles del resumen de distribución
+SUMMARY_QUANTILES = {'p25': 0.25, 'median': 0.5, 'p75': 0.75, 'p90': 0.9, 'p99': 0.99}
+
+# Cuantil por encima del cual un valor se trata como atípico (como en el EDA en R)
+OUTLIER_QUANTILE = 0.999
+
+
+class KLLSketch:
+    """
+    Resumen KLL de cuantiles: mergeable y de tamaño O(k log(n/k)).
+
+    Los valores se guardan en niveles; un valor del nivel h representa 2^h
+    valores. Cuando un nivel supera su capacidad se ordena y sube uno de cada
+    dos valores al nivel siguiente (alternando el primero, en lugar de al
+    azar, para que el resultado sea reproducible). Cada compactación del nivel
+    h desplaza como mucho 2^h posiciones el rango de cualquier valor, así que
+    su suma (`rank_error`) acota el error de rango de todas las consultas.
+    Mientras no hay compactaciones el resumen es exacto.
+
+    Parámetros:
+    -----------
+    k : int
+        Capacidad del nivel superior.
+    """
+
+    def __init__(self, k=KLL_K):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.nan
+        self.max = np.nan
+        self.rank_error = 0
+        self._offset = 0
+
+    @classmethod
+    def from_values(cls, values, k=KLL_K):
+        """Resumen de un array de valores (los NaN se ignoran)."""
+        return cls(k).update(values)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * KLL_DECAY ** depth)), 2)
+
+    def update(self, values):
+        """Añade valores al resumen y devuelve el propio resumen."""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.n += len(values)
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+        self._compress()
+        return self
+
+    def _compress(self):
+        # Compacta el nivel más bajo que supera su capacidad hasta que el total cabe
+        while sum(map(len, self.levels)) > sum(self._capacity(h) for h in range(len(self.levels))):
+            level = next(h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h))
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            # Con un número impar de valores, el menor se queda en su nivel
+            odd = len(items) % 2
+            self.levels[level] = items[:odd]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[odd + self._offset::2]])
+            self._offset ^= 1
+            self.rank_error += 2 ** level
+
+    def merge(self, other):
+        """
+        Suma dos resúmenes (de valores disjuntos).
+
+        Retorna:
+        --------
+        KLLSketch
+            Nuevo resumen con la mayor `k` de ambos.
+        """
+        merged = KLLSketch(max(self.k, other.k))
+        depth = max(len(self.levels), len(other.levels))
+        merged.levels = [
+            np.concatenate([sketch.levels[h] for sketch in (self, other) if h < len(sketch.levels)])
+            for h in range(depth)
+        ]
+        merged.n = self.n + other.n
+        merged.min = np.fmin(self.min, other.min)
+        merged.max = np.fmax(self.max, other.max)
+        merged.rank_error = self.rank_error + other.rank_error
+        merged._compress()
+        return merged
+
+    def quantiles(self, qs):
+        """
+        Cuantiles aproximados, con la interpolación lineal de `np.quantile`
+        sobre la muestra ponderada (exactos si no hubo compactaciones).
+
+        Parámetros:
+        -----------
+        qs : array-like
+            Cuantiles en [0, 1].
+
+        Retorna:
+        --------
+        np.ndarray
+            Un valor por cuantil (NaN si el resumen está vacío).
+        """
+        qs = np.asarray(qs, dtype='float64')
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, ends = items[order], np.cumsum(weights[order])
+        # Posición (0..W-1) de cada cuantil; el valor de la posición r es el primero con fin > r
+        ranks = qs * (ends[-1] - 1)
+        below = items[np.searchsorted(ends, np.floor(ranks), side='right')]
+        above = items[np.minimum(np.searchsorted(ends, np.ceil(ranks), side='right'), len(items) - 1)]
+        values = below + (above - below) * (ranks - np.floor(ranks))
+        # Los extremos son exactos
+        values = np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, values))
+        return values
+
+    def quantile(self, q):
+        """Un cuantil aproximado (ver `quantiles`)."""
+        return float(self.quantiles([q])[0])
+
+    @property
+    def exact(self):
+        return self.rank_error == 0
+
+    @property
+    def relative_error(self):
+        """Cota del error de rango como fracción de `n`."""
+        return self.rank_error / self.n if self.n else 0.0
+
+
+class QuantileSketches:
+    """
+    Resúmenes KLL de `QUANTILE_COLUMNS` por celda de `QUANTILE_KEYS`.
+
+    Medianas, percentiles, topes de atípicos y cajas de cualquier estado de
+    filtros salen de sumar los resúmenes de las celdas seleccionadas, sin
+    ordenar la columna filtrada.
+
+    Parámetros:
+    -----------
+    sketches : dict
+        Columna -> {celda (tupla de valores de `keys`) -> KLLSketch}.
+    keys : list
+        Columnas que definen las celdas.
+    k : int
+        Capacidad de los resúmenes.
+    """
+
+    def __init__(self, sketches, keys=QUANTILE_KEYS, k=KLL_K):
+        self.sketches = sketches
+        self.keys = list(keys)
+        self.k = k
+
+    @classmethod
+    def build(cls, df, columns=QUANTILE_COLUMNS, keys=QUANTILE_KEYS, k=KLL_K):
+        """Resúmenes de un DataFrame de reservas: uno por (celda, columna)."""
+        keys = [key for key in keys if key in df.columns]
+        cells = pd.MultiIndex.from_frame(df[keys].reset_index(drop=True))
+        codes, uniques = cells.factorize(sort=True)
+        # Filas ordenadas por celda (las de claves nulas, código -1, se descartan)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(-1, len(uniques)) + 1)
+        sketches = {}
+        for column in columns:
+            if column not in df.columns:
+                continue
+            values = df[column].to_numpy(dtype='float64', na_value=np.nan)[order]
+            sketches[column] = {
+                tuple(cell): KLLSketch.from_values(values[bounds[i]:bounds[i + 1]], k)
+                for i, cell in enumerate(uniques)
+            }
+        return cls(sketches, keys, k)
+
+    @classmethod
+    def from_chunks(cls, chunks, columns=QUANTILE_COLUMNS, keys=QUANTILE_KEYS, k=KLL_K):
+        """Construye los resúmenes plegando bloques de reservas (p.ej. de `iter_bookings`)."""
+        result = cls({column: {} for column in columns}, keys, k)
+        for chunk in chunks:
+            result = result.merge(cls.build(chunk, columns, keys, k))
+        return result
+
+    @classmethod
+    def from_csv(cls, csv_path, chunksize=STREAM_CHUNK_ROWS, keys=QUANTILE_KEYS):
+        """Construye los resúmenes recorriendo el CSV por bloques, solo con las columnas necesarias."""
+        columns = set(QUANTILE_SOURCE_COLUMNS) | set(keys) | {'arrival_date_month', 'arrival_date_day_of_month'}
+        with read_bookings_csv(csv_path, chunksize=chunksize, usecols=lambda col: col in columns) as reader:
+            return cls.from_chunks((derive_columns(chunk) for chunk in reader), keys=keys)
+
+    def merge(self, other):
+        """Suma celda a celda los resúmenes de otro `QuantileSketches` (de reservas disjuntas)."""
+        sketches = {}
+        for column in set(self.sketches) | set(other.sketches):
+            cells = dict(self.sketches.get(column, {}))
+            for cell, sketch in other.sketches.get(column, {}).items():
+                cells[cell] = cells[cell].merge(sketch) if cell in cells else sketch
+            sketches[column] = cells
+        return QuantileSketches(sketches, self.keys or other.keys, max(self.k, other.k))
+
+    def _groups(self, column, filters, by):
+        # Celdas seleccionadas agrupadas por el valor de `by` (una sola clave None sin `by`)
+        position = self.keys.index(by) if by is not None else None
+        groups = {}
+        for cell, sketch in self.sketches.get(column, {}).items():
+            if any(
+                (filters or {}).get(key) is not None and value not in list(filters[key])
+                for key, value in zip(self.keys, cell)
+            ):
+                continue
+            group = cell[position] if position is not None else None
+            groups[group] = groups[group].merge(sketch) if group in groups else sketch
+        return groups
+
+    def sketch(self, column, filters=None):
+        """Resumen de `column` para el estado de filtros (suma de las celdas seleccionadas)."""
+        return self._groups(column, filters, None).get(None, KLLSketch(self.k))
+
+    def quantiles(self, column, qs, filters=None):
+        """Cuantiles de `column` para el estado de filtros, como Serie indexada por cuantil."""
+        return pd.Series(self.sketch(column, filters).quantiles(qs), index=list(qs), name=column)
+
+    def summary(self, column, filters=None, by=None):
+        """
+        Resumen de distribución de `column` por grupo, listo para diagramas de
+        caja.
+
+        Parámetros:
+        -----------
+        column : str
+            Columna de `QUANTILE_COLUMNS`.
+        filters : dict, opcional
+            Estado de filtros (columnas de `keys`).
+        by : str, opcional
+            Columna de `keys` por la que agrupar.
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Una fila por grupo con `by` (si se indica), `count`, `min`, los
+            cuantiles de `SUMMARY_QUANTILES`, `max`, `cap` (tope de atípicos,
+            cuantil `OUTLIER_QUANTILE`), `lowerfence` y `upperfence` (bigotes
+            de 1,5 veces el rango intercuartílico, dentro de [min, cap]) y
+            `rank_error` (cota relativa del error de rango).
+        """
+        qs = list(SUMMARY_QUANTILES.values()) + [OUTLIER_QUANTILE]
+        rows = []
+        for group, sketch in sorted(self._groups(column, filters, by).items(), key=lambda item: str(item[0])):
+            if sketch.n == 0:
+                continue
+            values = sketch.quantiles(qs)
+            row = {by: group} if by is not None else {}
+            row.update({'count': sketch.n, 'min': sketch.min})
+            row.update(dict(zip(SUMMARY_QUANTILES, values[:-1])))
+            row.update({'max': sketch.max, 'cap': values[-1]})
+            iqr = row['p75'] - row['p25']
+            row['lowerfence'] = max(row['p25'] - 1.5 * iqr, sketch.min)
+            row['upperfence'] = min(row['p75'] + 1.5 * iqr, row['cap'])
+            row['rank_error'] = sketch.relative_error
+            rows.append(row)
+        columns = ([by] if by is not None else []) + [
+            'count', 'min', *SUMMARY_QUANTILES, 'max', 'cap', 'lowerfence', 'upperfence', 'rank_error'
+        ]
+        return pd.DataFrame(rows, columns=columns)
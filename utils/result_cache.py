@@ -0,0 +1,202 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+########################################
+
+# Marca de "sin valor" para distinguir una entrada ausente de un resultado None
+_MISSING = object()
+
+
+def estimate_size(value):
+    """
+    Estimación aproximada (bytes) de la memoria que ocupa un resultado cacheado.
+
+    Parámetros:
+    -----------
+    value : object
+        DataFrame, Series, array, figura de Plotly, objeto con atributos o
+        contenedor de ellos.
+
+    Retorna:
+    --------
+    int
+        Tamaño estimado en bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if hasattr(value, 'to_json'):
+        # Figuras de Plotly: su tamaño serializado es una buena cota del objeto
+        try:
+            return len(value.to_json())
+        except Exception:
+            pass
+    if hasattr(value, '__dict__'):
+        # Objetos propios (p.ej. un BookingsCube): se suman sus atributos
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Caché acotada de resultados por estado de filtros (agregados y figuras).
+
+    Las entradas se expulsan por antigüedad de uso (LRU) cuando se supera el
+    número máximo de entradas o el presupuesto de memoria, y caducan tras
+    `ttl` segundos. Es segura entre hilos, por lo que una única instancia puede
+    compartirse entre todas las sesiones de Streamlit del proceso: si varias
+    sesiones piden a la vez una clave que falta, solo una la calcula y las
+    demás esperan su resultado.
+
+    Parámetros:
+    -----------
+    max_entries : int
+        Número máximo de entradas.
+    max_bytes : int
+        Presupuesto de memoria (estimada) para el total de entradas.
+    ttl : float | None
+        Segundos de vida de cada entrada. None = sin caducidad.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Claves en cálculo -> lock que retiene quien las calcula
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bytes = 0
+
+    def _lookup(self, key):
+        # Valor vigente de `key` (marcado como usado) o _MISSING; con el lock tomado
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, size, created = entry
+        if self.ttl is not None and time.monotonic() - created > self.ttl:
+            self._remove(key)
+            self.expirations += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        """Devuelve el valor de `key` (y lo marca como usado) o `default`."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Guarda `value` en `key` y expulsa entradas LRU hasta cumplir los límites."""
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Un resultado mayor que todo el presupuesto no se cachea
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Devuelve el valor cacheado de `key` o lo calcula con `compute()` y lo guarda.
+
+        Cada clave que falta se calcula una sola vez: el primer hilo toma un lock
+        propio de la clave mientras ejecuta `compute()`, y los que la piden
+        entretanto esperan a ese lock y leen el resultado ya guardado.
+
+        Parámetros:
+        -----------
+        key : hashable
+            Clave; normalmente (estado de filtros, nombre del resultado).
+        compute : callable
+            Función sin argumentos que calcula el resultado.
+
+        Retorna:
+        --------
+        object
+            Resultado cacheado o recién calculado.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            in_flight = self._in_flight.setdefault(key, threading.Lock())
+
+        with in_flight:
+            # Otro hilo pudo terminar el cálculo mientras se esperaba el lock
+            with self._lock:
+                value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            try:
+                value = compute()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    if self._in_flight.get(key) is in_flight:
+                        del self._in_flight[key]
+        return value
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        """Vacía la caché y reinicia los contadores."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        """
+        Métricas de uso de la caché.
+
+        Retorna:
+        --------
+        dict
+            Aciertos, fallos, tasa de acierto, expulsiones, caducadas, número de
+            entradas y memoria estimada usada / presupuesto (bytes).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
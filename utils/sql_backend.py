@@ -0,0 +1,262 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from utils.binning import ADR_BINS, ADR_LABELS, LEAD_TIME_BINS, LEAD_TIME_LABELS
+from utils.bookings import CSV_NULL_STRINGS, FILTER_COLUMNS, MONTH_MAP, SEASON_MAP, default_cache_dir
+from utils.date_dimension import year_month_labels
+from utils.olap_cube import (
+    CUBE_MEASURES, ENGINE_SUMS, ORDERED_DIMENSIONS, STREAM_DIMENSIONS, _dimension_columns, complete_categories,
+)
+
+try:
+    import duckdb
+    DUCKDB_DISPONIBLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_DISPONIBLE = False
+########################################
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(path):
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def _case(column, mapping):
+    whens = ' '.join(f"WHEN '{k}' THEN {v!r}" for k, v in mapping.items())
+    return f"CASE {_quote(column)} {whens} END"
+
+
+def _bins(column, edges, labels):
+    # Tramos (a, b] como `pd.cut`; un límite superior infinito deja el último tramo abierto
+    whens = [f"WHEN {_quote(column)} <= {edges[0]} THEN NULL"]
+    whens += [
+        f"WHEN {_quote(column)} <= {upper} THEN '{label}'" if upper != float('inf') else f"ELSE '{label}'"
+        for upper, label in zip(edges[1:], labels)
+    ]
+    return f"CASE {' '.join(whens)} END"
+
+
+# Columnas derivadas expresadas en SQL: nombre -> (columnas necesarias, expresión).
+# Reproducen `derive_columns` y las dimensiones derivadas del cubo.
+DERIVED_SQL = {
+    'month_num': (('arrival_date_month',), _case('arrival_date_month', MONTH_MAP)),
+    'total_nights': (('stays_in_weekend_nights', 'stays_in_week_nights'),
+                     '"stays_in_weekend_nights" + "stays_in_week_nights"'),
+    'total_guests': (('adults', 'children', 'babies'),
+                     'CAST("adults" + "children" + "babies" AS INTEGER)'),
+    'season': (('arrival_date_month',), _case('arrival_date_month', SEASON_MAP)),
+    'lead_time_category': (('lead_time',), _bins('lead_time', LEAD_TIME_BINS, LEAD_TIME_LABELS)),
+    'adr_bin': (('adr',), _bins('adr', ADR_BINS, ADR_LABELS)),
+}
+
+# `year_month` depende de `month_num`, así que se calcula sobre la vista derivada.
+# Es la clave entera de `year_month_keys`; la etiqueta se pone al resultado agrupado
+YEAR_MONTH_SQL = '"arrival_date_year" * 12 + "month_num" - 1'
+
+
+class SQLBookings:
+    """
+    Reservas registradas en una base de datos DuckDB embebida (en el proceso).
+
+    Ofrece la misma interfaz que `BookingsCube` (`slice`, `totals`, `compute`,
+    `values`, `keys` y `tables`), pero cada consulta se traduce a SQL: los
+    filtros del sidebar van al WHERE y los agregados al GROUP BY, de modo que
+    DuckDB los ejecuta vectorizados y en varios núcleos, y la aplicación solo
+    recibe las tablas resultado. Un CSV se carga una vez en una tabla columnar
+    de DuckDB (que vuelca a disco si no cabe en memoria); un Parquet se consulta
+    directamente.
+
+    Parámetros:
+    -----------
+    source : str | Path
+        CSV procesado de reservas o fichero Parquet con las mismas columnas.
+    dimensions : list
+        Dimensiones de análisis que se podrán consultar con `slice`.
+    keys : list
+        Columnas de filtro.
+    memory_limit : str, opcional
+        Memoria máxima de DuckDB (p.ej. '2GB'). Por defecto, la de DuckDB.
+    """
+
+    def __init__(self, source, dimensions=STREAM_DIMENSIONS, keys=FILTER_COLUMNS, memory_limit=None):
+        if not DUCKDB_DISPONIBLE:
+            raise ImportError("El backend SQL necesita el paquete `duckdb` (pip install duckdb)")
+
+        source = Path(source)
+        config = {'temp_directory': str(default_cache_dir(source) / 'duckdb')}
+        if memory_limit is not None:
+            config['memory_limit'] = memory_limit
+        self._con = duckdb.connect(':memory:', config=config)
+
+        if source.suffix.lower() == '.parquet':
+            self._con.execute(f"CREATE VIEW raw_bookings AS SELECT * FROM read_parquet({_literal(source)})")
+        else:
+            self._con.execute(
+                f"CREATE TABLE raw_bookings AS SELECT * FROM read_csv({_literal(source)}, header = true, "
+                f"nullstr = {CSV_NULL_STRINGS!r})"
+            )
+
+        # Vista con las columnas derivadas que falten en el fichero
+        columns = [row[0] for row in self._con.execute("DESCRIBE raw_bookings").fetchall()]
+        derived = {
+            name: expr for name, (sources, expr) in DERIVED_SQL.items()
+            if name not in columns and all(col in columns for col in sources)
+        }
+        select = ', '.join(['*'] + [f"{expr} AS {_quote(name)}" for name, expr in derived.items()])
+        self._con.execute(f"CREATE VIEW derived_bookings AS SELECT {select} FROM raw_bookings")
+        columns += list(derived)
+        if 'year_month' not in columns and {'arrival_date_year', 'month_num'} <= set(columns):
+            self._con.execute(f"CREATE VIEW bookings AS SELECT *, {YEAR_MONTH_SQL} AS year_month FROM derived_bookings")
+            columns.append('year_month')
+        else:
+            self._con.execute("CREATE VIEW bookings AS SELECT * FROM derived_bookings")
+
+        self.columns = columns
+        self.keys = [k for k in keys if k in columns]
+        self.tables = [dim for dim in dimensions if all(col in columns for col in _dimension_columns(dim))]
+        self.measures = {name: spec for name, spec in CUBE_MEASURES.items() if spec[0] in columns}
+
+    def query(self, sql, params=()):
+        """Ejecuta una consulta sobre la vista `bookings` y devuelve un DataFrame."""
+        # Un cursor por consulta: la conexión se comparte entre sesiones (hilos)
+        with self._con.cursor() as cursor:
+            return cursor.execute(sql, list(params)).df()
+
+    def _where(self, filters, not_null=()):
+        clauses = [f"{_quote(col)} IS NOT NULL" for col in not_null]
+        params = []
+        for col, values in (filters or {}).items():
+            if values is None or col not in self.keys:
+                continue
+            values = [v.item() if hasattr(v, 'item') else v for v in values]
+            if not values:
+                clauses.append('FALSE')
+                continue
+            clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+            params += values
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def _aggregate(self, by, measures, filters):
+        # SELECT by..., medidas ... WHERE filtros GROUP BY by ORDER BY by
+        where, params = self._where(filters, not_null=by)
+        select = [_quote(col) for col in by] + [f"{expr} AS {_quote(name)}" for name, expr in measures.items()]
+        sql = f"SELECT {', '.join(select)} FROM bookings{where}"
+        if by:
+            group = ', '.join(_quote(col) for col in by)
+            sql += f" GROUP BY {group} ORDER BY {group}"
+        result = self.query(sql, params)
+        if 'year_month' in by:
+            result['year_month'] = year_month_labels(result['year_month'])
+        for col in by:
+            if col in ORDERED_DIMENSIONS:
+                result[col] = pd.Categorical(result[col], categories=ORDERED_DIMENSIONS[col], ordered=True)
+        if any(col in ORDERED_DIMENSIONS for col in by):
+            result = result.sort_values(list(by), ignore_index=True)
+        return result
+
+    def _measure_sql(self):
+        sql = {}
+        for name, (col, agg) in self.measures.items():
+            if agg == 'size':
+                sql[name] = 'count(*)'
+            else:
+                # `adr` como float32, igual que el esquema compacto de pandas
+                if col == 'adr':
+                    sql[name] = 'coalesce(sum(CAST(CAST("adr" AS FLOAT) AS DOUBLE)), 0)'
+                else:
+                    sql[name] = f"CAST(coalesce(sum({_quote(col)}), 0) AS BIGINT)"
+        return sql
+
+    def slice(self, dimension, filters=None, keep=(), drop_empty=False):
+        """
+        Medidas de `CUBE_MEASURES` por valor de la dimensión para el estado de
+        filtros, con la misma forma que `BookingsCube.slice`.
+        """
+        by = list(dict.fromkeys(list(keep) + _dimension_columns(dimension)))
+        result = self._aggregate(by, self._measure_sql(), filters)
+        return result if drop_empty else complete_categories(result, dimension, keep)
+
+    def totals(self, filters=None):
+        """Medidas totales para el estado de filtros (sin desglosar por dimensión)."""
+        return self._aggregate([], self._measure_sql(), filters).iloc[0]
+
+    def values(self, key):
+        """Valores distintos (ordenados) de una clave de filtro."""
+        sql = f"SELECT DISTINCT {_quote(key)} FROM bookings WHERE {_quote(key)} IS NOT NULL ORDER BY 1"
+        return self.query(sql)[key].tolist()
+
+    def supports(self, metric):
+        """Indica si las columnas de un `Metric` de `utils.aggregation` existen en la vista."""
+        return all(c in self.columns for c in metric.by) and all(v in ENGINE_SUMS for v in metric.values)
+
+    def compute(self, filters, metrics):
+        """
+        Resuelve los agregados de página con una consulta SQL por agregado, con
+        la misma forma que `AggregationEngine.compute` (columnas de `by`, `count`
+        y `<valor>_sum`).
+
+        Parámetros:
+        -----------
+        filters : dict
+            Estado de filtros (ver `BookingsCube.slice`).
+        metrics : list
+            Lista de `Metric`. Los agregados no soportados se omiten.
+
+        Retorna:
+        --------
+        dict
+            Diccionario nombre -> pd.DataFrame.
+        """
+        measure_sql = self._measure_sql()
+        bundle = {}
+        for metric in metrics:
+            if not self.supports(metric):
+                continue
+            measures = {'count': measure_sql['count']}
+            measures.update({f'{v}_sum': measure_sql[ENGINE_SUMS[v]] for v in metric.values})
+            result = self._aggregate(list(metric.by), measures, filters)
+            result['count'] = result['count'].astype('int64')
+            bundle[metric.name] = result
+        return bundle
+
+
+if __name__ == '__main__':
+    # Comparativa con la ruta pandas: python -m utils.sql_backend [CSV]
+    from utils.bookings import load_bookings
+    from utils.olap_cube import BookingsCube
+
+    default_csv = Path(__file__).resolve().parents[1] / "1. Datos" / "hotel_bookings_processed.csv"
+    parser = argparse.ArgumentParser(description="Compara el backend DuckDB con el cubo de pandas.")
+    parser.add_argument('csv', nargs='?', default=default_csv, help="CSV procesado de reservas")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones de cada consulta")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sql = SQLBookings(args.csv)
+    print(f"DuckDB: carga {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    df = load_bookings(args.csv)
+    print(f"pandas: carga {time.perf_counter() - start:.2f}s")
+
+    filters = {'hotel': None, 'arrival_date_year': range(2016, 2018), 'customer_type': None}
+    for dim in ['market_segment', 'deposit_type', 'country', 'year_month']:
+        timings = {}
+        for name, run in [
+            ('duckdb', lambda: sql.slice(dim, filters)),
+            ('pandas', lambda: BookingsCube.build(
+                df[df['arrival_date_year'].isin(filters['arrival_date_year'])], [dim]).slice(dim)),
+        ]:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                result = run()
+            timings[name] = (time.perf_counter() - start) / args.repeat * 1000
+        print(f"{dim:>16}: duckdb {timings['duckdb']:7.1f} ms | pandas {timings['pandas']:7.1f} ms "
+              f"({len(result)} filas)")
@@ -0,0 +1,529 @@
+########################################
+#### LIBRERIAS NECESARIAS           ####
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.bookings import DERIVED_VERSION, STREAM_CHUNK_ROWS, default_cache_dir, iter_bookings
+from utils.columnar_cache import file_fingerprint, read_valid_manifest, write_manifest
+from utils.date_dimension import EPOCH_WEEKDAY, date_dimension, date_keys, year_month_labels
+########################################
+
+# Columnas de reservas que necesita el cubo diario
+DAILY_COLUMNS = ['dia', 'hotel', 'customer_type', 'is_canceled', 'adr', 'total_nights']
+
+# Ejes del cubo diario tras el día de llegada, en orden
+DAILY_AXES = ['hotel', 'customer_type', 'is_canceled']
+
+# Medidas de llegadas por celda: nombre -> columna sumada (None = recuento)
+DAILY_MEASURES = {'count': None, 'adr_sum': 'adr', 'nights_sum': 'total_nights'}
+
+# Último eje del array: las medidas de llegadas y las salidas (reservas que
+# dejan la habitación ese día, llegada + noches). La ocupación de cada noche
+# es la suma acumulada de llegadas menos salidas
+STORED_MEASURES = list(DAILY_MEASURES) + ['departures']
+DEPARTURES = STORED_MEASURES.index('departures')
+
+# Medidas de las series: las del cubo más las cancelaciones, con los nombres de `CUBE_MEASURES`
+SERIES_MEASURES = ['count', 'canceled', 'adr_sum', 'nights_sum']
+
+# Periodos por año de cada frecuencia (desfase de la comparación interanual).
+# Un año de días son 364 para comparar con el mismo día de la semana
+PERIODS_PER_YEAR = {'day': 364, 'week': 52, 'month': 12, 'quarter': 4, 'season': 4}
+
+# Temporadas en orden cronológico dentro de su año (el invierno empieza en diciembre)
+SEASON_CHRONOLOGY = ['Invierno', 'Primavera', 'Verano', 'Otoño']
+
+DAILY_CUBE_NAME = 'daily_cube.npz'
+MANIFEST_NAME = 'daily_cube.json'
+
+
+class CalendarGrid(NamedTuple):
+    """
+    Llegadas por (hotel, semana, día de la semana), para mapas de calor de
+    calendario. Los días fuera del rango de años seleccionado valen NaN.
+    """
+    weeks: np.ndarray          # lunes de cada semana (datetime64[D])
+    hotels: list
+    arrivals: np.ndarray       # forma (hoteles, semanas, 7)
+    canceled: np.ndarray       # misma forma
+
+    @property
+    def cancel_rate(self):
+        """Tasa de cancelación (%) de cada día; NaN sin llegadas."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.arrivals > 0, self.canceled / self.arrivals * 100, np.nan)
+
+
+def _period_keys(calendar, freq):
+    # Clave entera y creciente del periodo de cada día de la tabla de calendario
+    year = calendar['year'].to_numpy(dtype=np.int64)
+    month = calendar['month'].to_numpy(dtype=np.int64)
+    keys = calendar.index.to_numpy(dtype=np.int64)
+    if freq == 'day':
+        return keys
+    if freq == 'week':
+        # Semanas de lunes a domingo contadas desde la del 1970-01-01
+        return (keys + EPOCH_WEEKDAY) // 7
+    if freq == 'month':
+        return calendar['year_month_key'].to_numpy(dtype=np.int64)
+    if freq == 'quarter':
+        return year * 4 + (month - 1) // 3
+    if freq == 'season':
+        # El diciembre cuenta en el invierno del año siguiente, así cada temporada es contigua
+        return (year + (month == 12)) * 4 + (month % 12) // 3
+    raise ValueError(f"Frecuencia no soportada: {freq}")
+
+
+def _period_labels(keys, freq):
+    # Etiqueta de cada clave de periodo (una por periodo, no por día)
+    if freq == 'day':
+        return [str(np.datetime64(int(key), 'D')) for key in keys]
+    if freq == 'week':
+        return [str(np.datetime64(int(key) * 7 - EPOCH_WEEKDAY, 'D')) for key in keys]
+    if freq == 'month':
+        return year_month_labels(keys)
+    if freq == 'quarter':
+        return [f"{int(key) // 4}-T{int(key) % 4 + 1}" for key in keys]
+    return [f"{SEASON_CHRONOLOGY[int(key) % 4]} {int(key) // 4}" for key in keys]
+
+
+def _codes(values, labels):
+    # Posición de cada valor en `labels` (-1 si no está o es nulo)
+    return pd.Index(labels).get_indexer(values).astype(np.int64)
+
+
+class DailyCube:
+    """
+    Cubo diario de llegadas: un array denso con las medidas de
+    `STORED_MEASURES` por (día, hotel, tipo de cliente, cancelada).
+
+    Las series temporales se obtienen sumando cortes del array: el estado de
+    filtros selecciona días, hoteles y tipos de cliente, y el cambio de
+    frecuencia (semana, mes, trimestre, temporada) suma bloques de días
+    consecutivos con `np.add.reduceat`. El coste depende del número de días y
+    de celdas, no del número de reservas. La ocupación por noche sale del
+    mismo array como suma acumulada de llegadas menos salidas.
+
+    Parámetros:
+    -----------
+    values : np.ndarray
+        Array float64 de forma (días, hoteles, tipos de cliente, 2, medidas).
+        Los días llegan hasta la última salida.
+    first_day : int
+        Clave de fecha (`date_keys`) del primer día del array.
+    hotels : list
+        Valores del eje de hotel.
+    customer_types : list
+        Valores del eje de tipo de cliente.
+    """
+
+    def __init__(self, values, first_day, hotels, customer_types):
+        self.values = values
+        self.first_day = int(first_day)
+        self.hotels = list(hotels)
+        self.customer_types = list(customer_types)
+        self._calendar = None
+
+    @classmethod
+    def empty(cls):
+        """Cubo sin días, neutro para `merge`."""
+        return cls(np.zeros((0, 0, 0, 2, len(STORED_MEASURES))), 0, [], [])
+
+    @classmethod
+    def build(cls, df):
+        """
+        Construye el cubo con un `np.bincount` por medida sobre el índice plano
+        de la celda de cada reserva.
+
+        Parámetros:
+        -----------
+        df : pd.DataFrame
+            Reservas con las columnas de `DAILY_COLUMNS`.
+
+        Retorna:
+        --------
+        DailyCube
+        """
+        if len(df) == 0:
+            return cls.empty()
+
+        days = date_keys(df['dia'])
+        nights = np.nan_to_num(df['total_nights'].to_numpy(dtype='float64', na_value=np.nan)).astype(np.int64)
+        first_day = int(days.min())
+        n_days = int((days + nights).max()) - first_day + 1
+        hotels = sorted(df['hotel'].dropna().unique())
+        customer_types = sorted(df['customer_type'].dropna().unique())
+        shape = (n_days, len(hotels), len(customer_types), 2)
+
+        hotel_codes = _codes(df['hotel'], hotels)
+        customer_codes = _codes(df['customer_type'], customer_types)
+        status = df['is_canceled'].to_numpy(dtype='float64', na_value=np.nan)
+        valid = (hotel_codes >= 0) & (customer_codes >= 0) & ~np.isnan(status)
+        cell = (hotel_codes[valid], customer_codes[valid], status[valid].astype(np.int64))
+        cells = np.ravel_multi_index((days[valid] - first_day, *cell), shape)
+        departure_cells = np.ravel_multi_index((days[valid] + nights[valid] - first_day, *cell), shape)
+
+        n_cells = int(np.prod(shape))
+        values = np.empty(shape + (len(STORED_MEASURES),))
+        values[..., DEPARTURES] = np.bincount(departure_cells, minlength=n_cells).reshape(shape)
+        for i, column in enumerate(DAILY_MEASURES.values()):
+            if column is None:
+                weights = None
+            else:
+                # Los nulos no suman, igual que `sum` en pandas
+                weights = np.nan_to_num(df[column].to_numpy(dtype='float64', na_value=np.nan)[valid])
+            values[..., i] = np.bincount(cells, weights=weights, minlength=n_cells).reshape(shape)
+        return cls(values, first_day, hotels, customer_types)
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Construye el cubo plegando bloques de reservas (p.ej. de `iter_bookings`)."""
+        cube = cls.empty()
+        for chunk in chunks:
+            cube = cube.merge(cls.build(chunk))
+        return cube
+
+    @property
+    def last_day(self):
+        return self.first_day + len(self.values) - 1
+
+    @property
+    def calendar(self):
+        """Tabla de `date_dimension` con un día por fila del array."""
+        if self._calendar is None:
+            self._calendar = date_dimension(np.datetime64(self.first_day, 'D'), np.datetime64(self.last_day, 'D'))
+        return self._calendar
+
+    def merge(self, other):
+        """
+        Suma dos cubos diarios, alineando días, hoteles y tipos de cliente.
+
+        Parámetros:
+        -----------
+        other : DailyCube
+            Cubo a acumular.
+
+        Retorna:
+        --------
+        DailyCube
+            Nuevo cubo con la unión de los ejes de ambos.
+        """
+        if len(other.values) == 0:
+            return self
+        if len(self.values) == 0:
+            return other
+
+        first_day = min(self.first_day, other.first_day)
+        last_day = max(self.last_day, other.last_day)
+        hotels = sorted(set(self.hotels) | set(other.hotels))
+        customer_types = sorted(set(self.customer_types) | set(other.customer_types))
+        values = np.zeros((last_day - first_day + 1, len(hotels), len(customer_types)) + self.values.shape[3:])
+        for cube in (self, other):
+            offset = cube.first_day - first_day
+            values[np.ix_(
+                np.arange(offset, offset + len(cube.values)),
+                _codes(cube.hotels, hotels),
+                _codes(cube.customer_types, customer_types),
+            )] += cube.values
+        return DailyCube(values, first_day, hotels, customer_types)
+
+    def update(self, df):
+        """Acumula en el sitio las reservas de `df` y devuelve el propio cubo."""
+        merged = self.merge(DailyCube.build(df))
+        self.values, self.first_day = merged.values, merged.first_day
+        self.hotels, self.customer_types = merged.hotels, merged.customer_types
+        self._calendar = None
+        return self
+
+    def _select_axes(self, filters):
+        # Corte de los ejes de hotel y tipo de cliente para el estado de filtros
+        filters = filters or {}
+        values = self.values
+        axes = {'hotel': self.hotels, 'customer_type': self.customer_types}
+        labels = {}
+        for axis, (name, axis_labels) in enumerate(axes.items(), start=1):
+            selected = filters.get(name)
+            if selected is None:
+                labels[name] = axis_labels
+                continue
+            positions = [i for i, label in enumerate(axis_labels) if label in list(selected)]
+            values = values.take(positions, axis=axis)
+            labels[name] = [axis_labels[i] for i in positions]
+        labels['is_canceled'] = [0, 1]
+        return values, labels
+
+    def _select_days(self, filters, n_days):
+        # Días (de los `n_days` primeros) del rango de años del estado de filtros
+        calendar = self.calendar.iloc[:n_days]
+        years = (filters or {}).get('arrival_date_year')
+        if years is None:
+            return np.ones(len(calendar), dtype=bool), calendar
+        days = np.isin(calendar['year'].to_numpy(), list(years))
+        return days, calendar[days]
+
+    def _arrival_days(self):
+        # Días hasta la última llegada: los posteriores solo tienen salidas
+        return int(np.flatnonzero(self.values[..., 0].any(axis=(1, 2, 3)))[-1]) + 1
+
+    @staticmethod
+    def _keep(values, by):
+        # Suma los ejes de DAILY_AXES que no están en `by` y deja los demás en el orden de `by`
+        values = values.sum(axis=tuple(1 + DAILY_AXES.index(axis) for axis in DAILY_AXES if axis not in by))
+        kept = [axis for axis in DAILY_AXES if axis in by]
+        return np.moveaxis(values, [1 + kept.index(axis) for axis in by], range(1, len(by) + 1))
+
+    def resample(self, filters=None, freq='month', by=('hotel',)):
+        """
+        Serie temporal del estado de filtros a la frecuencia pedida.
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Estado de filtros (hotel, arrival_date_year, customer_type).
+        freq : str
+            'day', 'week', 'month', 'quarter' o 'season'.
+        by : tuple
+            Ejes de `DAILY_AXES` que se conservan (una serie por combinación).
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Una fila por (periodo, valores de `by`), densa y en orden
+            cronológico, con `period` (etiqueta), `period_start` (primer día
+            del periodo en los datos), `by` y las medidas de `SERIES_MEASURES`.
+        """
+        columns = ['period', 'period_start', *by, *SERIES_MEASURES]
+        if len(self.values) == 0:
+            return pd.DataFrame(columns=columns)
+        values, labels = self._select_axes(filters)
+        n_days = self._arrival_days()
+        days, calendar = self._select_days(filters, n_days)
+        values = values[:n_days][days]
+        if len(values) == 0:
+            return pd.DataFrame(columns=columns)
+
+        # Cancelaciones: recuento de la celda cancelada, como medida adicional
+        arrivals = values[..., :DEPARTURES]
+        canceled = arrivals[..., :1] * np.array([0, 1]).reshape(1, 1, 1, 2, 1)
+        values = self._keep(np.concatenate([arrivals[..., :1], canceled, arrivals[..., 1:]], axis=-1), by)
+
+        keys = _period_keys(calendar, freq)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        periods = np.add.reduceat(values, starts, axis=0)
+
+        n_cells = int(np.prod(periods.shape[1:-1]))
+        index = pd.MultiIndex.from_product(
+            [_period_labels(keys[starts], freq), *(labels[axis] for axis in by)], names=['period', *by]
+        )
+        result = pd.DataFrame(periods.reshape(-1, len(SERIES_MEASURES)), index=index, columns=SERIES_MEASURES)
+        result = result.reset_index()
+        result.insert(1, 'period_start', np.repeat(calendar['date'].to_numpy()[starts], n_cells))
+        for name in ('count', 'canceled', 'nights_sum'):
+            result[name] = result[name].round().astype('int64')
+        return result[columns]
+
+    def occupancy(self, filters=None, by=('hotel',)):
+        """
+        Habitaciones ocupadas (reservas alojadas) cada noche, como suma
+        acumulada de llegadas menos salidas del array diario.
+
+        Las noches se seleccionan por su propio año: una estancia que llega el
+        31 de diciembre ocupa noches del año siguiente. Las reservas canceladas
+        cuentan las noches que habrían ocupado (ver eje `is_canceled`).
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Estado de filtros. El rango de años selecciona noches.
+        by : tuple
+            Ejes de `DAILY_AXES` que se conservan (una serie por combinación).
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Una fila por (noche, valores de `by`) con `date`, `by` y `occupancy`.
+        """
+        columns = ['date', *by, 'occupancy']
+        if len(self.values) == 0:
+            return pd.DataFrame(columns=columns)
+        values, labels = self._select_axes(filters)
+        deltas = self._keep(values[..., 0] - values[..., DEPARTURES], by)
+        days, calendar = self._select_days(filters, len(self.values))
+        occupancy = np.cumsum(deltas, axis=0)[days]
+
+        index = pd.MultiIndex.from_product(
+            [calendar['date'].to_numpy(), *(labels[axis] for axis in by)], names=['date', *by]
+        )
+        result = pd.DataFrame({'occupancy': occupancy.ravel().round().astype('int64')}, index=index)
+        return result.reset_index()[columns]
+
+    def weekday_grid(self, filters=None):
+        """
+        Llegadas y cancelaciones del estado de filtros por hotel, colocadas en
+        una rejilla semana x día de la semana.
+
+        Es un corte de la matriz densa día x hotel del cubo (sin reagrupar
+        reservas): los días del rango de años se reparten en la rejilla con una
+        sola asignación por índices.
+
+        Parámetros:
+        -----------
+        filters : dict, opcional
+            Estado de filtros (hotel, arrival_date_year, customer_type).
+
+        Retorna:
+        --------
+        CalendarGrid
+            Semanas (lunes a domingo), hoteles y matrices de llegadas y
+            cancelaciones de forma (hoteles, semanas, 7).
+        """
+        values, labels = self._select_axes(filters)
+        if len(self.values) == 0 or values.shape[1] == 0:
+            empty = np.zeros((len(labels.get('hotel', [])), 0, 7))
+            return CalendarGrid(np.array([], dtype='datetime64[D]'), labels.get('hotel', []), empty, empty)
+        n_days = self._arrival_days()
+        days, calendar = self._select_days(filters, n_days)
+        # Matriz (día, hotel, cancelada) de llegadas, sumando los tipos de cliente
+        counts = values[:n_days][days][..., 0].sum(axis=2)
+
+        keys = calendar.index.to_numpy(dtype=np.int64) + EPOCH_WEEKDAY
+        weeks, weekdays = keys // 7, keys % 7
+        first_week = weeks.min() if len(weeks) else 0
+        n_weeks = int(weeks.max() - first_week + 1) if len(weeks) else 0
+        grid = np.full((counts.shape[1], n_weeks, 7, 2), np.nan)
+        grid[:, weeks - first_week, weekdays] = counts.transpose(1, 0, 2)
+
+        mondays = ((first_week + np.arange(n_weeks)) * 7 - EPOCH_WEEKDAY).astype('datetime64[D]')
+        return CalendarGrid(mondays, labels['hotel'], grid.sum(axis=-1), grid[..., 1])
+
+    def save(self, source, cache_dir, fingerprint=None):
+        """Guarda el cubo como caché de `source` (array .npz y manifiesto de huella)."""
+        if fingerprint is None:
+            fingerprint = file_fingerprint(source)
+        self.write(Path(cache_dir) / DAILY_CUBE_NAME)
+        write_manifest(Path(cache_dir) / MANIFEST_NAME, fingerprint, DERIVED_VERSION)
+
+    @classmethod
+    def load(cls, source, cache_dir):
+        """Lee el cubo guardado con `save`, o None si no existe o `source` ha cambiado."""
+        if read_valid_manifest(source, Path(cache_dir) / MANIFEST_NAME, DERIVED_VERSION) is None:
+            return None
+        return cls.read(Path(cache_dir) / DAILY_CUBE_NAME)
+
+    def write(self, path):
+        """Guarda el cubo en un fichero .npz (escritura atómica)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f, values=self.values, first_day=self.first_day,
+                hotels=np.array(self.hotels, dtype=str), customer_types=np.array(self.customer_types, dtype=str),
+                measures=np.array(STORED_MEASURES),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read(cls, path):
+        """Lee un cubo guardado con `write`, o None si el fichero no existe o tiene otras medidas."""
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                if f['measures'].tolist() != STORED_MEASURES:
+                    return None
+                return cls(f['values'], f['first_day'], f['hotels'].tolist(), f['customer_types'].tolist())
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def rolling_mean(series, column, window, n_groups=1):
+    """
+    Media móvil de `column` sobre los últimos `window` periodos de una serie
+    densa de `DailyCube.resample`, con sumas acumuladas por grupo.
+
+    Parámetros:
+    -----------
+    series : pd.DataFrame
+        Resultado de `resample`.
+    column : str
+        Medida a suavizar.
+    window : int
+        Número de periodos de la ventana.
+    n_groups : int
+        Número de series de `series` (combinaciones de `by`).
+
+    Retorna:
+    --------
+    np.ndarray
+        Media móvil de cada fila (los primeros periodos promedian los disponibles).
+    """
+    values = series[column].to_numpy(dtype='float64').reshape(-1, max(n_groups, 1))
+    cumulative = np.cumsum(values, axis=0)
+    totals = cumulative.copy()
+    totals[window:] -= cumulative[:-window]
+    periods = np.minimum(np.arange(1, len(values) + 1), window).reshape(-1, 1)
+    return (totals / periods).ravel()
+
+
+def year_over_year(series, column, freq, n_groups=1):
+    """
+    Valor del mismo periodo del año anterior y variación interanual (%) de
+    `column` en una serie densa de `DailyCube.resample`.
+
+    Parámetros:
+    -----------
+    series : pd.DataFrame
+        Resultado de `resample` con frecuencia `freq`.
+    column : str
+        Medida a comparar.
+    freq : str
+        Frecuencia de la serie (ver `PERIODS_PER_YEAR`).
+    n_groups : int
+        Número de series de `series` (combinaciones de `by`).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Columnas `previous` y `yoy` por fila (NaN sin periodo anterior o sin reservas).
+    """
+    lag = PERIODS_PER_YEAR[freq]
+    values = series[column].to_numpy(dtype='float64').reshape(-1, max(n_groups, 1))
+    previous = np.full_like(values, np.nan)
+    previous[lag:] = values[:-lag]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(previous > 0, (values - previous) / previous * 100, np.nan)
+    return pd.DataFrame({'previous': previous.ravel(), 'yoy': change.ravel()}, index=series.index)
+
+
+def load_daily_cube(csv_path, cache_dir=None, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Cubo diario construido por streaming desde el CSV, con caché en disco
+    junto a la huella del CSV.
+
+    Parámetros:
+    -----------
+    csv_path : str | Path
+        Ruta del CSV procesado de reservas.
+    cache_dir : str | Path, opcional
+        Directorio de la caché. Por defecto, `.cache` junto al CSV.
+    chunksize : int
+        Número de filas por bloque.
+
+    Retorna:
+    --------
+    DailyCube
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir(csv_path)
+
+    cube = DailyCube.load(csv_path, cache_dir)
+    if cube is not None:
+        return cube
+
+    fingerprint = file_fingerprint(csv_path)
+    cube = DailyCube.from_chunks(iter_bookings(csv_path, chunksize))
+    cube.save(csv_path, cache_dir, fingerprint=fingerprint)
+    return cube